@@ -0,0 +1,274 @@
+"""
+CLIENTE HTTP DEL BACKEND
+Una Session por proceso (keep-alive), timeouts por endpoint, reintentos
+con backoff para métodos idempotentes, circuit breaker y latencias por
+endpoint
+
+Configuración opcional en Secrets:
+
+    API_URL = "https://..."
+    [api]
+    timeout_conexion = 3        # segundos
+    timeout_lectura = 10        # segundos, salvo los de TIMEOUTS_ENDPOINT
+    reintentos = 2              # solo GET, PUT, DELETE, HEAD
+    backoff = 0.5               # segundos; se duplica en cada reintento
+    conexiones = 10             # conexiones keep-alive abiertas al backend
+    umbral_circuito = 5         # fallos seguidos que abren el circuito
+    enfriamiento_circuito = 30  # segundos con el circuito abierto
+
+    [api.timeouts]              # timeout de lectura por endpoint
+    "POST /auth/login" = 10
+"""
+
+import os
+import string
+import threading
+import time
+from bisect import bisect_left
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_DEFAULTS = {
+    'timeout_conexion': 3,
+    'timeout_lectura': 10,
+    'reintentos': 2,
+    'backoff': 0.5,
+    'conexiones': 10,
+    'umbral_circuito': 5,
+    'enfriamiento_circuito': 30,
+}
+
+# Timeout de lectura de los endpoints que tardan distinto al resto
+TIMEOUTS_ENDPOINT = {
+    'POST /auth/login': 10,
+    # Envío masivo del outbox ([outbox] envio_masivo)
+    'PUT /tickets/estado': 30,
+}
+
+# Límites superiores (ms) de los buckets del histograma de latencias
+BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf')]
+
+
+class CircuitoAbiertoError(requests.RequestException):
+    """El backend falló seguido y se dejan de enviar llamadas por un tiempo"""
+
+
+# ============================================================
+# CIRCUIT BREAKER
+# ============================================================
+
+class CircuitBreaker:
+    """Abre tras `umbral` fallos seguidos; pasado el enfriamiento deja
+    pasar una llamada de prueba y cierra si sale bien"""
+
+    def __init__(self, umbral, enfriamiento):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self._fallos = 0
+        self._abierto_desde = None
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return True
+            if self._probando or time.monotonic() - self._abierto_desde < self.enfriamiento:
+                return False
+            self._probando = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+            self._probando = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._probando or self._fallos >= self.umbral:
+                self._abierto_desde = time.monotonic()
+            self._probando = False
+
+    def cancelar(self):
+        """La llamada no llegó a probar el backend: otra puede intentarlo"""
+        with self._lock:
+            self._probando = False
+
+    def estado(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return 'cerrado'
+            return 'semiabierto' if self._probando else 'abierto'
+
+
+# ============================================================
+# LATENCIAS
+# ============================================================
+
+class HistogramaLatencias:
+    """Histograma por endpoint con buckets fijos de BUCKETS_MS"""
+
+    def __init__(self):
+        self._datos = {}
+        self._rechazadas = {}
+        self._lock = threading.Lock()
+
+    def rechazar(self, endpoint):
+        """Llamada cortada por el circuito: se cuenta aparte, sin latencia"""
+        with self._lock:
+            self._rechazadas[endpoint] = self._rechazadas.get(endpoint, 0) + 1
+
+    def registrar(self, endpoint, milisegundos, error=False):
+        with self._lock:
+            datos = self._datos.setdefault(endpoint, {
+                'buckets': [0] * len(BUCKETS_MS),
+                'llamadas': 0,
+                'errores': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+            })
+            datos['buckets'][bisect_left(BUCKETS_MS, milisegundos)] += 1
+            datos['llamadas'] += 1
+            datos['errores'] += int(error)
+            datos['total_ms'] += milisegundos
+            datos['max_ms'] = max(datos['max_ms'], milisegundos)
+
+    @staticmethod
+    def _percentil(buckets, llamadas, p):
+        # Límite superior del bucket donde cae el percentil
+        objetivo = p / 100 * llamadas
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS_MS, buckets):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return limite
+        return BUCKETS_MS[-1]
+
+    def resumen(self):
+        """{endpoint: llamadas, errores, rechazadas, promedio, p50, p95, p99 y máximo en ms}"""
+        with self._lock:
+            datos = {endpoint: dict(d, buckets=list(d['buckets'])) for endpoint, d in self._datos.items()}
+            rechazadas = dict(self._rechazadas)
+        resumen = {}
+        for endpoint in sorted(datos.keys() | rechazadas.keys()):
+            d = datos.get(endpoint)
+            if d is None:
+                resumen[endpoint] = {'llamadas': 0, 'errores': 0, 'rechazadas': rechazadas[endpoint]}
+                continue
+            resumen[endpoint] = {
+                'llamadas': d['llamadas'],
+                'errores': d['errores'],
+                'rechazadas': rechazadas.get(endpoint, 0),
+                'promedio_ms': round(d['total_ms'] / d['llamadas'], 1),
+                'p50_ms': self._percentil(d['buckets'], d['llamadas'], 50),
+                'p95_ms': self._percentil(d['buckets'], d['llamadas'], 95),
+                'p99_ms': self._percentil(d['buckets'], d['llamadas'], 99),
+                'max_ms': round(d['max_ms'], 1),
+            }
+        return resumen
+
+
+# ============================================================
+# CLIENTE
+# ============================================================
+
+class ClienteAPI:
+    """Cliente del backend compartido por todas las sesiones del proceso
+
+    Las rutas se pasan como plantilla ("/users/{id}") y los valores como
+    argumentos con nombre; la plantilla identifica el endpoint en las
+    métricas y en TIMEOUTS_ENDPOINT.
+    """
+
+    def __init__(self, base_url, timeout_conexion, timeout_lectura, reintentos, backoff,
+                 conexiones, umbral_circuito, enfriamiento_circuito, timeouts=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+        self.timeouts = dict(TIMEOUTS_ENDPOINT, **(timeouts or {}))
+        self.circuito = CircuitBreaker(umbral_circuito, enfriamiento_circuito)
+        self.latencias = HistogramaLatencias()
+
+        # POST no se reintenta salvo por fallo de conexión (no llegó al backend)
+        reintentos_http = Retry(
+            total=reintentos,
+            connect=reintentos,
+            backoff_factor=backoff,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=['GET', 'PUT', 'DELETE', 'HEAD'],
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones, max_retries=reintentos_http)
+        self.session = requests.Session()
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+
+    def solicitar(self, metodo, ruta, token=None, **kwargs):
+        """Llamar al backend y devolver la respuesta de requests
+
+        Lanza CircuitoAbiertoError sin llamar si el circuito está abierto;
+        los errores de red y timeouts se propagan como en requests.
+        """
+        campos = {campo for _, campo, _, _ in string.Formatter().parse(ruta) if campo}
+        valores = {campo: kwargs.pop(campo) for campo in campos}
+        endpoint = f"{metodo} {ruta}"
+
+        if not self.circuito.permitir():
+            self.latencias.rechazar(endpoint)
+            raise CircuitoAbiertoError(f"Backend no disponible, reintentar en {self.circuito.enfriamiento}s")
+
+        if token:
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'Authorization': f'Bearer {token}'}
+        kwargs.setdefault('timeout', (self.timeout_conexion, self.timeouts.get(endpoint, self.timeout_lectura)))
+
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.session.request(metodo, self.base_url + ruta.format(**valores), **kwargs)
+        except requests.RequestException:
+            self.circuito.fallo()
+            self.latencias.registrar(endpoint, (time.perf_counter() - inicio) * 1000, error=True)
+            raise
+        except BaseException:
+            # URL o cabecera inválida, interrupción...: no dice nada del
+            # backend, pero no puede dejar el circuito semiabierto
+            self.circuito.cancelar()
+            raise
+        error = respuesta.status_code >= 500
+        if error:
+            self.circuito.fallo()
+        else:
+            self.circuito.exito()
+        self.latencias.registrar(endpoint, (time.perf_counter() - inicio) * 1000, error=error)
+        return respuesta
+
+    def get(self, ruta, **kwargs):
+        return self.solicitar('GET', ruta, **kwargs)
+
+    def post(self, ruta, **kwargs):
+        return self.solicitar('POST', ruta, **kwargs)
+
+    def put(self, ruta, **kwargs):
+        return self.solicitar('PUT', ruta, **kwargs)
+
+    def delete(self, ruta, **kwargs):
+        return self.solicitar('DELETE', ruta, **kwargs)
+
+    def estadisticas(self):
+        return {
+            'circuito': self.circuito.estado(),
+            'endpoints': self.latencias.resumen(),
+        }
+
+
+@st.cache_resource
+def cliente_api():
+    """Cliente único por proceso, configurado desde Secrets"""
+    config = dict(API_DEFAULTS)
+    config.update(st.secrets.get("api", {}))
+    base_url = st.secrets.get("API_URL", os.getenv("API_URL", "http://localhost:3000"))
+    return ClienteAPI(base_url, **config)
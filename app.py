@@ -1,5 +1,9 @@
 import streamlit as st
 from auth import require_auth
+from migraciones import asegurar_esquema
+from outbox import iniciar_worker
+from archivo import iniciar_archivador
+from repositorio import obtener_repositorio
 
 st.set_page_config(
     page_title="Sistema RRHH",
@@ -9,6 +13,12 @@ st.set_page_config(
 
 require_auth()
 
+# Esquema al día una vez por proceso, nunca en cada rerun
+if obtener_repositorio().extras:
+    asegurar_esquema()
+    iniciar_worker()
+    iniciar_archivador()
+
 rol = st.session_state.get('rol', '')
 
 # Páginas base
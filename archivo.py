@@ -0,0 +1,106 @@
+"""
+ARCHIVO DE TICKETS CERRADOS
+Los tickets cerrados hace más de `dias` días se marcan como archivados y
+salen de los listados (y de sus índices parciales). Siguen en la misma
+tabla: comentarios, adjuntos, filas y SLA no se mueven. Reabrir un
+ticket lo desarchiva.
+
+Un hilo por proceso archiva por lotes cada `intervalo` segundos; también
+se puede correr a mano:
+
+    python archivo.py
+
+Configuración opcional en Secrets:
+
+    [archivo]
+    dias = 90
+    lote = 500
+    intervalo = 3600
+"""
+
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from db import conexion
+from tickets_db import resumen_tickets
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_DEFAULTS = {
+    'dias': 90,
+    'lote': 500,
+    'intervalo': 3600,
+}
+
+
+def _config():
+    config = dict(ARCHIVO_DEFAULTS)
+    config.update(st.secrets.get("archivo", {}))
+    return config
+
+
+def archivar_cerrados(dias=None, lote=None):
+    """Archivar por lotes los cerrados sin cambios en `dias` días
+
+    Cada lote confirma por separado y toma las filas con SKIP LOCKED, así
+    no frena a quien esté editando. Devuelve la cantidad archivada.
+    """
+    config = _config()
+    dias = config['dias'] if dias is None else dias
+    lote = config['lote'] if lote is None else lote
+    archivados = 0
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    UPDATE tickets SET archivado = true
+                    WHERE id IN (
+                        SELECT id FROM tickets
+                        WHERE estado = 'Cerrado' AND NOT archivado
+                          AND fecha_actualizacion < now() - %s * interval '1 day'
+                        ORDER BY fecha_actualizacion
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                ''', (dias, lote))
+                cantidad = cursor.rowcount
+            conn.commit()
+        archivados += cantidad
+        if cantidad < lote:
+            if archivados:
+                # Los archivados salen de los conteos del dashboard
+                resumen_tickets.clear()
+            return archivados
+
+
+def contar_archivados():
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM tickets WHERE archivado')
+            return cursor.fetchone()[0]
+
+
+def _bucle_archivador():
+    while True:
+        try:
+            archivados = archivar_cerrados()
+            if archivados:
+                logger.info("Tickets archivados: %s", archivados)
+        except Exception:
+            logger.exception("Error archivando tickets")
+        time.sleep(_config()['intervalo'])
+
+
+@st.cache_resource
+def iniciar_archivador():
+    """Hilo de archivo único por proceso"""
+    hilo = threading.Thread(target=_bucle_archivador, name="archivador", daemon=True)
+    hilo.start()
+    return hilo
+
+
+if __name__ == "__main__":
+    print(f"Tickets archivados: {archivar_cerrados()}")
@@ -1,15 +1,10 @@
 import streamlit as st
-import requests
-import os
+from api import cliente_api
 
-import os
-import streamlit as st
-
-API_URL = st.secrets.get("API_URL", os.getenv("API_URL", "http://localhost:3000"))
 def login(usuario, password):
     try:
-        response = requests.post(
-            f'{API_URL}/auth/login',
+        response = cliente_api().post(
+            '/auth/login',
             json={'usuario': usuario, 'password': password}
         )
         # DEBUG - ver respuesta cruda
@@ -0,0 +1,506 @@
+"""
+ALMACÉN DE ADJUNTOS DIRECCIONADO POR CONTENIDO
+Cada adjunto se guarda una sola vez, identificado por su SHA-256. Se
+escribe y se lee en trozos de TAMANO_TROZO bytes: ni la subida ni la
+descarga arman el archivo completo en memoria. En Postgres cada trozo se
+guarda comprimido con el códec que corresponde a su tipo (ver
+compresion.py) y se descomprime al leerlo.
+
+Configuración opcional en Secrets:
+
+    [blobs]
+    backend = "postgres"       # o "filesystem"
+    ruta = "/data/adjuntos"    # solo para filesystem
+    max_mb = 25                # tamaño máximo de un adjunto nuevo
+    comprimir = true           # solo para postgres
+
+Los adjuntos existentes en tickets.archivo_binario se mueven con la
+migración 'migrar_adjuntos' (ver migraciones.py) sin comprimir; se pasan
+a trozos comprimidos aparte, por lotes, con --recomprimir. Limpieza de
+blobs sin ticket, y compresión de los guardados antes de los códecs:
+
+    python blobs.py
+    python blobs.py --recomprimir
+"""
+
+import argparse
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from compresion import NINGUNO, comprimir, descomprimir, elegir_codec
+from db import conexion
+
+TAMANO_TROZO = 256 * 1024
+MAX_MB_DEFAULT = 25
+
+
+class AdjuntoDemasiadoGrandeError(ValueError):
+    """El adjunto supera el máximo configurado en [blobs] max_mb"""
+
+
+def calcular_hash(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def tamano_maximo():
+    """Bytes máximos de un adjunto"""
+    return int(st.secrets.get("blobs", {}).get("max_mb", MAX_MB_DEFAULT) * 1024 * 1024)
+
+
+def validar_tamano(tamano):
+    """Rechazar un adjunto antes de leerlo si ya se sabe que es muy grande"""
+    maximo = tamano_maximo()
+    if tamano > maximo:
+        raise AdjuntoDemasiadoGrandeError(
+            f"El archivo pesa {tamano / 1024 / 1024:.1f} MB; el máximo es {maximo / 1024 / 1024:.0f} MB"
+        )
+
+
+def _trozos(origen, maximo=None):
+    """Leer un archivo abierto en trozos, cortando al pasar `maximo` bytes"""
+    leidos = 0
+    while True:
+        trozo = origen.read(TAMANO_TROZO)
+        if not trozo:
+            return
+        leidos += len(trozo)
+        if maximo is not None and leidos > maximo:
+            raise AdjuntoDemasiadoGrandeError(
+                f"El archivo pasa de {maximo / 1024 / 1024:.0f} MB, el máximo permitido"
+            )
+        yield trozo
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class BlobStore:
+    """Interfaz común de los backends"""
+
+    def guardar_stream(self, origen, maximo=None):
+        """Guardar un archivo abierto, trozo a trozo, y devolver su hash
+
+        Si ya existe no se duplica. Con `maximo` (bytes) lanza
+        AdjuntoDemasiadoGrandeError al pasarlo, sin dejar nada guardado;
+        las subidas nuevas usan tamano_maximo(), lo ya guardado no tiene límite.
+        """
+        raise NotImplementedError
+
+    def guardar(self, contenido):
+        """Guardar bytes y devolver su hash"""
+        return self.guardar_stream(io.BytesIO(contenido))
+
+    def abrir(self, hash_blob):
+        """Iterar el contenido en trozos de TAMANO_TROZO bytes"""
+        raise NotImplementedError
+
+    def existe(self, hash_blob):
+        raise NotImplementedError
+
+    def eliminar(self, hash_blob):
+        raise NotImplementedError
+
+    def hashes(self):
+        """Todos los hashes guardados"""
+        raise NotImplementedError
+
+    def leer(self, hash_blob):
+        return b''.join(self.abrir(hash_blob))
+
+
+class PostgresBlobStore(BlobStore):
+    """Blobs en ticket_blobs; el contenido, en filas de ticket_blob_trozos
+
+    Los blobs anteriores a los trozos tienen todo en ticket_blobs.contenido,
+    y los anteriores a los códecs tienen codec NULL (sin comprimir).
+
+    Los trozos de un blob recomprimido van bajo una clave nueva
+    (clave_trozos) que se apunta en el mismo UPDATE que el códec: quien
+    leyó la fila antes sigue con los trozos y el códec viejos, que solo
+    borra limpiar_huerfanos().
+    """
+
+    def __init__(self, comprimir=True):
+        self.comprimir = comprimir
+        self._lock = threading.Lock()
+        self.trozos_leidos = 0
+        self.segundos_descompresion = 0.0
+
+    def _escribir_trozos(self, cursor, clave, trozos):
+        """Insertar `trozos` comprimidos bajo `clave`; devuelve (hash, datos del blob)"""
+        sha = hashlib.sha256()
+        codec = None
+        tamano = guardado = cantidad = 0
+        segundos = 0.0
+        for trozo in trozos:
+            if codec is None:
+                codec = elegir_codec(trozo) if self.comprimir else NINGUNO
+            sha.update(trozo)
+            inicio = time.perf_counter()
+            comprimido = comprimir(codec, trozo)
+            segundos += time.perf_counter() - inicio
+            if cantidad == 0 and len(comprimido) >= len(trozo):
+                # La firma no lo anticipó, pero el contenido no comprime
+                codec, comprimido = NINGUNO, trozo
+            cursor.execute(
+                'INSERT INTO ticket_blob_trozos (hash, numero, contenido, tamano) VALUES (%s, %s, %s, %s)',
+                (clave, cantidad, comprimido, len(trozo))
+            )
+            tamano += len(trozo)
+            guardado += len(comprimido)
+            cantidad += 1
+        return sha.hexdigest(), {
+            'tamano': tamano,
+            'trozos': cantidad,
+            'codec': codec or NINGUNO,
+            'tamano_guardado': guardado,
+            'segundos_codec': segundos,
+        }
+
+    def guardar_stream(self, origen, maximo=None):
+        # Los trozos se insertan con una clave provisoria porque el hash se
+        # conoce al final; todo en una transacción, así un error no deja nada
+        provisorio = f"subiendo-{uuid.uuid4().hex}"
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                hash_blob, datos = self._escribir_trozos(cursor, provisorio, _trozos(origen, maximo))
+                cursor.execute('''
+                    INSERT INTO ticket_blobs (hash, tamano, trozos, codec, tamano_guardado, segundos_codec)
+                    VALUES (%(hash)s, %(tamano)s, %(trozos)s, %(codec)s, %(tamano_guardado)s, %(segundos_codec)s)
+                    ON CONFLICT (hash) DO NOTHING
+                    RETURNING hash
+                ''', dict(datos, hash=hash_blob))
+                if cursor.fetchone() is None:
+                    # Ya estaba guardado: se descartan los trozos provisorios
+                    conn.rollback()
+                    return hash_blob
+                cursor.execute(
+                    'UPDATE ticket_blob_trozos SET hash = %s WHERE hash = %s',
+                    (hash_blob, provisorio)
+                )
+            conn.commit()
+        return hash_blob
+
+    def recomprimir(self, hash_blob):
+        """Reescribir un blob en trozos con el códec que le corresponde
+
+        Los trozos y el contenido anteriores quedan hasta limpiar_huerfanos().
+        """
+        clave = f"{hash_blob}@{uuid.uuid4().hex[:12]}"
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                _, datos = self._escribir_trozos(cursor, clave, self.abrir(hash_blob))
+                cursor.execute('''
+                    UPDATE ticket_blobs
+                    SET clave_trozos = %(clave)s, trozos = %(trozos)s, codec = %(codec)s,
+                        tamano_guardado = %(tamano_guardado)s, segundos_codec = %(segundos_codec)s
+                    WHERE hash = %(hash)s
+                ''', dict(datos, hash=hash_blob, clave=clave))
+            conn.commit()
+        return datos
+
+    def abrir(self, hash_blob):
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'SELECT trozos, codec, COALESCE(clave_trozos, hash) FROM ticket_blobs WHERE hash = %s',
+                    (hash_blob,)
+                )
+                fila = cursor.fetchone()
+        if fila is None:
+            raise FileNotFoundError(hash_blob)
+        # Códec y clave de la misma fila: una recompresión en curso no los mezcla
+        trozos, codec, clave = fila
+        if trozos is None:
+            yield from self._abrir_contenido(hash_blob)
+            return
+        # Una consulta por trozo: la conexión vuelve al pool entre trozos
+        for numero in range(trozos):
+            with conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT contenido, tamano FROM ticket_blob_trozos WHERE hash = %s AND numero = %s',
+                        (clave, numero)
+                    )
+                    trozo = cursor.fetchone()
+            if trozo is None:
+                raise FileNotFoundError(f"{hash_blob} trozo {numero}")
+            inicio = time.perf_counter()
+            contenido = descomprimir(codec, bytes(trozo[0]), trozo[1])
+            with self._lock:
+                self.trozos_leidos += 1
+                self.segundos_descompresion += time.perf_counter() - inicio
+            yield contenido
+
+    def _abrir_contenido(self, hash_blob):
+        # substring() sobre una columna EXTERNAL lee solo el tramo pedido
+        inicio = 1
+        while True:
+            with conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT substring(contenido FROM %s FOR %s) FROM ticket_blobs WHERE hash = %s',
+                        (inicio, TAMANO_TROZO, hash_blob)
+                    )
+                    fila = cursor.fetchone()
+            if fila is None:
+                raise FileNotFoundError(hash_blob)
+            trozo = bytes(fila[0])
+            if not trozo:
+                return
+            yield trozo
+            if len(trozo) < TAMANO_TROZO:
+                return
+            inicio += TAMANO_TROZO
+
+    def existe(self, hash_blob):
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM ticket_blobs WHERE hash = %s', (hash_blob,))
+                return cursor.fetchone() is not None
+
+    def eliminar(self, hash_blob):
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM ticket_blob_trozos
+                    WHERE hash = %(hash)s
+                       OR hash = (SELECT clave_trozos FROM ticket_blobs WHERE hash = %(hash)s)
+                ''', {'hash': hash_blob})
+                cursor.execute('DELETE FROM ticket_blobs WHERE hash = %s', (hash_blob,))
+            conn.commit()
+
+    def limpiar_versiones(self):
+        """Borrar lo que dejó atrás recomprimir(); devuelve los trozos borrados"""
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM ticket_blob_trozos t
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM ticket_blobs b
+                        WHERE COALESCE(b.clave_trozos, b.hash) = t.hash
+                    )
+                ''')
+                borrados = cursor.rowcount
+                cursor.execute('''
+                    UPDATE ticket_blobs SET contenido = NULL
+                    WHERE trozos IS NOT NULL AND contenido IS NOT NULL
+                ''')
+            conn.commit()
+        return borrados
+
+    def hashes(self):
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT hash FROM ticket_blobs')
+                return [fila[0] for fila in cursor.fetchall()]
+
+
+class FilesystemBlobStore(BlobStore):
+    """Blobs como archivos en disco: <ruta>/<ab>/<hash>"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        os.makedirs(ruta, exist_ok=True)
+
+    def _ruta_blob(self, hash_blob):
+        return os.path.join(self.ruta, hash_blob[:2], hash_blob)
+
+    def guardar_stream(self, origen, maximo=None):
+        # Escribir a un temporal y renombrar: nunca queda un blob a medias
+        sha = hashlib.sha256()
+        fd, temporal = tempfile.mkstemp(dir=self.ruta)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for trozo in _trozos(origen, maximo):
+                    sha.update(trozo)
+                    f.write(trozo)
+            hash_blob = sha.hexdigest()
+            destino = self._ruta_blob(hash_blob)
+            if os.path.exists(destino):
+                os.unlink(temporal)
+                return hash_blob
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+        except Exception:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+        return hash_blob
+
+    def abrir(self, hash_blob):
+        with open(self._ruta_blob(hash_blob), 'rb') as f:
+            while True:
+                trozo = f.read(TAMANO_TROZO)
+                if not trozo:
+                    return
+                yield trozo
+
+    def existe(self, hash_blob):
+        return os.path.exists(self._ruta_blob(hash_blob))
+
+    def eliminar(self, hash_blob):
+        try:
+            os.unlink(self._ruta_blob(hash_blob))
+        except FileNotFoundError:
+            pass
+
+    def hashes(self):
+        encontrados = []
+        for carpeta in os.listdir(self.ruta):
+            subruta = os.path.join(self.ruta, carpeta)
+            if os.path.isdir(subruta):
+                encontrados.extend(
+                    nombre for nombre in os.listdir(subruta) if len(nombre) == 64
+                )
+        return encontrados
+
+
+@st.cache_resource
+def obtener_blob_store():
+    """Backend configurado en Secrets, compartido por el proceso"""
+    config = st.secrets.get("blobs", {})
+    if config.get("backend", "postgres") == "filesystem":
+        return FilesystemBlobStore(config.get("ruta", "adjuntos"))
+    return PostgresBlobStore(comprimir=config.get("comprimir", True))
+
+
+# ============================================================
+# MANTENIMIENTO
+# ============================================================
+
+def migrar_adjuntos(lote=50):
+    """Mover tickets.archivo_binario al almacén, por lotes
+
+    Corre en la migración 8: en Postgres escribe el formato de ese momento,
+    todo el contenido en ticket_blobs.contenido, sin trozos ni códec
+    (recomprimir_blobs los pasa después a trozos). Sin límite de tamaño.
+    Devuelve la cantidad de tickets migrados.
+    """
+    store = obtener_blob_store()
+    postgres = isinstance(store, PostgresBlobStore)
+    migrados = 0
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    SELECT id, archivo_binario FROM tickets
+                    WHERE archivo_binario IS NOT NULL AND archivo_hash IS NULL
+                    LIMIT %s
+                ''', (lote,))
+                filas = cursor.fetchall()
+                if not filas:
+                    return migrados
+                for ticket_id, archivo_binario in filas:
+                    contenido = bytes(archivo_binario)
+                    if postgres:
+                        hash_blob = calcular_hash(contenido)
+                        cursor.execute('''
+                            INSERT INTO ticket_blobs (hash, contenido, tamano) VALUES (%s, %s, %s)
+                            ON CONFLICT (hash) DO NOTHING
+                        ''', (hash_blob, contenido, len(contenido)))
+                    else:
+                        hash_blob = store.guardar(contenido)
+                    cursor.execute('''
+                        UPDATE tickets SET archivo_hash = %s, archivo_binario = NULL
+                        WHERE id = %s
+                    ''', (hash_blob, ticket_id))
+            conn.commit()
+        migrados += len(filas)
+
+
+def limpiar_huerfanos():
+    """Eliminar blobs que ya no referencia ningún ticket
+
+    Correr fuera de horario: un adjunto recién guardado cuyo ticket aún no
+    se insertó también se consideraría huérfano, y una descarga empezada
+    antes de una recompresión pierde los trozos viejos que está leyendo.
+    """
+    store = obtener_blob_store()
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT DISTINCT archivo_hash FROM tickets WHERE archivo_hash IS NOT NULL')
+            referenciados = {fila[0] for fila in cursor.fetchall()}
+    huerfanos = [h for h in store.hashes() if h not in referenciados]
+    for hash_blob in huerfanos:
+        store.eliminar(hash_blob)
+    if isinstance(store, PostgresBlobStore):
+        store.limpiar_versiones()
+    return len(huerfanos)
+
+
+def recomprimir_blobs(lote=20):
+    """Comprimir por lotes los blobs guardados antes de los códecs
+
+    Cada blob se reescribe en su propia transacción. Devuelve la cantidad.
+    """
+    store = obtener_blob_store()
+    if not isinstance(store, PostgresBlobStore):
+        return 0
+    recomprimidos = 0
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT hash FROM ticket_blobs WHERE codec IS NULL LIMIT %s', (lote,))
+                pendientes = [fila[0] for fila in cursor.fetchall()]
+        if not pendientes:
+            return recomprimidos
+        for hash_blob in pendientes:
+            store.recomprimir(hash_blob)
+        recomprimidos += len(pendientes)
+
+
+def estadisticas_compresion():
+    """Por códec: blobs, bytes originales y guardados, ratio y ms de compresión
+
+    Incluye los trozos descomprimidos por este proceso y su tiempo.
+    """
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT COALESCE(codec, 'sin procesar'), COUNT(*), COALESCE(SUM(tamano), 0)::bigint,
+                       COALESCE(SUM(COALESCE(tamano_guardado, tamano)), 0)::bigint,
+                       AVG(segundos_codec) * 1000
+                FROM ticket_blobs
+                GROUP BY 1
+                ORDER BY 1
+            ''')
+            filas = cursor.fetchall()
+    codecs = {
+        codec: {
+            'blobs': blobs,
+            'mb': round(tamano / 1024 / 1024, 2),
+            'mb_guardados': round(guardado / 1024 / 1024, 2),
+            'ratio': round(tamano / guardado, 2) if guardado else None,
+            'ms_compresion': round(ms, 1) if ms is not None else None,
+        }
+        for codec, blobs, tamano, guardado, ms in filas
+    }
+    store = obtener_blob_store()
+    lectura = {'trozos': 0, 'ms_descompresion': 0.0}
+    if isinstance(store, PostgresBlobStore):
+        lectura = {
+            'trozos': store.trozos_leidos,
+            'ms_descompresion': round(store.segundos_descompresion * 1000, 1),
+        }
+    return {'codecs': codecs, 'lectura': lectura}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacén de adjuntos")
+    parser.add_argument("--recomprimir", action="store_true", help="comprimir los blobs anteriores a los códecs")
+    args = parser.parse_args()
+
+    if args.recomprimir:
+        print(f"Blobs recomprimidos: {recomprimir_blobs()}")
+    else:
+        print(f"Blobs huérfanos eliminados: {limpiar_huerfanos()}")
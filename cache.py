@@ -0,0 +1,68 @@
+"""
+CACHÉ LRU DE BYTES
+Cache en memoria acotada por tamaño total, compartida entre sesiones
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRUBytes:
+    """LRU thread-safe limitada por la suma de bytes guardados"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+
+    def obtener(self, clave):
+        """Valor guardado o None; marca la clave como usada recientemente"""
+        with self._lock:
+            if clave not in self._datos:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return self._datos[clave][0]
+
+    def guardar(self, clave, valor, tamano):
+        """Guardar `valor` ocupando `tamano` bytes; no guarda si excede el máximo"""
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self._bytes -= self._datos.pop(clave)[1]
+            self._datos[clave] = (valor, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, tamano_viejo) = self._datos.popitem(last=False)
+                self._bytes -= tamano_viejo
+                self.desalojos += 1
+
+    def invalidar(self, clave):
+        with self._lock:
+            entrada = self._datos.pop(clave, None)
+            if entrada:
+                self._bytes -= entrada[1]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'desalojos': self.desalojos,
+                'entradas': len(self._datos),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
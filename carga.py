@@ -0,0 +1,552 @@
+"""
+PRUEBA DE CARGA DE LAS PÁGINAS
+Sesiones concurrentes por rol manejadas con AppTest sobre app.py: login,
+listado de tickets, detalle de un ticket, comentario y (usuarios) subida
+de un Excel. El backend HTTP es un servidor local simulado y los tickets
+van a una base local: SQLite temporal (por defecto, ver repositorio.py)
+o un Postgres de pruebas indicado con --dsn. La prueba migra, siembra,
+comenta y borra tickets: se niega a correr contra el database_url de
+Secrets, que es el de la app.
+
+    python carga.py --admins 5 --usuarios 20 --iteraciones 3
+    python carga.py --backend postgres --dsn postgresql://localhost/carga --admins 10 --latencia-api 80
+
+Reporta p50/p95/p99 de cada rerun por rol y acción, el RSS máximo del
+proceso y el máximo de conexiones abiertas a la base.
+
+Cada sesión corre en su propio proceso (AppTest cambia secrets y config
+globales en cada run, no admite runs simultáneos en un mismo proceso) y
+todas arrancan juntas. Los cache_resource, incluido el pool de
+conexiones, quedan por sesión: el máximo de conexiones abiertas es el de
+N procesos servidores, no el del pool compartido de un solo servidor.
+Con Postgres se informa además el máximo de conexiones en uso a la vez
+(consultando o dentro de una transacción), que es lo que ese pool
+compartido tendría prestado.
+
+AppTest no puede marcar filas de un dataframe ni adjuntar archivos: la
+prueba reemplaza st.dataframe y st.file_uploader por versiones que
+devuelven lo que la sesión simulada dejó en session_state.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from streamlit.runtime.secrets import Secrets
+
+from ingesta import COLUMNAS_FILAS
+from repositorio import PostgresRepositorio, SqliteRepositorio
+
+PAGINAS = {
+    'ADMIN': 'pages/admin.py',
+    'USER': 'pages/ticketera_user.py',
+}
+PERCENTILES = [50, 95, 99]
+
+# ============================================================
+# BACKEND SIMULADO
+# ============================================================
+
+class _BackendSimulado(BaseHTTPRequestHandler):
+    """Login para cualquier usuario (rol según el prefijo) y 200 para el resto"""
+
+    latencia = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo):
+        time.sleep(self.latencia)
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer(self):
+        largo = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(largo) or b'{}')
+
+    def do_POST(self):
+        datos = self._leer()
+        if self.path == '/auth/login':
+            usuario = datos.get('usuario', '')
+            rol = 'ADMIN' if usuario.startswith('carga_admin') else 'USER'
+            self._responder(201, {
+                'access_token': uuid.uuid4().hex,
+                'user': {'usuario': usuario, 'rol': rol, 'nombre': usuario},
+            })
+        else:
+            self._responder(201, datos)
+
+    def do_PUT(self):
+        self._responder(200, self._leer())
+
+    def do_GET(self):
+        self._responder(200, [])
+
+
+def iniciar_backend_simulado(latencia_ms=0):
+    """Servidor HTTP en un puerto libre; devuelve su URL"""
+    manejador = type('BackendSimulado', (_BackendSimulado,), {'latencia': latencia_ms / 1000})
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), manejador)
+    threading.Thread(target=servidor.serve_forever, name="backend-simulado", daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}"
+
+
+# ============================================================
+# DATOS
+# ============================================================
+
+def excel_de_prueba(filas=50):
+    """Bytes de un Excel con el formato de la ticketera"""
+    df = pd.DataFrame({
+        col: [f"{col.lower()} {i}" for i in range(filas)] for col in COLUMNAS_FILAS
+    })
+    df['DNI'] = [str(10_000_000 + i) for i in range(filas)]
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def sembrar_tickets(repositorio, usuarios, cantidad, comentarios=7):
+    """`cantidad` tickets repartidos entre `usuarios`, con adjunto y comentarios
+
+    Más de 5 comentarios por ticket para que exista "Ver historial completo".
+    """
+    excel = excel_de_prueba()
+    df = pd.read_excel(io.BytesIO(excel))
+    vista_previa = None
+    if repositorio.extras:
+        from vistas_previas import generar_vista_previa
+        vista_previa = generar_vista_previa(df)
+    inicio = datetime.now(timezone.utc) - timedelta(days=cantidad)
+    for i in range(cantidad):
+        fecha = inicio + timedelta(days=i)
+        ticket = {
+            'id': f"c{uuid.uuid4().hex[:7]}",
+            'titulo': f"Ticket de carga {i}",
+            'descripcion': "Generado por carga.py",
+            'usuario': usuarios[i % len(usuarios)],
+            'estado': random.choice(['Abierto', 'En Progreso', 'Cerrado']),
+            'fecha_creacion': fecha,
+            'fecha_actualizacion': fecha,
+            'nombre_archivo': 'carga.xlsx',
+            'cantidad_registros': len(df),
+        }
+        repositorio.guardar_ticket(ticket, io.BytesIO(excel), vista_previa, df if repositorio.extras else None)
+        for n in range(comentarios):
+            repositorio.agregar_comentario(ticket['id'], ticket['usuario'], f"Comentario {n}")
+
+
+def limpiar_tickets(repositorio, usuarios):
+    """Eliminar los tickets de los usuarios de la prueba; devuelve cuántos"""
+    ids = []
+    for usuario in usuarios:
+        tickets, _, _ = repositorio.cambios_desde(None, usuario=usuario, incluir_archivados=True)
+        ids += [t['id'] for t in tickets]
+    return len(repositorio.eliminar_tickets(ids)) if ids else 0
+
+
+# ============================================================
+# WIDGETS SIMULADOS
+# ============================================================
+
+class ArchivoSimulado(io.BytesIO):
+    """Lo que devuelve st.file_uploader: BytesIO con name y size"""
+
+    def __init__(self, contenido, nombre):
+        super().__init__(contenido)
+        self.name = nombre
+        self.size = len(contenido)
+
+
+def parchear_streamlit():
+    """st.dataframe y st.file_uploader devuelven lo pedido por la sesión simulada"""
+    dataframe_original = st.dataframe
+    file_uploader_original = st.file_uploader
+
+    def dataframe(*args, **kwargs):
+        resultado = dataframe_original(*args, **kwargs)
+        if kwargs.get('on_select') == 'rerun':
+            filas = st.session_state.get('_carga_filas', [])
+            return SimpleNamespace(selection=SimpleNamespace(rows=filas))
+        return resultado
+
+    def file_uploader(*args, **kwargs):
+        resultado = file_uploader_original(*args, **kwargs)
+        archivo = st.session_state.get('_carga_archivo')
+        if archivo is not None:
+            return ArchivoSimulado(*archivo)
+        return resultado
+
+    st.dataframe = dataframe
+    st.file_uploader = file_uploader
+
+
+# ============================================================
+# SESIONES
+# ============================================================
+
+class SesionSimulada:
+    """Una sesión de navegador: un AppTest de app.py con su propio session_state"""
+
+    def __init__(self, rol, usuario, secretos, timeout):
+        self.rol = rol
+        self.usuario = usuario
+        self.at = AppTest.from_file('app.py', default_timeout=timeout)
+        self.at.secrets.update(secretos)
+        self.tiempos = []
+        self.errores = []
+
+    def _rerun(self, accion):
+        inicio = time.perf_counter()
+        try:
+            self.at.run()
+        except Exception as e:
+            self.errores.append((accion, f"{type(e).__name__}: {e}"))
+            return False
+        finally:
+            self.tiempos.append((accion, time.perf_counter() - inicio))
+        fallas = [str(e.value) for e in self.at.exception] + [str(e.value) for e in self.at.error]
+        self.errores.extend((accion, falla) for falla in fallas)
+        return not fallas
+
+    def _ticket_visible(self):
+        # Primer área de comentario de la página: detalle (admin) o primer ticket (usuario)
+        for area in self.at.text_area:
+            if area.key and area.key.startswith('comentario_') and area.key != 'comentario_masivo':
+                return area.key.removeprefix('comentario_')
+        return None
+
+    def login(self):
+        self._rerun('inicio')
+        self.at.text_input[0].input(self.usuario)
+        self.at.text_input[1].input('carga')
+        self.at.button[0].click()
+        return self._rerun('login')
+
+    def listar(self):
+        self.at.switch_page(PAGINAS[self.rol])
+        self._rerun('listar')
+
+    def abrir_ticket(self):
+        if self.rol == 'ADMIN':
+            if not self.at.dataframe:
+                return
+            filas = len(self.at.dataframe[0].value)
+            self.at.session_state['_carga_filas'] = [random.randrange(filas)]
+            self._rerun('abrir')
+        else:
+            ticket_id = self._ticket_visible()
+            historial = [t for t in self.at.toggle if t.key == f"historial_{ticket_id}"]
+            if historial:
+                historial[0].set_value(not historial[0].value)
+                self._rerun('abrir')
+
+    def comentar(self):
+        ticket_id = self._ticket_visible()
+        if ticket_id is None:
+            return
+        self.at.text_area(key=f"comentario_{ticket_id}").input(f"Comentario de carga {uuid.uuid4().hex[:6]}")
+        self.at.button(key=f"btn_comentario_{ticket_id}").click()
+        self._rerun('comentar')
+
+    def subir(self, excel):
+        self.at.session_state['_carga_archivo'] = (excel, 'carga.xlsx')
+        titulo = [t for t in self.at.text_input if t.label.startswith('📌')]
+        crear = [b for b in self.at.button if b.label.startswith('✅ Crear')]
+        if titulo and crear:
+            titulo[0].input(f"Subida de carga {uuid.uuid4().hex[:6]}")
+            crear[0].click()
+            self._rerun('subir')
+        self.at.session_state['_carga_archivo'] = None
+
+    def recorrer(self, iteraciones, excel):
+        if not self.login():
+            return self
+        for _ in range(iteraciones):
+            self.listar()
+            self.abrir_ticket()
+            self.comentar()
+            if self.rol == 'USER':
+                self.subir(excel)
+        return self
+
+
+# ============================================================
+# MONITOREO
+# ============================================================
+
+def _procesos():
+    """Este proceso y sus sesiones vivas"""
+    return [os.getpid()] + [p.pid for p in multiprocessing.active_children()]
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class Monitor:
+    """Muestrea el RSS total y las conexiones abiertas a la base durante la prueba"""
+
+    def __init__(self, contar_conexiones, intervalo=0.1):
+        self.contar_conexiones = contar_conexiones
+        self.intervalo = intervalo
+        self.rss_inicial = _rss_mb(os.getpid())
+        self.rss_max = self.rss_inicial
+        self.conexiones_max = {}
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="monitor-carga", daemon=True)
+
+    def _bucle(self):
+        while not self._fin.wait(self.intervalo):
+            self.rss_max = max(self.rss_max, sum(_rss_mb(pid) for pid in _procesos()))
+            try:
+                for clave, cantidad in self.contar_conexiones().items():
+                    self.conexiones_max[clave] = max(self.conexiones_max.get(clave, 0), cantidad)
+            except Exception:
+                pass
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+
+
+def contador_sqlite(ruta):
+    """{'abiertas'}: descriptores sobre el archivo SQLite en todos los procesos de la prueba"""
+    ruta = os.path.realpath(ruta)
+
+    def contar():
+        abiertos = 0
+        for pid in _procesos():
+            try:
+                descriptores = os.listdir(f'/proc/{pid}/fd')
+            except OSError:
+                continue
+            for fd in descriptores:
+                try:
+                    if os.readlink(f'/proc/{pid}/fd/{fd}') == ruta:
+                        abiertos += 1
+                except OSError:
+                    pass
+        return {'abiertas': abiertos}
+    return contar
+
+
+def contador_postgres(dsn):
+    """{'abiertas', 'en_uso'} según pg_stat_activity, sin contar la del monitor
+
+    Una conexión prestada por el pool está consultando o dentro de una
+    transacción; las libres quedan 'idle'.
+    """
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+
+    def contar():
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE state <> 'idle') FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid()
+                  AND backend_type = 'client backend'
+            ''')
+            abiertas, en_uso = cursor.fetchone()
+            return {'abiertas': abiertas, 'en_uso': en_uso}
+    return contar
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def _correr_sesion(rol, usuario, secretos, timeout, iteraciones, excel, barrera, resultados):
+    """Proceso de una sesión: espera a las demás, recorre y devuelve sus tiempos"""
+    import logging
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    parchear_streamlit()
+    sesion = SesionSimulada(rol, usuario, secretos, timeout)
+    try:
+        barrera.wait()
+        sesion.recorrer(iteraciones, excel)
+    except Exception as e:
+        sesion.errores.append(('sesion', f"{type(e).__name__}: {e}"))
+    finally:
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        resultados.put((rol, usuario, sesion.tiempos, sesion.errores, rss_mb))
+
+
+def reporte(sesiones):
+    """DataFrame por rol y acción: reruns, errores y percentiles en ms"""
+    filas = []
+    for rol in PAGINAS:
+        por_accion = {}
+        errores = {}
+        for rol_sesion, _, tiempos, fallas, _ in sesiones:
+            if rol_sesion != rol:
+                continue
+            for accion, segundos in tiempos:
+                por_accion.setdefault(accion, []).append(segundos * 1000)
+            for accion, _ in fallas:
+                errores[accion] = errores.get(accion, 0) + 1
+        for accion, tiempos in por_accion.items():
+            fila = {'rol': rol, 'accion': accion, 'reruns': len(tiempos), 'errores': errores.get(accion, 0)}
+            for p, valor in zip(PERCENTILES, np.percentile(tiempos, PERCENTILES)):
+                fila[f'p{p}_ms'] = round(float(valor), 1)
+            filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def _secretos_app():
+    try:
+        return dict(st.secrets)
+    except FileNotFoundError:
+        return {}
+
+
+def _usar_secretos(secretos):
+    """Como AppTest: st.secrets de este proceso pasa a ser `secretos`"""
+    nuevos = Secrets()
+    nuevos._secrets = secretos
+    st.secrets = nuevos
+
+
+def correr_carga(admins, usuarios, iteraciones, backend='sqlite', tickets=100, latencia_api=0,
+                 timeout=120, conservar=False, dsn=None):
+    """Correr la prueba y devolver (reporte, resumen de recursos, errores)
+
+    Con backend 'postgres', `dsn` es obligatorio y no puede ser el
+    database_url de Secrets.
+    """
+    secretos_app = _secretos_app()
+    if backend == 'postgres':
+        if not dsn:
+            raise ValueError("El backend postgres requiere un dsn de pruebas")
+        if dsn == secretos_app.get('database_url'):
+            raise ValueError("El dsn es el database_url de Secrets: usar una base de pruebas")
+    secretos = {'API_URL': iniciar_backend_simulado(latencia_api)}
+    nombres_usuarios = [f"carga_user{i}" for i in range(max(usuarios, 1))]
+    temporal = None
+    if backend == 'sqlite':
+        temporal = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
+        temporal.close()
+        repositorio = SqliteRepositorio(temporal.name)
+        secretos['repositorio'] = {'backend': 'sqlite', 'ruta': temporal.name}
+        contar_conexiones = contador_sqlite(temporal.name)
+    else:
+        secretos['database_url'] = dsn
+        for seccion in ('db_pool', 'blobs'):
+            if seccion in secretos_app:
+                secretos[seccion] = dict(secretos_app[seccion])
+        # Migrar, sembrar y limpiar también van contra el dsn
+        _usar_secretos(dict(secretos))
+        from migraciones import aplicar_migraciones
+        aplicar_migraciones()
+        repositorio = PostgresRepositorio()
+        contar_conexiones = contador_postgres(dsn)
+
+    sembrar_tickets(repositorio, nombres_usuarios, tickets)
+    excel = excel_de_prueba()
+    roles = [('ADMIN', f"carga_admin{i}") for i in range(admins)]
+    roles += [('USER', nombre) for nombre in nombres_usuarios[:usuarios]]
+
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(len(roles) + 1)
+    resultados = contexto.Queue()
+    procesos = [
+        contexto.Process(
+            target=_correr_sesion,
+            args=(rol, usuario, secretos, timeout, iteraciones, excel, barrera, resultados),
+            name=f"sesion-{usuario}",
+        )
+        for rol, usuario in roles
+    ]
+    sesiones = []
+    try:
+        for proceso in procesos:
+            proceso.start()
+        # El monitor arranca cuando todas las sesiones terminaron de importar
+        barrera.wait(timeout)
+        with Monitor(contar_conexiones) as monitor:
+            sesiones = [resultados.get() for _ in procesos]
+            for proceso in procesos:
+                proceso.join()
+    finally:
+        for proceso in procesos:
+            if proceso.is_alive():
+                proceso.terminate()
+        if not conservar:
+            limpiar_tickets(repositorio, nombres_usuarios)
+            if temporal is not None:
+                for sufijo in ('', '-wal', '-shm'):
+                    if os.path.exists(temporal.name + sufijo):
+                        os.unlink(temporal.name + sufijo)
+
+    recursos = {
+        'rss_inicial_mb': round(monitor.rss_inicial, 1),
+        'rss_max_mb': round(monitor.rss_max, 1),
+        'rss_max_sesion_mb': round(max((s[4] for s in sesiones), default=0), 1),
+        'conexiones_max': monitor.conexiones_max.get('abiertas', 0),
+        'conexiones_en_uso_max': monitor.conexiones_max.get('en_uso'),
+    }
+    errores = [(rol, usuario, accion, falla) for rol, usuario, _, fallas, _ in sesiones for accion, falla in fallas]
+    return reporte(sesiones), recursos, errores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de las páginas de tickets")
+    parser.add_argument("--admins", type=int, default=2, help="sesiones concurrentes de ADMIN")
+    parser.add_argument("--usuarios", type=int, default=5, help="sesiones concurrentes de USER")
+    parser.add_argument("--iteraciones", type=int, default=3, help="vueltas de listar/abrir/comentar/subir")
+    parser.add_argument("--backend", choices=['sqlite', 'postgres'], default='sqlite')
+    parser.add_argument("--dsn", help="Postgres de pruebas (obligatorio con --backend postgres)")
+    parser.add_argument("--tickets", type=int, default=100, help="tickets sembrados antes de empezar")
+    parser.add_argument("--latencia-api", type=int, default=0, help="ms de demora del backend simulado")
+    parser.add_argument("--timeout", type=int, default=120, help="segundos máximos por rerun")
+    parser.add_argument("--conservar", action="store_true", help="no borrar los tickets de la prueba")
+    args = parser.parse_args()
+    if args.backend == 'postgres' and not args.dsn:
+        parser.error("--backend postgres requiere --dsn de una base de pruebas")
+
+    tabla, recursos, errores = correr_carga(
+        args.admins, args.usuarios, args.iteraciones, args.backend, args.tickets,
+        args.latencia_api, args.timeout, args.conservar, args.dsn
+    )
+    print(tabla.to_string(index=False))
+    print(f"\nRSS: {recursos['rss_inicial_mb']} MB al inicio, {recursos['rss_max_mb']} MB máximo en total, "
+          f"{recursos['rss_max_sesion_mb']} MB máximo por sesión")
+    print(f"Conexiones abiertas a la base: {recursos['conexiones_max']} máximo (un pool por sesión)")
+    if recursos['conexiones_en_uso_max'] is not None:
+        print(f"Conexiones en uso a la vez: {recursos['conexiones_en_uso_max']} máximo")
+    if errores:
+        print(f"\nErrores ({len(errores)}):")
+        for rol, usuario, accion, falla in errores[:20]:
+            print(f"  {rol} {usuario} {accion}: {falla[:200]}")
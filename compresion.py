@@ -0,0 +1,53 @@
+"""
+CÓDECS DE COMPRESIÓN DE ADJUNTOS
+zstd (vía pyarrow) si está disponible, si no gzip. El códec se elige por
+el tipo de contenido, reconocido por la firma de sus primeros bytes: los
+.xlsx ya son ZIP y se guardan tal cual; los .xls (OLE2), CSV y texto
+comprimen bien.
+"""
+
+import gzip
+
+import pyarrow as pa
+
+NINGUNO = 'ninguno'
+CODEC_COMPRIMIDO = 'zstd' if pa.Codec.is_available('zstd') else 'gzip'
+NIVELES = {'zstd': 3, 'gzip': 6}
+
+# Firma de los primeros bytes -> si vale la pena comprimir
+FIRMAS = [
+    (b'PK\x03\x04', False),          # xlsx / zip
+    (b'\xd0\xcf\x11\xe0', True),     # xls (OLE2)
+    (b'\x1f\x8b', False),            # gzip
+    (b'(\xb5/\xfd', False),          # zstd
+    (b'\x89PNG', False),
+    (b'\xff\xd8\xff', False),        # jpeg
+]
+
+_zstd = pa.Codec('zstd', compression_level=NIVELES['zstd']) if CODEC_COMPRIMIDO == 'zstd' else None
+
+
+def elegir_codec(inicio):
+    """Códec para un contenido que empieza con los bytes `inicio`"""
+    for firma, comprimible in FIRMAS:
+        if inicio.startswith(firma):
+            return CODEC_COMPRIMIDO if comprimible else NINGUNO
+    return CODEC_COMPRIMIDO
+
+
+def comprimir(codec, datos):
+    if codec == 'zstd':
+        return _zstd.compress(datos, asbytes=True)
+    if codec == 'gzip':
+        return gzip.compress(datos, compresslevel=NIVELES['gzip'])
+    return datos
+
+
+def descomprimir(codec, datos, tamano):
+    """`tamano` es el de los datos originales (zstd de pyarrow lo exige)"""
+    if codec == 'zstd':
+        return pa.decompress(datos, decompressed_size=tamano, codec='zstd', asbytes=True)
+    if codec == 'gzip':
+        return gzip.decompress(datos)
+    return datos
+
@@ -0,0 +1,176 @@
+"""
+CONEXIÓN COMPARTIDA A POSTGRESQL
+Pool de conexiones por proceso, reutilizado por todas las sesiones de Streamlit
+
+Configuración opcional en Secrets:
+
+    [db_pool]
+    minconn = 1
+    maxconn = 10
+    timeout_checkout = 10      # segundos esperando una conexión libre
+    health_check = true        # SELECT 1 antes de entregar una conexión inactiva
+    inactividad_check = 30     # segundos sin uso a partir de los cuales se verifica
+    reciclar_segundos = 1800   # cerrar conexiones con más antigüedad
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+import streamlit as st
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+
+POOL_DEFAULTS = {
+    'minconn': 1,
+    'maxconn': 10,
+    'timeout_checkout': 10,
+    'health_check': True,
+    'inactividad_check': 30,
+    'reciclar_segundos': 1800,
+}
+
+
+class PoolAgotadoError(Exception):
+    """No se consiguió una conexión libre dentro del timeout"""
+
+
+# ============================================================
+# POOL DE CONEXIONES
+# ============================================================
+
+class PoolConexiones:
+    """Pool thread-safe con timeout de checkout y health check"""
+
+    def __init__(self, dsn, minconn, maxconn, timeout_checkout, health_check, inactividad_check,
+                 reciclar_segundos):
+        self.timeout_checkout = timeout_checkout
+        self.health_check = health_check
+        self.inactividad_check = inactividad_check
+        self.reciclar_segundos = reciclar_segundos
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        # ThreadedConnectionPool falla de inmediato cuando está lleno;
+        # el semáforo hace esperar hasta timeout_checkout
+        self._semaforo = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._creadas = {}
+        self._devueltas = {}
+
+    def _conexion_sana(self, conn, verificar=False):
+        """`verificar` fuerza el SELECT 1 aunque la conexión se haya usado hace poco"""
+        if conn.closed:
+            return False
+        ahora = time.monotonic()
+        creada = self._creadas.get(id(conn))
+        if creada and ahora - creada > self.reciclar_segundos:
+            return False
+        if not self.health_check:
+            return True
+        # Solo las que pasaron un rato sin uso pueden haber caído en silencio
+        devuelta = self._devueltas.get(id(conn))
+        if not verificar and (devuelta is None or ahora - devuelta < self.inactividad_check):
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def obtener(self):
+        """Sacar una conexión del pool esperando como máximo timeout_checkout"""
+        if not self._semaforo.acquire(timeout=self.timeout_checkout):
+            raise PoolAgotadoError(
+                f"Sin conexiones libres tras {self.timeout_checkout}s"
+            )
+        try:
+            conn = self._pool.getconn()
+            if not self._conexion_sana(conn):
+                # El reemplazo puede ser otra conexión vieja del pool: se verifica siempre
+                self._descartar(conn)
+                conn = self._pool.getconn()
+                if not self._conexion_sana(conn, verificar=True):
+                    self._descartar(conn)
+                    raise psycopg2.OperationalError("No se obtuvo una conexión sana del pool")
+            with self._lock:
+                self._creadas.setdefault(id(conn), time.monotonic())
+            return conn
+        except Exception:
+            self._semaforo.release()
+            raise
+
+    def devolver(self, conn, cerrar=False):
+        """Devolver una conexión; las rotas se cierran en vez de reutilizarse"""
+        try:
+            if cerrar or conn.closed:
+                self._descartar(conn)
+            else:
+                with self._lock:
+                    self._devueltas[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._semaforo.release()
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._creadas.pop(id(conn), None)
+            self._devueltas.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def estadisticas(self):
+        """Conexiones abiertas y en uso"""
+        return {
+            'abiertas': len(self._pool._pool) + len(self._pool._used),
+            'en_uso': len(self._pool._used),
+            'maximo': self._pool.maxconn,
+        }
+
+    def cerrar(self):
+        self._pool.closeall()
+
+
+@st.cache_resource
+def obtener_pool():
+    """Pool único por proceso, compartido entre sesiones"""
+    config = dict(POOL_DEFAULTS)
+    config.update(st.secrets.get("db_pool", {}))
+    return PoolConexiones(st.secrets["database_url"], **config)
+
+
+@contextmanager
+def conexion():
+    """Prestar una conexión del pool durante el bloque `with`
+
+    La conexión vuelve al pool al salir; lo no confirmado se descarta.
+    """
+    # Fuera de una sesión (CLI, hilos) st.stop() no corta: se relanza el error
+    try:
+        pool_conexiones = obtener_pool()
+        conn = pool_conexiones.obtener()
+    except KeyError:
+        st.error("❌ Error: variable 'database_url' no encontrada en Secrets")
+        st.info("Agrega tu URL de Supabase en Settings → Secrets con el nombre 'database_url'")
+        st.stop()
+        raise
+    except PoolAgotadoError as e:
+        st.error(f"❌ BD ocupada: {str(e)}")
+        st.stop()
+        raise
+    except psycopg2.OperationalError as e:
+        st.error(f"❌ Error de conexión a la BD: {str(e)}")
+        st.stop()
+        raise
+
+    cerrar = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        cerrar = True
+        raise
+    finally:
+        pool_conexiones.devolver(conn, cerrar=cerrar)
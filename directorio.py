@@ -0,0 +1,181 @@
+"""
+DIRECTORIO DE USUARIOS
+Lista de usuarios del backend cacheada por proceso y compartida entre las
+sesiones de admin. Se revalida con ETag/Last-Modified cuando el backend
+los envía (304 no trae cuerpo) y con un TTL cuando no. Las escrituras
+hechas desde aquí invalidan la caché en el acto.
+
+La copia compartida solo se entrega a tokens que el backend aceptó en los
+últimos `revalidar` segundos; con un token nuevo se hace un GET condicional
+con ese token (304 si la lista no cambió) y un rechazo devuelve None.
+
+El lock solo cubre la decisión de consultar: mientras un hilo espera al
+backend, el resto recibe la lista que ya hay (o espera si no hay ninguna).
+
+Configuración opcional en Secrets:
+
+    [directorio]
+    revalidar = 10   # segundos sin preguntar al backend si hay validadores,
+                     # y los que vale un token ya aceptado
+    ttl = 60         # segundos de vida si el backend no envía validadores
+"""
+
+import hashlib
+import threading
+import time
+
+import streamlit as st
+
+from api import cliente_api
+
+DIRECTORIO_DEFAULTS = {
+    'revalidar': 10,
+    'ttl': 60,
+}
+
+
+class DirectorioUsuarios:
+    """Caché de GET /users con GET condicional"""
+
+    def __init__(self, revalidar, ttl):
+        self.revalidar = revalidar
+        self.ttl = ttl
+        self._usuarios = None
+        self._etag = None
+        self._modificado = None
+        self._validado = 0
+        # Huella de cada token aceptado por el backend -> cuándo
+        self._tokens = {}
+        self._consultando = False
+        # Sube con cada invalidación: una respuesta pedida antes no se guarda
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._listo = threading.Condition(self._lock)
+        self.aciertos = 0
+        self.revalidaciones = 0
+        self.descargas = 0
+
+    def _vigente(self):
+        if self._usuarios is None:
+            return False
+        vida = self.revalidar if (self._etag or self._modificado) else self.ttl
+        return time.monotonic() - self._validado < vida
+
+    def _token_aceptado(self, huella):
+        aceptado = self._tokens.get(huella)
+        return aceptado is not None and time.monotonic() - aceptado < self.revalidar
+
+    def _aceptar_token(self, huella):
+        ahora = time.monotonic()
+        self._tokens = {h: t for h, t in self._tokens.items() if ahora - t < self.revalidar}
+        self._tokens[huella] = ahora
+
+    def obtener(self, token):
+        """Lista de usuarios, o None si el backend respondió con error"""
+        huella = hashlib.sha256((token or '').encode()).hexdigest()
+        with self._lock:
+            # Un solo hilo consulta al backend; el resto usa lo que hay si
+            # su token ya fue aceptado
+            while True:
+                if self._usuarios is not None and self._token_aceptado(huella) and (
+                        self._vigente() or self._consultando):
+                    self.aciertos += 1
+                    return self._usuarios
+                if not self._consultando:
+                    break
+                self._listo.wait()
+
+            self._consultando = True
+            usuarios = self._usuarios
+            generacion = self._generacion
+            headers = {}
+            if usuarios is not None:
+                if self._etag:
+                    headers['If-None-Match'] = self._etag
+                if self._modificado:
+                    headers['If-Modified-Since'] = self._modificado
+
+        try:
+            respuesta = cliente_api().get("/users", headers=headers, token=token)
+        except Exception:
+            with self._lock:
+                self._terminar_consulta()
+            raise
+
+        with self._lock:
+            self._terminar_consulta()
+            vigente = generacion == self._generacion
+            if respuesta.status_code == 304 and usuarios is not None:
+                self.revalidaciones += 1
+                self._aceptar_token(huella)
+            elif respuesta.status_code == 200:
+                self._aceptar_token(huella)
+                self.descargas += 1
+                usuarios = respuesta.json()
+                if vigente:
+                    self._usuarios = usuarios
+                    self._etag = respuesta.headers.get('ETag')
+                    self._modificado = respuesta.headers.get('Last-Modified')
+            else:
+                self._tokens.pop(huella, None)
+                return None
+            if vigente:
+                self._validado = time.monotonic()
+            return usuarios
+
+    def _terminar_consulta(self):
+        self._consultando = False
+        self._listo.notify_all()
+
+    def invalidar(self):
+        with self._lock:
+            self._generacion += 1
+            self._usuarios = None
+            self._etag = None
+            self._modificado = None
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'revalidaciones': self.revalidaciones,
+                'descargas': self.descargas,
+                'validadores': bool(self._etag or self._modificado),
+            }
+
+
+@st.cache_resource
+def obtener_directorio():
+    """Directorio único por proceso"""
+    config = dict(DIRECTORIO_DEFAULTS)
+    config.update(st.secrets.get("directorio", {}))
+    return DirectorioUsuarios(**config)
+
+
+# ============================================================
+# OPERACIONES
+# ============================================================
+
+def listar_usuarios(token):
+    return obtener_directorio().obtener(token)
+
+
+def crear_usuario(token, datos):
+    try:
+        return cliente_api().post("/users", json=datos, token=token)
+    finally:
+        obtener_directorio().invalidar()
+
+
+def actualizar_usuario(token, user_id, datos):
+    try:
+        return cliente_api().put("/users/{id}", id=user_id, json=datos, token=token)
+    finally:
+        obtener_directorio().invalidar()
+
+
+def eliminar_usuario(token, user_id):
+    try:
+        return cliente_api().delete("/users/{id}", id=user_id, token=token)
+    finally:
+        obtener_directorio().invalidar()
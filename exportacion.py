@@ -0,0 +1,104 @@
+"""
+EXPORTACIÓN DE TICKETS
+CSV o Parquet escritos trozo a trozo a un archivo temporal, desde el
+cursor del servidor de tickets_db.iterar_tickets: el proceso nunca tiene
+en memoria más de un trozo de filas.
+"""
+
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tickets_db import iterar_tickets, para_descarga
+
+# Columna de BD -> encabezado del archivo
+COLUMNAS_EXPORTACION = {
+    'id': 'ID',
+    'titulo': 'Título',
+    'descripcion': 'Descripción',
+    'usuario': 'Usuario',
+    'estado': 'Estado',
+    'cantidad_registros': 'Registros',
+    'nombre_archivo': 'Archivo',
+    'fecha_creacion': 'Creado',
+    'fecha_actualizacion': 'Actualizado',
+    'comentarios': 'Comentarios',
+}
+
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def _esquema(con_comentarios):
+    # Esquema fijo: un trozo con columnas vacías no cambia los tipos
+    campos = [
+        ('ID', pa.string()),
+        ('Título', pa.string()),
+        ('Descripción', pa.string()),
+        ('Usuario', pa.string()),
+        ('Estado', pa.string()),
+        ('Registros', pa.int64()),
+        ('Archivo', pa.string()),
+        ('Creado', pa.timestamp('us', tz='UTC')),
+        ('Actualizado', pa.timestamp('us', tz='UTC')),
+    ]
+    if con_comentarios:
+        campos.append(('Comentarios', pa.string()))
+    return pa.schema(campos)
+
+
+def _preparar(df):
+    df = df.rename(columns=COLUMNAS_EXPORTACION)
+    # Con NULLs pandas la deja en float: el CSV diría 5.0
+    df['Registros'] = df['Registros'].astype('Int64')
+    for col in ('Creado', 'Actualizado'):
+        df[col] = pd.to_datetime(df[col], utc=True)
+    return df[[col for col in COLUMNAS_EXPORTACION.values() if col in df.columns]]
+
+
+def _escribir_csv(destino, trozos, con_comentarios):
+    filas = 0
+    for df in trozos:
+        df = _preparar(df)
+        for col in ('Creado', 'Actualizado'):
+            df[col] = df[col].dt.strftime('%d/%m/%Y %H:%M:%S')
+        destino.write(df.to_csv(index=False, header=filas == 0).encode('utf-8'))
+        filas += len(df)
+    if not filas:
+        destino.write((','.join(_esquema(con_comentarios).names) + '\n').encode('utf-8'))
+    return filas
+
+
+def _escribir_parquet(destino, trozos, con_comentarios):
+    esquema = _esquema(con_comentarios)
+    filas = 0
+    with pq.ParquetWriter(destino, esquema, compression='zstd') as escritor:
+        for df in trozos:
+            escritor.write_table(pa.Table.from_pandas(_preparar(df), schema=esquema, preserve_index=False))
+            filas += len(df)
+    return filas
+
+
+def exportar_tickets(formato='CSV', estado=None, usuario=None, desde=None, hasta=None,
+                     con_comentarios=False, trozo=5000, incluir_archivados=True):
+    """Archivo temporal de solo lectura con los tickets filtrados
+
+    `formato` es una clave de FORMATOS. Se borra solo al cerrarlo; es un
+    BufferedReader, el tipo que acepta st.download_button (ver
+    tickets_db.para_descarga).
+    """
+    trozos = iterar_tickets(estado, usuario, desde, hasta, con_comentarios, trozo, incluir_archivados)
+    destino = tempfile.TemporaryFile()
+    try:
+        if formato == 'Parquet':
+            _escribir_parquet(destino, trozos, con_comentarios)
+        else:
+            _escribir_csv(destino, trozos, con_comentarios)
+    except Exception:
+        destino.close()
+        raise
+    return para_descarga(destino)
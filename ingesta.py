@@ -0,0 +1,134 @@
+"""
+INGESTA DE FILAS DE ADJUNTOS
+Las filas validadas del Excel se copian a ticket_rows con COPY al crear
+el ticket, para consultarlas y agregarlas en SQL sin releer los Excel.
+
+Tickets anteriores a la ingesta:
+
+    python ingesta.py
+"""
+
+import io
+
+import pandas as pd
+
+from db import conexion
+from lectura_excel import leer_excel
+
+# Columna del Excel -> columna de ticket_rows
+COLUMNAS_FILAS = {
+    'DNI': 'dni',
+    'NOMBRES Y APELLIDOS': 'nombres_apellidos',
+    'ACTIVIDAD': 'actividad',
+    'SUPER': 'super',
+    'FUNDO': 'fundo',
+    'OBSERVACIONES': 'observaciones',
+}
+
+# Columnas por las que se puede agrupar desde la UI
+AGRUPABLES = ['FUNDO', 'ACTIVIDAD', 'SUPER']
+
+
+def _como_texto(serie):
+    # Excel entrega DNIs como float cuando la columna tiene vacíos
+    if pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+        serie = serie.astype('Int64')
+    return serie.astype('string')
+
+
+def copiar_filas(cursor, ticket_id, df):
+    """COPY de las filas de `df` a ticket_rows dentro de la transacción de `cursor`"""
+    datos = pd.DataFrame({col: _como_texto(df[col]) for col in COLUMNAS_FILAS})
+    datos.insert(0, 'fila', range(1, len(datos) + 1))
+    datos.insert(0, 'ticket_id', ticket_id)
+    buffer = io.StringIO()
+    datos.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columnas = ', '.join(['ticket_id', 'fila'] + list(COLUMNAS_FILAS.values()))
+    cursor.copy_expert(f'COPY ticket_rows ({columnas}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+# ============================================================
+# CONSULTAS
+# ============================================================
+
+def buscar_por_dni(dni, limite=100):
+    """Filas de cualquier ticket con ese DNI"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT r.ticket_id, t.usuario, t.estado, r.fila, r.dni, r.nombres_apellidos,
+                       r.actividad, r.super, r.fundo, r.observaciones
+                FROM ticket_rows r
+                JOIN tickets t ON t.id = r.ticket_id
+                WHERE r.dni = %s
+                ORDER BY t.fecha_creacion DESC, r.fila
+                LIMIT %s
+            ''', (dni, limite))
+            columnas = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columnas)
+
+
+def agrupar_filas(columna, estado=None):
+    """Registros y tickets por valor de `columna` (una de AGRUPABLES)"""
+    campo = COLUMNAS_FILAS[columna]
+    filtro, params = '', []
+    if estado:
+        filtro, params = 'WHERE t.estado = %s', [estado]
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT COALESCE(r.{campo}, '(vacío)') AS "{columna}",
+                       COUNT(*) AS "Registros",
+                       COUNT(DISTINCT r.ticket_id) AS "Tickets",
+                       COUNT(DISTINCT r.dni) AS "DNIs"
+                FROM ticket_rows r
+                JOIN tickets t ON t.id = r.ticket_id
+                {filtro}
+                GROUP BY 1
+                ORDER BY 2 DESC
+            ''', params)
+            columnas = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columnas)
+
+
+# ============================================================
+# MANTENIMIENTO
+# ============================================================
+
+def ingestar_pendientes():
+    """Ingerir los adjuntos de tickets que aún no tienen filas en ticket_rows"""
+    from tickets_db import obtener_archivo
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT t.id FROM tickets t
+                WHERE t.nombre_archivo IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM ticket_rows r WHERE r.ticket_id = t.id)
+            ''')
+            pendientes = [fila[0] for fila in cursor.fetchall()]
+
+    ingeridos = 0
+    for ticket_id in pendientes:
+        archivo_binario, _ = obtener_archivo(ticket_id)
+        if not archivo_binario:
+            continue
+        try:
+            df, _ = leer_excel(io.BytesIO(archivo_binario), COLUMNAS_FILAS)
+        except Exception as e:
+            print(f"{ticket_id}: no se pudo leer ({e})")
+            continue
+        if any(col not in df.columns for col in COLUMNAS_FILAS):
+            print(f"{ticket_id}: formato distinto, se omite")
+            continue
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                copiar_filas(cursor, ticket_id, df)
+            conn.commit()
+        ingeridos += 1
+    return ingeridos
+
+
+if __name__ == "__main__":
+    print(f"Tickets ingeridos: {ingestar_pendientes()}")
@@ -0,0 +1,44 @@
+"""
+LECTURA DE EXCEL
+Motor calamine (python-calamine, en Rust) si está instalado; si no,
+openpyxl en modo solo lectura, que es como lo abre pandas. Cada llamada
+puede pedir solo las columnas que usa y sus tipos: las que falten en el
+archivo no dan error aquí, las valida quien llama. El tiempo de cada
+lectura queda en el log y se devuelve junto al DataFrame.
+"""
+
+import importlib.util
+import logging
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MOTOR = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# Los .xls (OLE2) no los abre openpyxl: sin calamine quedan en manos de pandas
+_FIRMA_XLS = b'\xd0\xcf\x11\xe0'
+
+
+def _motor(origen):
+    if MOTOR == 'calamine':
+        return MOTOR
+    inicio = origen.read(4)
+    origen.seek(0)
+    return None if inicio == _FIRMA_XLS else MOTOR
+
+
+def leer_excel(origen, columnas=None, tipos=None):
+    """(DataFrame, segundos) de la primera hoja de `origen` (archivo binario)
+
+    `columnas`: nombres a leer, None para todas. `tipos`: dtype por columna.
+    """
+    origen.seek(0)
+    nombre = getattr(origen, 'name', 'excel')
+    usecols = None if columnas is None else (lambda col, pedidas=set(columnas): col in pedidas)
+    inicio = time.perf_counter()
+    df = pd.read_excel(origen, engine=_motor(origen), usecols=usecols, dtype=tipos)
+    segundos = time.perf_counter() - inicio
+    logger.info("%s: %s filas x %s columnas en %.2f s (%s)", nombre, len(df), len(df.columns), segundos, MOTOR)
+    return df, segundos
@@ -0,0 +1,791 @@
+"""
+MIGRACIONES DE ESQUEMA VERSIONADAS
+Se aplican una vez por proceso al arrancar la app (ver app.py) o a mano:
+
+    python migraciones.py            # aplicar pendientes
+    python migraciones.py --estado   # listar aplicadas y pendientes
+
+Cada versión aplicada queda registrada en schema_migrations. Para cambiar
+el esquema se agrega una función al final de MIGRACIONES; nunca se edita
+una versión ya publicada.
+"""
+
+import argparse
+
+import psycopg2
+import streamlit as st
+
+from blobs import migrar_adjuntos
+from db import conexion
+
+# Clave del advisory lock: un solo proceso migra a la vez
+CANDADO_MIGRACIONES = 7_310_001
+
+# ============================================================
+# AUXILIARES
+# ============================================================
+
+def _crear_indices_fechas(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_fecha_creacion
+        ON tickets (fecha_creacion, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_fecha_actualizacion
+        ON tickets (fecha_actualizacion, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_usuario_fecha
+        ON tickets (usuario, fecha_creacion, id)
+    ''')
+
+def _crear_trozos_blobs(cursor):
+    """Adjuntos en filas de TAMANO_TROZO (ver blobs.py)
+
+    trozos NULL marca los blobs anteriores, con todo el contenido en
+    ticket_blobs.contenido.
+    """
+    cursor.execute('ALTER TABLE ticket_blobs ALTER COLUMN contenido DROP NOT NULL')
+    cursor.execute('ALTER TABLE ticket_blobs ADD COLUMN IF NOT EXISTS trozos INTEGER')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_blob_trozos (
+            hash TEXT NOT NULL,
+            numero INTEGER NOT NULL,
+            contenido BYTEA NOT NULL,
+            PRIMARY KEY (hash, numero)
+        )
+    ''')
+    # Los Excel ya vienen comprimidos: TOAST no intenta comprimirlos de nuevo
+    cursor.execute('ALTER TABLE ticket_blob_trozos ALTER COLUMN contenido SET STORAGE EXTERNAL')
+
+def _crear_compresion_blobs(cursor):
+    """Códec y tamaños por blob (ver compresion.py); codec NULL = sin comprimir"""
+    cursor.execute('ALTER TABLE ticket_blobs ADD COLUMN IF NOT EXISTS codec TEXT')
+    cursor.execute('ALTER TABLE ticket_blobs ADD COLUMN IF NOT EXISTS tamano_guardado BIGINT')
+    cursor.execute('ALTER TABLE ticket_blobs ADD COLUMN IF NOT EXISTS segundos_codec DOUBLE PRECISION')
+    # Tamaño original de cada trozo: zstd lo necesita para descomprimir
+    cursor.execute('ALTER TABLE ticket_blob_trozos ADD COLUMN IF NOT EXISTS tamano INTEGER')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ticket_blobs_sin_codec
+        ON ticket_blobs (hash) WHERE codec IS NULL
+    ''')
+
+def _crear_resumen(cursor):
+    """Tablas de conteo por estado y por usuario, mantenidas por trigger"""
+    cursor.execute("SELECT to_regclass('tickets_resumen_estado') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        return
+    cursor.execute('''
+        CREATE TABLE tickets_resumen_estado (
+            estado TEXT PRIMARY KEY,
+            cantidad BIGINT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE tickets_resumen_usuario (
+            usuario TEXT PRIMARY KEY,
+            cantidad BIGINT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_resumen_trg() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE tickets_resumen_estado SET cantidad = cantidad - 1 WHERE estado = OLD.estado;
+                UPDATE tickets_resumen_usuario SET cantidad = cantidad - 1 WHERE usuario = OLD.usuario;
+                DELETE FROM tickets_resumen_usuario WHERE usuario = OLD.usuario AND cantidad <= 0;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO tickets_resumen_estado VALUES (NEW.estado, 1)
+                ON CONFLICT (estado) DO UPDATE SET cantidad = tickets_resumen_estado.cantidad + 1;
+                INSERT INTO tickets_resumen_usuario VALUES (NEW.usuario, 1)
+                ON CONFLICT (usuario) DO UPDATE SET cantidad = tickets_resumen_usuario.cantidad + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER tickets_resumen
+        AFTER INSERT OR DELETE OR UPDATE OF estado, usuario ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_resumen_trg()
+    ''')
+    # Carga inicial; el trigger bloquea escrituras hasta el commit
+    cursor.execute('''
+        INSERT INTO tickets_resumen_estado
+        SELECT estado, COUNT(*) FROM tickets GROUP BY estado
+    ''')
+    cursor.execute('''
+        INSERT INTO tickets_resumen_usuario
+        SELECT usuario, COUNT(*) FROM tickets GROUP BY usuario
+    ''')
+
+def _crear_sin_acentos(cursor):
+    """Función inmutable sin_acentos(text) para la búsqueda
+
+    Usa la extensión unaccent si se puede instalar; si no (permisos,
+    Postgres sin contrib) quita las tildes con translate().
+    """
+    cursor.execute('SAVEPOINT unaccent')
+    try:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        cursor.execute("SELECT extnamespace::regnamespace::text FROM pg_extension WHERE extname = 'unaccent'")
+        esquema = cursor.fetchone()[0]
+        cuerpo = f"SELECT {esquema}.unaccent('{esquema}.unaccent'::regdictionary, $1)"
+    except psycopg2.Error:
+        cursor.execute('ROLLBACK TO SAVEPOINT unaccent')
+        cuerpo = "SELECT translate($1, 'áéíóúàèìòùäëïöüÁÉÍÓÚÀÈÌÒÙÄËÏÖÜ', 'aeiouaeiouaeiouAEIOUAEIOUAEIOU')"
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION sin_acentos(texto TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $${cuerpo}$$
+    ''')
+
+def _fechas_son_texto(cursor):
+    cursor.execute('''
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'tickets' AND column_name = 'fecha_creacion'
+    ''')
+    fila = cursor.fetchone()
+    return fila is not None and fila[0] == 'text'
+
+def _texto_a_timestamptz(columna):
+    """Expresión SQL que convierte el texto de `columna` a timestamptz
+
+    Acepta el formato histórico '%d/%m/%Y %H:%M:%S' y, por si algo se
+    escribió durante la migración, el formato ISO que genera Postgres.
+    """
+    return f'''
+        CASE
+            WHEN {columna} ~ '^\\d{{2}}/\\d{{2}}/\\d{{4}}' THEN to_timestamp({columna}, 'DD/MM/YYYY HH24:MI:SS')
+            ELSE NULLIF({columna}, '')::timestamptz
+        END
+    '''
+
+def migrar_fechas(lote=1000, zona_horaria='UTC'):
+    """Convertir fecha_creacion/fecha_actualizacion de TEXT a timestamptz
+
+    Copia a columnas nuevas por lotes (transacciones cortas) y al final,
+    con la tabla bloqueada, pone al día lo escrito mientras tanto y
+    reemplaza las columnas. `zona_horaria` es la del servidor que generó
+    los textos.
+    """
+    creacion = _texto_a_timestamptz('fecha_creacion')
+    actualizacion = _texto_a_timestamptz('fecha_actualizacion')
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                ALTER TABLE tickets
+                ADD COLUMN IF NOT EXISTS fecha_creacion_ts TIMESTAMPTZ,
+                ADD COLUMN IF NOT EXISTS fecha_actualizacion_ts TIMESTAMPTZ
+            ''')
+        conn.commit()
+
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SET LOCAL TIME ZONE %s', (zona_horaria,))
+                cursor.execute(f'''
+                    UPDATE tickets SET
+                        fecha_creacion_ts = COALESCE({creacion}, now()),
+                        fecha_actualizacion_ts = COALESCE({actualizacion}, now())
+                    WHERE id IN (
+                        SELECT id FROM tickets WHERE fecha_creacion_ts IS NULL LIMIT %s
+                    )
+                ''', (lote,))
+                actualizados = cursor.rowcount
+            conn.commit()
+        if not actualizados:
+            break
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SET LOCAL TIME ZONE %s', (zona_horaria,))
+            cursor.execute('LOCK TABLE tickets IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'''
+                UPDATE tickets SET
+                    fecha_creacion_ts = COALESCE({creacion}, now()),
+                    fecha_actualizacion_ts = COALESCE({actualizacion}, now())
+                WHERE fecha_creacion_ts IS NULL
+                   OR fecha_actualizacion_ts IS DISTINCT FROM {actualizacion}
+            ''')
+            cursor.execute('ALTER TABLE tickets DROP COLUMN fecha_creacion, DROP COLUMN fecha_actualizacion')
+            cursor.execute('ALTER TABLE tickets RENAME COLUMN fecha_creacion_ts TO fecha_creacion')
+            cursor.execute('ALTER TABLE tickets RENAME COLUMN fecha_actualizacion_ts TO fecha_actualizacion')
+            cursor.execute('''
+                ALTER TABLE tickets
+                ALTER COLUMN fecha_creacion SET NOT NULL,
+                ALTER COLUMN fecha_creacion SET DEFAULT now(),
+                ALTER COLUMN fecha_actualizacion SET NOT NULL,
+                ALTER COLUMN fecha_actualizacion SET DEFAULT now()
+            ''')
+            _crear_indices_fechas(cursor)
+        conn.commit()
+
+def migrar_comentarios(lote=200):
+    """Pasar tickets.comentarios (JSON) a ticket_comments, por lotes
+
+    Devuelve la cantidad de tickets migrados.
+    """
+    migrados = 0
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    WITH lote AS (
+                        SELECT id, comentarios FROM tickets
+                        WHERE comentarios IS NOT NULL
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    ), insertados AS (
+                        INSERT INTO ticket_comments (ticket_id, usuario, texto, fecha)
+                        SELECT
+                            lote.id,
+                            COALESCE(c.valor->>'usuario', ''),
+                            COALESCE(c.valor->>'texto', ''),
+                            COALESCE(to_timestamp(c.valor->>'fecha', 'DD/MM/YYYY HH24:MI:SS'), now())
+                        FROM lote
+                        CROSS JOIN LATERAL json_array_elements(NULLIF(lote.comentarios, '')::json)
+                            WITH ORDINALITY AS c(valor, posicion)
+                        ORDER BY lote.id, c.posicion
+                    )
+                    UPDATE tickets SET comentarios = NULL
+                    WHERE id IN (SELECT id FROM lote)
+                ''', (lote,))
+                actualizados = cursor.rowcount
+            conn.commit()
+        if not actualizados:
+            return migrados
+        migrados += actualizados
+
+# ============================================================
+# VERSIONES
+# ============================================================
+
+def _v1_tickets(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            id TEXT PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            descripcion TEXT,
+            usuario TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            fecha_creacion TIMESTAMPTZ NOT NULL DEFAULT now(),
+            fecha_actualizacion TIMESTAMPTZ NOT NULL DEFAULT now(),
+            cantidad_registros INTEGER,
+            comentarios TEXT,
+            archivo_binario BYTEA,
+            nombre_archivo TEXT
+        )
+    ''')
+
+def _v2_fechas_timestamptz(cursor):
+    # Bases creadas con fechas TEXT: convertir antes de crear índices
+    if _fechas_son_texto(cursor):
+        cursor.connection.commit()
+        migrar_fechas()
+    _crear_indices_fechas(cursor)
+
+def _v3_indice_registros(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_registros
+        ON tickets ((COALESCE(cantidad_registros, 0)), id)
+    ''')
+
+def _v4_blobs(cursor):
+    # Adjuntos direccionados por contenido (ver blobs.py)
+    cursor.execute('ALTER TABLE tickets ADD COLUMN IF NOT EXISTS archivo_hash TEXT')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_blobs (
+            hash TEXT PRIMARY KEY,
+            contenido BYTEA NOT NULL,
+            tamano BIGINT NOT NULL,
+            fecha_creacion TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    # Sin compresión TOAST para poder leer por tramos con substring()
+    cursor.execute('ALTER TABLE ticket_blobs ALTER COLUMN contenido SET STORAGE EXTERNAL')
+
+def _v5_resumen(cursor):
+    _crear_resumen(cursor)
+
+def _v6_comentarios(cursor):
+    # Comentarios normalizados: una fila por comentario
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_comments (
+            id BIGSERIAL PRIMARY KEY,
+            ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+            usuario TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            fecha TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ticket_comments_ticket_fecha
+        ON ticket_comments (ticket_id, fecha, id)
+    ''')
+
+def _v7_migrar_comentarios(cursor):
+    migrar_comentarios()
+
+def _v8_migrar_adjuntos(cursor):
+    migrar_adjuntos()
+
+def _v9_vistas_previas(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_previews (
+            ticket_id TEXT PRIMARY KEY REFERENCES tickets(id) ON DELETE CASCADE,
+            preview BYTEA NOT NULL,
+            estadisticas JSONB NOT NULL,
+            csv BYTEA NOT NULL,
+            filas INTEGER NOT NULL,
+            generado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+
+def _v10_filas_adjuntos(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_rows (
+            ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+            fila INTEGER NOT NULL,
+            dni TEXT,
+            nombres_apellidos TEXT,
+            actividad TEXT,
+            super TEXT,
+            fundo TEXT,
+            observaciones TEXT,
+            PRIMARY KEY (ticket_id, fila)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_rows_dni ON ticket_rows (dni)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_rows_fundo ON ticket_rows (fundo)')
+
+def _v11_outbox(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notificaciones_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            payload JSONB NOT NULL,
+            token TEXT,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            intentos INTEGER NOT NULL DEFAULT 0,
+            proximo_intento TIMESTAMPTZ NOT NULL DEFAULT now(),
+            ultimo_error TEXT,
+            creada_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+            enviada_en TIMESTAMPTZ
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_pendientes
+        ON notificaciones_outbox (proximo_intento, id) WHERE estado = 'pendiente'
+    ''')
+
+def _v12_cambios(cursor):
+    # Id de la transacción que tocó cada fila y lápidas de los borrados
+    # (ver sincronizacion.py)
+    cursor.execute('ALTER TABLE tickets ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_version ON tickets (version)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tickets_eliminados (
+            id TEXT PRIMARY KEY,
+            usuario TEXT NOT NULL,
+            version BIGINT NOT NULL,
+            eliminado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_eliminados_version ON tickets_eliminados (version)')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_version_trg() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := txid_current();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_eliminado_trg() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tickets_eliminados (id, usuario, version)
+            VALUES (OLD.id, OLD.usuario, txid_current())
+            ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, eliminado_en = now();
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_notificar_trg() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('tickets_cambios', txid_current()::text);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_version ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_version
+        BEFORE INSERT OR UPDATE ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_version_trg()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_eliminado ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_eliminado
+        AFTER DELETE ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_eliminado_trg()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_notificar ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_notificar
+        AFTER INSERT OR UPDATE OR DELETE ON tickets
+        FOR EACH STATEMENT EXECUTE FUNCTION tickets_notificar_trg()
+    ''')
+
+def _v13_busqueda(cursor):
+    # Título (A), descripción (B) y comentarios (C), en español y sin tildes
+    _crear_sin_acentos(cursor)
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_documento(p_id TEXT, p_titulo TEXT, p_descripcion TEXT)
+        RETURNS tsvector LANGUAGE sql STABLE AS $$
+            SELECT setweight(to_tsvector('spanish', sin_acentos(COALESCE(p_titulo, ''))), 'A')
+                || setweight(to_tsvector('spanish', sin_acentos(COALESCE(p_descripcion, ''))), 'B')
+                || setweight(to_tsvector('spanish', sin_acentos(COALESCE(
+                       (SELECT string_agg(texto, ' ') FROM ticket_comments WHERE ticket_id = p_id), ''
+                   ))), 'C')
+        $$
+    ''')
+    cursor.execute('ALTER TABLE tickets ADD COLUMN IF NOT EXISTS busqueda TSVECTOR')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_busqueda_trg() RETURNS trigger AS $$
+        BEGIN
+            NEW.busqueda := tickets_documento(NEW.id, NEW.titulo, NEW.descripcion);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION ticket_comments_busqueda_trg() RETURNS trigger AS $$
+        BEGIN
+            UPDATE tickets SET busqueda = tickets_documento(id, titulo, descripcion)
+            WHERE id = CASE WHEN TG_OP = 'DELETE' THEN OLD.ticket_id ELSE NEW.ticket_id END;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_busqueda ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_busqueda
+        BEFORE INSERT OR UPDATE OF titulo, descripcion ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_busqueda_trg()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS ticket_comments_busqueda ON ticket_comments')
+    cursor.execute('''
+        CREATE TRIGGER ticket_comments_busqueda
+        AFTER INSERT OR UPDATE OR DELETE ON ticket_comments
+        FOR EACH ROW EXECUTE FUNCTION ticket_comments_busqueda_trg()
+    ''')
+    cursor.execute('''
+        UPDATE tickets SET busqueda = tickets_documento(id, titulo, descripcion)
+        WHERE busqueda IS NULL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_busqueda ON tickets USING GIN (busqueda)')
+
+def _v14_sla(cursor):
+    # Eventos del ciclo de vida y tiempos por ticket, mantenidos por
+    # trigger al escribir (ver sla.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_eventos (
+            id BIGSERIAL PRIMARY KEY,
+            ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+            tipo TEXT NOT NULL,
+            estado_anterior TEXT,
+            estado_nuevo TEXT,
+            usuario TEXT,
+            fecha TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ticket_eventos_ticket_fecha
+        ON ticket_eventos (ticket_id, fecha, id)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_sla (
+            ticket_id TEXT PRIMARY KEY REFERENCES tickets(id) ON DELETE CASCADE,
+            usuario TEXT NOT NULL,
+            creado TIMESTAMPTZ NOT NULL,
+            primera_respuesta TIMESTAMPTZ,
+            resuelto TIMESTAMPTZ,
+            primera_respuesta_seg DOUBLE PRECISION
+                GENERATED ALWAYS AS (EXTRACT(EPOCH FROM primera_respuesta - creado)::double precision) STORED,
+            resolucion_seg DOUBLE PRECISION
+                GENERATED ALWAYS AS (EXTRACT(EPOCH FROM resuelto - creado)::double precision) STORED
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_sla_creado ON ticket_sla (creado)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticket_sla_usuario ON ticket_sla (usuario, creado)')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_sla_trg() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO ticket_eventos (ticket_id, tipo, estado_nuevo, usuario, fecha)
+                VALUES (NEW.id, 'creado', NEW.estado, NEW.usuario, NEW.fecha_creacion);
+                INSERT INTO ticket_sla (ticket_id, usuario, creado)
+                VALUES (NEW.id, NEW.usuario, NEW.fecha_creacion);
+            ELSIF NEW.estado IS DISTINCT FROM OLD.estado THEN
+                -- app.usuario lo fija cambiar_estado_tickets con SET LOCAL
+                INSERT INTO ticket_eventos (ticket_id, tipo, estado_anterior, estado_nuevo, usuario)
+                VALUES (NEW.id, 'estado', OLD.estado, NEW.estado,
+                        NULLIF(current_setting('app.usuario', true), ''));
+                UPDATE ticket_sla SET
+                    primera_respuesta = CASE WHEN NEW.estado <> 'Abierto'
+                                             THEN COALESCE(primera_respuesta, now())
+                                             ELSE primera_respuesta END,
+                    resuelto = CASE WHEN NEW.estado = 'Cerrado' THEN now() END
+                WHERE ticket_id = NEW.id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION ticket_comments_sla_trg() RETURNS trigger AS $$
+        BEGIN
+            -- Primera respuesta: primer comentario de alguien que no es el autor
+            UPDATE ticket_sla SET primera_respuesta = NEW.fecha
+            WHERE ticket_id = NEW.ticket_id AND primera_respuesta IS NULL AND usuario <> NEW.usuario;
+            IF FOUND THEN
+                INSERT INTO ticket_eventos (ticket_id, tipo, usuario, fecha)
+                VALUES (NEW.ticket_id, 'primera_respuesta', NEW.usuario, NEW.fecha);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_sla ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_sla
+        AFTER INSERT OR UPDATE OF estado ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_sla_trg()
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS ticket_comments_sla ON ticket_comments')
+    cursor.execute('''
+        CREATE TRIGGER ticket_comments_sla
+        AFTER INSERT ON ticket_comments
+        FOR EACH ROW EXECUTE FUNCTION ticket_comments_sla_trg()
+    ''')
+    # Tickets anteriores sin historial: primera respuesta por comentarios
+    # y, si ya no están abiertos, fecha_actualizacion como aproximación
+    cursor.execute('''
+        INSERT INTO ticket_sla (ticket_id, usuario, creado, primera_respuesta, resuelto)
+        SELECT t.id, t.usuario, t.fecha_creacion,
+               LEAST(
+                   (SELECT MIN(c.fecha) FROM ticket_comments c
+                    WHERE c.ticket_id = t.id AND c.usuario <> t.usuario
+                      AND c.fecha >= t.fecha_creacion),
+                   CASE WHEN t.estado <> 'Abierto' THEN t.fecha_actualizacion END
+               ),
+               CASE WHEN t.estado = 'Cerrado' THEN t.fecha_actualizacion END
+        FROM tickets t
+        ON CONFLICT (ticket_id) DO NOTHING
+    ''')
+    cursor.execute('''
+        INSERT INTO ticket_eventos (ticket_id, tipo, estado_nuevo, usuario, fecha)
+        SELECT t.id, 'creado', 'Abierto', t.usuario, t.fecha_creacion
+        FROM tickets t
+        WHERE NOT EXISTS (SELECT 1 FROM ticket_eventos e WHERE e.ticket_id = t.id)
+    ''')
+
+def _v15_archivo(cursor):
+    # Cerrados antiguos fuera del conjunto de trabajo (ver archivo.py): los
+    # índices parciales de los listados solo contienen tickets vigentes
+    cursor.execute('ALTER TABLE tickets ADD COLUMN IF NOT EXISTS archivado BOOLEAN NOT NULL DEFAULT false')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_vigentes_fecha
+        ON tickets (fecha_creacion, id) WHERE NOT archivado
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_vigentes_usuario
+        ON tickets (usuario, fecha_creacion, id) WHERE NOT archivado
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_vigentes_registros
+        ON tickets ((COALESCE(cantidad_registros, 0)), id) WHERE NOT archivado
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tickets_por_archivar
+        ON tickets (fecha_actualizacion) WHERE estado = 'Cerrado' AND NOT archivado
+    ''')
+
+def _v16_trozos_blobs(cursor):
+    _crear_trozos_blobs(cursor)
+
+def _v17_compresion_blobs(cursor):
+    _crear_compresion_blobs(cursor)
+
+def _v18_recomprimir_adjuntos(cursor):
+    # Sin cambios de esquema: recomprimir los blobs de la migración 8 es un
+    # proceso por lotes aparte (python blobs.py --recomprimir), no un paso
+    # del arranque. Mientras tanto se leen sin comprimir (codec NULL)
+    pass
+
+def _v19_resumen_vigentes(cursor):
+    # Los conteos por estado del dashboard excluyen archivados, como los
+    # listados; los de usuario siguen completos (alimentan los filtros,
+    # que también pueden incluir archivados)
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION tickets_resumen_trg() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF NOT OLD.archivado THEN
+                    UPDATE tickets_resumen_estado SET cantidad = cantidad - 1 WHERE estado = OLD.estado;
+                END IF;
+                UPDATE tickets_resumen_usuario SET cantidad = cantidad - 1 WHERE usuario = OLD.usuario;
+                DELETE FROM tickets_resumen_usuario WHERE usuario = OLD.usuario AND cantidad <= 0;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                IF NOT NEW.archivado THEN
+                    INSERT INTO tickets_resumen_estado VALUES (NEW.estado, 1)
+                    ON CONFLICT (estado) DO UPDATE SET cantidad = tickets_resumen_estado.cantidad + 1;
+                END IF;
+                INSERT INTO tickets_resumen_usuario VALUES (NEW.usuario, 1)
+                ON CONFLICT (usuario) DO UPDATE SET cantidad = tickets_resumen_usuario.cantidad + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS tickets_resumen ON tickets')
+    cursor.execute('''
+        CREATE TRIGGER tickets_resumen
+        AFTER INSERT OR DELETE OR UPDATE OF estado, usuario, archivado ON tickets
+        FOR EACH ROW EXECUTE FUNCTION tickets_resumen_trg()
+    ''')
+    # Recuento sin escrituras concurrentes hasta el commit
+    cursor.execute('LOCK TABLE tickets IN SHARE MODE')
+    cursor.execute('DELETE FROM tickets_resumen_estado')
+    cursor.execute('''
+        INSERT INTO tickets_resumen_estado
+        SELECT estado, COUNT(*) FROM tickets WHERE NOT archivado GROUP BY estado
+    ''')
+
+def _v20_outbox_sin_tokens(cursor):
+    # Las fallidas conservaban el token del admin indefinidamente
+    cursor.execute("UPDATE notificaciones_outbox SET token = NULL WHERE estado <> 'pendiente'")
+
+def _v21_busqueda_incremental(cursor):
+    # El trigger de v13 rearmaba el documento con todo el hilo en cada
+    # comentario y escribía el ticket una segunda vez; ahora el texto nuevo
+    # se agrega en el mismo UPDATE de agregar_comentario_tickets. Los
+    # comentarios no se editan ni se borran sueltos (solo en cascada)
+    cursor.execute('DROP TRIGGER IF EXISTS ticket_comments_busqueda ON ticket_comments')
+    cursor.execute('DROP FUNCTION IF EXISTS ticket_comments_busqueda_trg()')
+
+def _v22_clave_trozos(cursor):
+    # Clave de los trozos vigentes; NULL = el hash (ver PostgresBlobStore)
+    cursor.execute('ALTER TABLE ticket_blobs ADD COLUMN IF NOT EXISTS clave_trozos TEXT')
+
+
+MIGRACIONES = [
+    (1, 'tickets', _v1_tickets),
+    (2, 'fechas_timestamptz', _v2_fechas_timestamptz),
+    (3, 'indice_registros', _v3_indice_registros),
+    (4, 'blobs', _v4_blobs),
+    (5, 'resumen', _v5_resumen),
+    (6, 'comentarios', _v6_comentarios),
+    (7, 'migrar_comentarios', _v7_migrar_comentarios),
+    (8, 'migrar_adjuntos', _v8_migrar_adjuntos),
+    (9, 'vistas_previas', _v9_vistas_previas),
+    (10, 'filas_adjuntos', _v10_filas_adjuntos),
+    (11, 'outbox', _v11_outbox),
+    (12, 'cambios', _v12_cambios),
+    (13, 'busqueda', _v13_busqueda),
+    (14, 'sla', _v14_sla),
+    (15, 'archivo', _v15_archivo),
+    (16, 'trozos_blobs', _v16_trozos_blobs),
+    (17, 'compresion_blobs', _v17_compresion_blobs),
+    (18, 'recomprimir_adjuntos', _v18_recomprimir_adjuntos),
+    (19, 'resumen_vigentes', _v19_resumen_vigentes),
+    (20, 'outbox_sin_tokens', _v20_outbox_sin_tokens),
+    (21, 'busqueda_incremental', _v21_busqueda_incremental),
+    (22, 'clave_trozos', _v22_clave_trozos),
+]
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def _crear_tabla_versiones(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            aplicada_en TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+
+def versiones_aplicadas():
+    """{version: (nombre, aplicada_en)} de lo ya migrado"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            _crear_tabla_versiones(cursor)
+            cursor.execute('SELECT version, nombre, aplicada_en FROM schema_migrations')
+            filas = cursor.fetchall()
+        conn.commit()
+    return {version: (nombre, aplicada_en) for version, nombre, aplicada_en in filas}
+
+def aplicar_migraciones():
+    """Aplicar en orden las versiones pendientes; devuelve las aplicadas
+
+    Cada versión corre en su propia transacción junto con su registro en
+    schema_migrations. Las que mueven datos por lotes confirman por su
+    cuenta y se registran al terminar, así que repetirlas es seguro.
+    """
+    aplicadas = []
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            _crear_tabla_versiones(cursor)
+            conn.commit()
+            cursor.execute('SELECT pg_advisory_lock(%s)', (CANDADO_MIGRACIONES,))
+            try:
+                cursor.execute('SELECT version FROM schema_migrations')
+                hechas = {fila[0] for fila in cursor.fetchall()}
+                conn.commit()
+                for version, nombre, migracion in MIGRACIONES:
+                    if version in hechas:
+                        continue
+                    migracion(cursor)
+                    cursor.execute(
+                        'INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)',
+                        (version, nombre)
+                    )
+                    conn.commit()
+                    aplicadas.append((version, nombre))
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', (CANDADO_MIGRACIONES,))
+                conn.commit()
+    return aplicadas
+
+@st.cache_resource
+def asegurar_esquema():
+    """Migrar una sola vez por proceso; las sesiones no ejecutan DDL"""
+    return aplicar_migraciones()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de esquema de la ticketera")
+    parser.add_argument("--estado", action="store_true", help="mostrar versiones sin aplicar nada")
+    args = parser.parse_args()
+
+    if args.estado:
+        hechas = versiones_aplicadas()
+        for version, nombre, _ in MIGRACIONES:
+            if version in hechas:
+                print(f"[x] {version:>3} {nombre} ({hechas[version][1]:%Y-%m-%d %H:%M})")
+            else:
+                print(f"[ ] {version:>3} {nombre}")
+    else:
+        aplicadas = aplicar_migraciones()
+        for version, nombre in aplicadas:
+            print(f"Aplicada {version}: {nombre}")
+        if not aplicadas:
+            print("Esquema al día")
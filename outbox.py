@@ -0,0 +1,295 @@
+"""
+OUTBOX DE NOTIFICACIONES AL BACKEND
+Los cambios de estado dejan una fila en notificaciones_outbox dentro de
+la misma transacción del UPDATE. Un hilo por proceso las entrega al
+backend en lotes, con reintentos y backoff exponencial; las que agotan
+los intentos quedan como 'fallida' para revisión.
+
+El envío HTTP corre fuera de toda transacción: el worker reserva las
+filas por `arriendo` segundos, confirma, llama al backend y anota el
+resultado en otra transacción corta. Mientras envía, un hilo renueva la
+reserva cada tercio de `arriendo`, así un lote lento no vuelve a quedar
+disponible a medias. Si el proceso muere, las filas se liberan al
+vencer el arriendo.
+
+Cada fila se entrega por separado. Los cambios de un solo ticket usan
+PUT /tickets/{id}/estado; los de una acción masiva también, salvo con
+`envio_masivo`, que los manda en una llamada a PUT /tickets/estado con
+cuerpo {"estado": ..., "tickets": [{"id": ..., "titulo": ...}]}. Si el
+backend no conoce esa ruta (404, 405, 501) se vuelve a las llamadas por
+ticket.
+
+Configuración opcional en Secrets:
+
+    API_SERVICE_TOKEN = "..."   # token propio del worker; si falta se guarda
+                                # el del admin que hizo el cambio hasta que
+                                # la fila se entrega o falla
+    [outbox]
+    envio_masivo = false        # el backend expone PUT /tickets/estado
+    intervalo = 5               # segundos entre pasadas sin trabajo
+    lote = 100
+    arriendo = 300              # segundos que una fila queda reservada
+    max_intentos = 8
+    backoff_base = 5            # segundos; se duplica en cada intento
+    backoff_max = 900
+"""
+
+import logging
+import threading
+import time
+
+import streamlit as st
+from psycopg2.extras import Json
+
+from api import cliente_api
+from db import conexion
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEFAULTS = {
+    'envio_masivo': False,
+    'intervalo': 5,
+    'lote': 100,
+    'arriendo': 300,
+    'max_intentos': 8,
+    'backoff_base': 5,
+    'backoff_max': 900,
+}
+
+_despertar = threading.Event()
+
+
+def _config():
+    config = dict(OUTBOX_DEFAULTS)
+    config.update(st.secrets.get("outbox", {}))
+    return config
+
+
+# ============================================================
+# ENCOLAR
+# ============================================================
+
+def encolar_cambio_estado(cursor, nuevo_estado, tickets, token=None):
+    """Registrar el aviso de cambio de estado en la transacción de `cursor`
+
+    `tickets` es [(id, titulo)]. El worker lo entrega después del commit.
+    Con API_SERVICE_TOKEN configurado no se guarda el token del admin.
+    """
+    if not tickets:
+        return
+    if st.secrets.get("API_SERVICE_TOKEN"):
+        token = None
+    cursor.execute('''
+        INSERT INTO notificaciones_outbox (tipo, payload, token)
+        VALUES ('cambio_estado', %s, %s)
+    ''', (Json({
+        'estado': nuevo_estado,
+        'tickets': [{'id': ticket_id, 'titulo': titulo} for ticket_id, titulo in tickets],
+    }), token))
+
+
+def avisar_worker():
+    """Despertar al worker tras confirmar una transacción con avisos"""
+    _despertar.set()
+
+
+# ============================================================
+# ENTREGA
+# ============================================================
+
+# Respuestas de un backend sin PUT /tickets/estado
+SIN_ENVIO_MASIVO = {404, 405, 501}
+
+
+def _enviar(estado, tickets, token, masivo=False):
+    if masivo and len(tickets) > 1:
+        respuesta = cliente_api().put(
+            "/tickets/estado",
+            json={"estado": estado, "tickets": tickets},
+            token=token
+        )
+        if respuesta.status_code not in SIN_ENVIO_MASIVO:
+            respuesta.raise_for_status()
+            return
+        logger.warning("El backend no acepta PUT /tickets/estado (%s); se envía por ticket",
+                       respuesta.status_code)
+    # Un reintento repite también los ya entregados: el PUT es idempotente
+    for ticket in tickets:
+        respuesta = cliente_api().put(
+            "/tickets/{id}/estado", id=ticket['id'],
+            json={"estado": estado, "titulo": ticket['titulo']},
+            token=token
+        )
+        respuesta.raise_for_status()
+
+
+def _reservar(config):
+    """Tomar filas pendientes por `arriendo` segundos y confirmar en el acto"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                UPDATE notificaciones_outbox
+                SET proximo_intento = now() + %s * interval '1 second'
+                WHERE id IN (
+                    SELECT id FROM notificaciones_outbox
+                    WHERE estado = 'pendiente' AND proximo_intento <= now()
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, payload, token, intentos
+            ''', (config['arriendo'], config['lote']))
+            filas = sorted(cursor.fetchall())
+        conn.commit()
+    return filas
+
+
+def _renovar_arriendo(ids, config, fin):
+    """Extender la reserva de `ids` hasta que se active `fin`"""
+    while not fin.wait(config['arriendo'] / 3):
+        try:
+            with conexion() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        UPDATE notificaciones_outbox
+                        SET proximo_intento = now() + %s * interval '1 second'
+                        WHERE id = ANY(%s) AND estado = 'pendiente'
+                    ''', (config['arriendo'], ids))
+                conn.commit()
+        except Exception:
+            logger.exception("No se pudo renovar la reserva del outbox")
+
+
+def _anotar_resultados(enviadas, fallos, config):
+    """Marcar entregas y fallos; el token se borra al llegar a un estado final"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            if enviadas:
+                cursor.execute('''
+                    UPDATE notificaciones_outbox
+                    SET estado = 'enviada', enviada_en = now(), token = NULL, intentos = intentos + 1
+                    WHERE id = ANY(%s)
+                ''', (enviadas,))
+            for fila_id, intentos, error in fallos:
+                espera = min(config['backoff_base'] * 2 ** intentos, config['backoff_max'])
+                cursor.execute('''
+                    UPDATE notificaciones_outbox SET
+                        intentos = intentos + 1,
+                        estado = CASE WHEN intentos + 1 >= %(max)s THEN 'fallida' ELSE 'pendiente' END,
+                        token = CASE WHEN intentos + 1 >= %(max)s THEN NULL ELSE token END,
+                        proximo_intento = now() + %(espera)s * interval '1 second',
+                        ultimo_error = %(error)s
+                    WHERE id = %(id)s
+                ''', {'max': config['max_intentos'], 'espera': espera, 'error': error[:500], 'id': fila_id})
+        conn.commit()
+
+
+def procesar_lote():
+    """Entregar un lote de avisos pendientes; devuelve cuántas filas procesó
+
+    Las filas se reservan con FOR UPDATE SKIP LOCKED, así varios procesos
+    pueden correr el worker sin duplicar entregas; la reserva se renueva
+    hasta anotar el resultado. Ninguna conexión queda tomada mientras se
+    llama al backend.
+    """
+    config = _config()
+    token_servicio = st.secrets.get("API_SERVICE_TOKEN")
+    filas = _reservar(config)
+    if not filas:
+        return 0
+
+    fin = threading.Event()
+    renovacion = threading.Thread(
+        target=_renovar_arriendo, args=([fila[0] for fila in filas], config, fin),
+        name="outbox-arriendo", daemon=True
+    )
+    renovacion.start()
+    enviadas, fallos = [], []
+    try:
+        for fila_id, payload, token, intentos in filas:
+            try:
+                _enviar(payload['estado'], payload['tickets'], token_servicio or token, config['envio_masivo'])
+            except Exception as e:
+                fallos.append((fila_id, intentos, str(e)))
+                logger.warning("Aviso de estado %s no entregado: %s", fila_id, e)
+            else:
+                enviadas.append(fila_id)
+    finally:
+        fin.set()
+        renovacion.join()
+
+    _anotar_resultados(enviadas, fallos, config)
+    return len(filas)
+
+
+def purgar_enviadas(dias=7):
+    """Borrar avisos entregados hace más de `dias` días"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                DELETE FROM notificaciones_outbox
+                WHERE estado = 'enviada' AND enviada_en < now() - %s * interval '1 day'
+            ''', (dias,))
+        conn.commit()
+
+
+def _bucle_worker():
+    config = _config()
+    ultima_purga = 0
+    while True:
+        try:
+            procesadas = procesar_lote()
+            if time.monotonic() - ultima_purga > 3600:
+                purgar_enviadas()
+                ultima_purga = time.monotonic()
+        except Exception:
+            logger.exception("Error en el worker de notificaciones")
+            procesadas = 0
+        if not procesadas:
+            _despertar.wait(config['intervalo'])
+            _despertar.clear()
+
+
+@st.cache_resource
+def iniciar_worker():
+    """Hilo de entrega único por proceso"""
+    hilo = threading.Thread(target=_bucle_worker, name="outbox-worker", daemon=True)
+    hilo.start()
+    return hilo
+
+
+# ============================================================
+# MONITOREO
+# ============================================================
+
+def estadisticas_outbox():
+    """Cantidad de avisos por estado"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT estado, COUNT(*) FROM notificaciones_outbox
+                WHERE estado <> 'enviada'
+                GROUP BY estado
+            ''')
+            return dict(cursor.fetchall())
+
+
+def reintentar_fallidas(token=None):
+    """Volver a encolar los avisos en estado 'fallida'
+
+    Las fallidas ya no guardan token: sin API_SERVICE_TOKEN se envían con
+    el `token` de quien pide el reintento.
+    """
+    if st.secrets.get("API_SERVICE_TOKEN"):
+        token = None
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                UPDATE notificaciones_outbox
+                SET estado = 'pendiente', intentos = 0, proximo_intento = now(), token = %s
+                WHERE estado = 'fallida'
+            ''', (token,))
+            reencoladas = cursor.rowcount
+        conn.commit()
+    avisar_worker()
+    return reencoladas
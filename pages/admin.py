@@ -1,108 +1,333 @@
 import streamlit as st
 import pandas as pd
-import json
-import psycopg2
-import requests
-from datetime import datetime
-import io
+from datetime import datetime, time, timedelta
 from auth import require_auth
-
-API_URL = "https://backend-ticket-si99.onrender.com"
+from tickets_db import (
+    buscar_tickets,
+    estadisticas_cache_adjuntos,
+    formatear_fecha,
+    obtener_vista_previa,
+)
+from repositorio import obtener_repositorio
+from paginacion import cursor_actual, controles_paginacion
+from ingesta import AGRUPABLES, agrupar_filas, buscar_por_dni
+from outbox import estadisticas_outbox, reintentar_fallidas
+from api import cliente_api
+from sincronizacion import listado_sincronizado
+from exportacion import FORMATOS, exportar_tickets
+from sla import AGRUPACIONES, eventos_ticket, metricas_sla
+from archivo import contar_archivados
+from blobs import estadisticas_compresion
 
 require_auth(roles_permitidos=['ADMIN'])
 
+# Después del login: un valor mal escrito no debe romper la página
+try:
+    TICKETS_POR_PAGINA = int(st.secrets.get("admin_tickets_por_pagina", 25))
+except (TypeError, ValueError):
+    TICKETS_POR_PAGINA = 25
+OPCIONES_POR_PAGINA = sorted({10, 25, 50, 100, TICKETS_POR_PAGINA})
+
+repositorio = obtener_repositorio()
+
 # ============================================================
-# CONEXIÓN A BASE DE DATOS
+# ACCIONES
 # ============================================================
 
-def get_db_connection():
+def _horas(valor):
+    return "—" if pd.isna(valor) else f"{valor:.1f} h"
+
+def _usuario_actual():
+    return st.session_state.get('user', {}).get('usuario')
+
+def cambiar_estado_ticket(ticket_id, nuevo_estado):
+    # El aviso al backend lo entrega el worker del outbox
+    repositorio.actualizar_estado_ticket(ticket_id, nuevo_estado, st.session_state.get('token'), _usuario_actual())
+
+def cambiar_estado_masivo(ticket_ids, nuevo_estado):
+    """Un UPDATE para todos los tickets y un solo aviso en el outbox"""
+    return repositorio.cambiar_estado_tickets(ticket_ids, nuevo_estado, st.session_state.get('token'), _usuario_actual())
+
+def acciones_masivas(seleccionados, username):
+    """Barra de acciones para los tickets marcados en la tabla"""
+    ids = [t['id'] for t in seleccionados]
+    st.write(f"**⚡ Acción masiva** ({len(ids)} seleccionados)")
+    col1, col2, col3 = st.columns([0.3, 0.5, 0.2])
+    with col1:
+        accion = st.selectbox(
+            "Acción:",
+            ["🟢 Cerrar", "🟡 Mover a En Progreso", "💬 Comentar", "🗑️ Eliminar"],
+            key="accion_masiva"
+        )
+    with col2:
+        texto = ""
+        if accion == "💬 Comentar":
+            texto = st.text_area("Comentario para todos:", key="comentario_masivo", height=80)
+        elif accion == "🗑️ Eliminar":
+            st.warning("Se eliminarán todos los tickets seleccionados")
+    with col3:
+        if st.button("Aplicar", key="aplicar_masivo", type="primary", disabled=not ids):
+            if accion == "🟢 Cerrar":
+                cambiados = cambiar_estado_masivo(ids, "Cerrado")
+                st.success(f"✅ {len(cambiados)} tickets cerrados")
+            elif accion == "🟡 Mover a En Progreso":
+                cambiados = cambiar_estado_masivo(ids, "En Progreso")
+                st.success(f"✅ {len(cambiados)} tickets en progreso")
+            elif accion == "💬 Comentar":
+                if not texto.strip():
+                    st.warning("Escribe un comentario")
+                    return
+                repositorio.agregar_comentario_tickets(ids, username, texto)
+                st.success(f"✅ Comentario agregado a {len(ids)} tickets")
+            else:
+                eliminados = repositorio.eliminar_tickets(ids)
+                st.warning(f"✅ {len(eliminados)} tickets eliminados")
+            st.rerun()
+
+def mostrar_comentarios(comentarios):
+    for com in comentarios:
+        st.write(f"👤 **{com['usuario']}** _{formatear_fecha(com['fecha'])}_")
+        st.write(f"> {com['texto']}")
+
+def vista_previa_adjunto(ticket):
+    """Primeras filas, estadísticas y CSV del Excel adjunto"""
+    st.write("**📊 Vista previa de datos:**")
     try:
-        conn = psycopg2.connect(st.secrets["database_url"])
-        return conn
-    except KeyError:
-        st.error("❌ Error: variable 'database_url' no encontrada en Secrets")
-        st.stop()
-    except psycopg2.OperationalError as e:
-        st.error(f"❌ Error de conexión a la BD: {str(e)}")
-        st.stop()
+        vista = obtener_vista_previa(ticket['id'])
+        if vista is not None:
+            df_preview, estadisticas, csv = vista
+            st.dataframe(df_preview, use_container_width=True, height=300)
+            if len(df_preview) < (ticket['cantidad_registros'] or 0):
+                st.caption(f"Primeras {len(df_preview)} de {ticket['cantidad_registros']} filas")
+            with st.popover("📈 Estadísticas por columna"):
+                st.dataframe(pd.DataFrame(estadisticas).T, use_container_width=True)
+            st.download_button(
+                label="📊 Descargar como CSV",
+                data=csv,
+                file_name=f"{ticket['id']}_datos.csv",
+                mime="text/csv",
+                key=f"csv_{ticket['id']}"
+            )
     except Exception as e:
-        st.error(f"❌ Error desconocido: {type(e).__name__}: {str(e)}")
-        st.stop()
-
-def cargar_tickets():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tickets ORDER BY fecha_creacion DESC')
-    columnas = [desc[0] for desc in cursor.description]
-    tickets = []
-    for row in cursor.fetchall():
-        ticket = dict(zip(columnas, row))
-        ticket['comentarios'] = json.loads(ticket['comentarios'] or '[]')
-        tickets.append(ticket)
-    cursor.close()
-    conn.close()
-    return tickets
-
-def cambiar_estado_ticket(ticket_id, nuevo_estado, titulo):
-    try:
-        requests.put(
-            f"{API_URL}/tickets/{ticket_id}/estado",
-            json={"estado": nuevo_estado, "titulo": titulo},
-            headers={"Authorization": f"Bearer {st.session_state.get('token', '')}"}
+        st.error(f"Error al leer archivo: {str(e)}")
+
+def detalle_ticket(ticket, comentarios, username):
+    """Detalle con acciones de un solo ticket: sus widgets existen solo si se muestra"""
+    color = '🔴' if ticket['estado'] == 'Abierto' else '🟡' if ticket['estado'] == 'En Progreso' else '🟢'
+    with st.container(border=True):
+        st.markdown(f"#### {color} [{ticket['id']}] {ticket['titulo']}")
+        if '**' in ticket.get('fragmento', ''):
+            st.markdown(f"🔍 …{ticket['fragmento']}…")
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.write("**Información General**")
+            st.write(f"**ID:** {ticket['id']}")
+            st.write(f"**Usuario:** {ticket['usuario']}")
+            st.write(f"**Registros:** {ticket['cantidad_registros']}")
+
+        with col2:
+            st.write("**Fechas**")
+            st.write(f"**Creado:** {formatear_fecha(ticket['fecha_creacion'])}")
+            st.write(f"**Actualizado:** {formatear_fecha(ticket['fecha_actualizacion'])}")
+
+        with col3:
+            st.write("**Cambiar Estado**")
+            nuevo_estado = st.selectbox(
+                "Estado:",
+                ["Abierto", "En Progreso", "Cerrado"],
+                index=["Abierto", "En Progreso", "Cerrado"].index(ticket['estado']),
+                key=f"estado_{ticket['id']}"
+            )
+            if nuevo_estado != ticket['estado']:
+                if st.button("✅ Actualizar", key=f"btn_update_{ticket['id']}"):
+                    cambiar_estado_ticket(ticket['id'], nuevo_estado)
+                    st.success("✅ Estado actualizado")
+                    st.rerun()
+        if repositorio.extras:
+            with st.popover("🕒 Historial de estados"):
+                st.dataframe(eventos_ticket(ticket['id']), use_container_width=True, hide_index=True)
+        st.divider()
+        st.write("**Descripción:**")
+        st.write(ticket['descripcion'])
+        st.divider()
+
+        st.write("**📎 Archivo Adjunto:**")
+        # El adjunto solo se descarga de la BD cuando se pide verlo
+        if ticket['nombre_archivo'] and st.toggle("Ver adjunto", key=f"ver_adjunto_{ticket['id']}"):
+            nombre_archivo = ticket['nombre_archivo']
+            col1, col2 = st.columns([0.7, 0.3])
+            with col1:
+                st.write(f"📁 `{nombre_archivo}`")
+            with col2:
+                # Se copia por trozos recién al hacer clic
+                st.download_button(
+                    label="📥 Descargar",
+                    data=lambda: repositorio.archivo_temporal(ticket['id']),
+                    file_name=nombre_archivo,
+                    key=f"download_{ticket['id']}"
+                )
+            # Las vistas previas se guardan solo en Postgres
+            if repositorio.extras:
+                vista_previa_adjunto(ticket)
+
+        st.divider()
+        st.write("**💬 Comentarios:**")
+        ultimos, hay_mas = comentarios[ticket['id']]
+        if hay_mas and st.toggle("Ver historial completo", key=f"historial_{ticket['id']}"):
+            clave = f"comentarios_{ticket['id']}"
+            pagina, siguiente_com = repositorio.listar_comentarios(ticket['id'], despues=cursor_actual(clave, None))
+            mostrar_comentarios(pagina)
+            controles_paginacion(clave, siguiente_com)
+        elif ultimos:
+            mostrar_comentarios(ultimos)
+        else:
+            st.info("Sin comentarios")
+
+        nuevo_comentario = st.text_area("Agregar comentario:", key=f"comentario_{ticket['id']}", height=80)
+        col1, col2 = st.columns([0.7, 0.3])
+        with col2:
+            if st.button("💬 Enviar", key=f"btn_comentario_{ticket['id']}"):
+                if nuevo_comentario.strip():
+                    repositorio.agregar_comentario(ticket['id'], username, nuevo_comentario)
+                    st.success("✅ Comentario agregado")
+                    st.rerun()
+                else:
+                    st.warning("Escribe un comentario")
+
+        st.divider()
+        st.write("**⚠️ Acciones Administrativas**")
+        col1, col2 = st.columns([0.7, 0.3])
+        with col2:
+            if st.button("🗑️ Eliminar Ticket", key=f"delete_{ticket['id']}", type="secondary"):
+                repositorio.eliminar_ticket(ticket['id'])
+                st.warning("✅ Ticket eliminado")
+                st.rerun()
+
+def panel_lateral():
+    """Latencia del backend y, con Postgres, cachés, avisos y compresión de adjuntos"""
+    with st.sidebar:
+        latencias = cliente_api().estadisticas()
+        with st.expander(f"⏱️ Latencia API · circuito {latencias['circuito']}"):
+            if latencias['endpoints']:
+                st.dataframe(
+                    pd.DataFrame.from_dict(latencias['endpoints'], orient='index'),
+                    use_container_width=True
+                )
+            else:
+                st.caption("Sin llamadas al backend en este proceso")
+        if not repositorio.extras:
+            return
+        cache = estadisticas_cache_adjuntos()
+        st.caption(
+            f"📦 Caché adjuntos: {cache['hits']} hits / {cache['misses']} misses · "
+            f"{cache['bytes'] / 1024 / 1024:.1f} de {cache['max_bytes'] / 1024 / 1024:.0f} MB"
         )
-    except Exception as e:
-        st.error(f"Error notificando: {e}")
-    
-    # Igual actualiza directo en BD
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE tickets SET estado = %s, fecha_actualizacion = %s WHERE id = %s
-    ''', (nuevo_estado, datetime.now().strftime('%d/%m/%Y %H:%M:%S'), ticket_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-def agregar_comentario(ticket_id, usuario, comentario):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT comentarios FROM tickets WHERE id = %s', (ticket_id,))
-    resultado = cursor.fetchone()
-    comentarios = json.loads(resultado[0] or '[]') if resultado else []
-    comentarios.append({
-        'usuario': usuario,
-        'texto': comentario,
-        'fecha': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    })
-    cursor.execute('''
-        UPDATE tickets 
-        SET comentarios = %s, fecha_actualizacion = %s
-        WHERE id = %s
-    ''', (json.dumps(comentarios), datetime.now().strftime('%d/%m/%Y %H:%M:%S'), ticket_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def eliminar_ticket(ticket_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM tickets WHERE id = %s', (ticket_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def obtener_archivo(ticket_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT archivo_binario, nombre_archivo FROM tickets WHERE id = %s', (ticket_id,))
-    resultado = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if resultado:
-        archivo_binario, nombre_archivo = resultado
-        if isinstance(archivo_binario, memoryview):
-            archivo_binario = bytes(archivo_binario)
-        return archivo_binario, nombre_archivo
-    return None, None
+        st.caption(f"🗄️ Tickets archivados: {contar_archivados()}")
+        avisos = estadisticas_outbox()
+        st.caption(
+            f"📨 Avisos al backend: {avisos.get('pendiente', 0)} pendientes · "
+            f"{avisos.get('fallida', 0)} fallidos"
+        )
+        if avisos.get('fallida') and st.button("🔁 Reintentar avisos fallidos", key="reintentar_outbox"):
+            st.success(f"✅ {reintentar_fallidas(st.session_state.get('token'))} avisos reencolados")
+        compresion = estadisticas_compresion()
+        with st.expander("🗜️ Compresión de adjuntos"):
+            if compresion['codecs']:
+                st.dataframe(
+                    pd.DataFrame.from_dict(compresion['codecs'], orient='index'),
+                    use_container_width=True
+                )
+            st.caption(
+                f"Descompresión en este proceso: {compresion['lectura']['trozos']} trozos · "
+                f"{compresion['lectura']['ms_descompresion']} ms"
+            )
+
+def secciones_analisis(resumen):
+    """Filas de los Excel adjuntos, SLA y exportación"""
+    st.divider()
+    st.subheader("🔎 Registros de Adjuntos")
+    if st.toggle("Consultar filas de los Excel adjuntos", key="consultar_filas"):
+        col1, col2 = st.columns(2)
+        with col1:
+            agrupar_por = st.selectbox("Agrupar por:", AGRUPABLES)
+            estado_filas = st.selectbox("Estado del ticket:", ["Todos", "Abierto", "En Progreso", "Cerrado"], key="estado_filas")
+            st.dataframe(
+                agrupar_filas(agrupar_por, None if estado_filas == "Todos" else estado_filas),
+                use_container_width=True,
+                hide_index=True
+            )
+        with col2:
+            dni = st.text_input("Buscar DNI:")
+            if dni.strip():
+                st.dataframe(buscar_por_dni(dni.strip()), use_container_width=True, hide_index=True)
+
+    st.divider()
+    st.subheader("⏱️ Tiempos de Atención (SLA)")
+    col1, col2 = st.columns(2)
+    with col1:
+        agrupar_sla = st.selectbox("Agrupar por:", list(AGRUPACIONES), key="sla_agrupar")
+    with col2:
+        rango_sla = st.date_input("Tickets creados entre:", value=(), key="sla_rango")
+    desde_sla = hasta_sla = None
+    if len(rango_sla) == 2:
+        desde_sla = datetime.combine(rango_sla[0], time.min)
+        hasta_sla = datetime.combine(rango_sla[1] + timedelta(days=1), time.min)
+
+    total_sla = metricas_sla(None, desde_sla, hasta_sla)
+    if total_sla.empty:
+        st.info("Sin tickets en el período")
+    else:
+        total = total_sla.iloc[0]
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Primera respuesta p50", _horas(total['respuesta_p50_h']))
+        with col2:
+            st.metric("Primera respuesta p90", _horas(total['respuesta_p90_h']))
+        with col3:
+            st.metric("Resolución p50", _horas(total['resolucion_p50_h']))
+        with col4:
+            st.metric("Resolución p90", _horas(total['resolucion_p90_h']))
+        st.dataframe(
+            metricas_sla(agrupar_sla, desde_sla, hasta_sla).rename(columns={'grupo': agrupar_sla}),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.divider()
+    st.subheader("📊 Exportación de Datos")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        formato = st.radio("Formato:", list(FORMATOS), horizontal=True, key="export_formato")
+        con_comentarios = st.checkbox("Incluir comentarios", key="export_comentarios")
+        export_archivados = st.checkbox("Incluir archivados", value=True, key="export_archivados")
+    with col2:
+        export_estado = st.selectbox("Estado:", ["Todos", "Abierto", "En Progreso", "Cerrado"], key="export_estado")
+        export_usuario = st.selectbox("Usuario:", ["Todos"] + resumen['usuarios'], key="export_usuario")
+    with col3:
+        rango = st.date_input("Creados entre:", value=(), key="export_rango")
+
+    desde = hasta = None
+    if len(rango) == 2:
+        desde = datetime.combine(rango[0], time.min)
+        hasta = datetime.combine(rango[1] + timedelta(days=1), time.min)
+    extension, mime = FORMATOS[formato]
+    # El archivo se genera al hacer clic, en un hilo aparte y por trozos
+    st.download_button(
+        label=f"📥 Exportar Tickets a {formato}",
+        data=lambda: exportar_tickets(
+            formato,
+            estado=None if export_estado == "Todos" else export_estado,
+            usuario=None if export_usuario == "Todos" else export_usuario,
+            desde=desde,
+            hasta=hasta,
+            con_comentarios=con_comentarios,
+            incluir_archivados=export_archivados,
+        ),
+        file_name=f"tickets_{datetime.now().strftime('%d_%m_%Y')}.{extension}",
+        mime=mime,
+        use_container_width=True
+    )
 
 # ============================================================
 # VISTA ADMIN
@@ -120,179 +345,135 @@ def vista_admin():
     st.markdown("Gestión de Tickets de Soporte")
     st.divider()
 
-    tickets = cargar_tickets()
+    resumen = repositorio.resumen_tickets()
+    por_estado = resumen['por_estado']
 
     # DASHBOARD
     st.subheader("📊 Dashboard")
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
-        st.metric("📋 Total", len(tickets))
+        st.metric("📋 Total", resumen['total'], help="Sin contar tickets archivados")
     with col2:
-        st.metric("🔴 Abiertos", len([t for t in tickets if t['estado'] == 'Abierto']))
+        st.metric("🔴 Abiertos", por_estado.get('Abierto', 0))
     with col3:
-        st.metric("🟡 En Progreso", len([t for t in tickets if t['estado'] == 'En Progreso']))
+        st.metric("🟡 En Progreso", por_estado.get('En Progreso', 0))
     with col4:
-        st.metric("🟢 Cerrados", len([t for t in tickets if t['estado'] == 'Cerrado']))
+        st.metric("🟢 Cerrados", por_estado.get('Cerrado', 0))
     with col5:
-        st.metric("👥 Usuarios", len(set([t['usuario'] for t in tickets])))
+        st.metric("👥 Usuarios", len(resumen['usuarios']))
 
     st.divider()
 
     # FILTROS
-    col1, col2, col3 = st.columns(3)
+    col1, col2 = st.columns([0.8, 0.2])
+    with col1:
+        texto_busqueda = ""
+        if repositorio.extras:
+            texto_busqueda = st.text_input(
+                "🔍 Buscar en títulos, descripciones y comentarios:",
+                placeholder='Ej: fundo norte -riego, "planilla marzo"'
+            ).strip()
+    with col2:
+        incluir_archivados = st.toggle("📦 Incluir archivados", key="admin_archivados")
+    col1, col2, col3, col4 = st.columns([0.3, 0.3, 0.25, 0.15])
     with col1:
         filtro_estado = st.selectbox("Filtrar por estado:", ["Todos", "Abierto", "En Progreso", "Cerrado"])
     with col2:
-        usuarios_list = sorted(list(set([t['usuario'] for t in tickets])))
-        filtro_usuario = st.selectbox("Filtrar por usuario:", ["Todos"] + usuarios_list)
+        filtro_usuario = st.selectbox("Filtrar por usuario:", ["Todos"] + resumen['usuarios'])
     with col3:
         ordenar_por = st.selectbox("Ordenar por:", ["Más recientes", "Más antiguos", "Más registros"])
+    with col4:
+        por_pagina = st.selectbox(
+            "Por página:", OPCIONES_POR_PAGINA,
+            index=OPCIONES_POR_PAGINA.index(TICKETS_POR_PAGINA)
+        )
 
-    tickets_filtrados = tickets
-    if filtro_estado != "Todos":
-        tickets_filtrados = [t for t in tickets_filtrados if t['estado'] == filtro_estado]
-    if filtro_usuario != "Todos":
-        tickets_filtrados = [t for t in tickets_filtrados if t['usuario'] == filtro_usuario]
-
-    if ordenar_por == "Más recientes":
-        tickets_filtrados = sorted(tickets_filtrados, key=lambda x: x['fecha_creacion'], reverse=True)
-    elif ordenar_por == "Más antiguos":
-        tickets_filtrados = sorted(tickets_filtrados, key=lambda x: x['fecha_creacion'])
-    elif ordenar_por == "Más registros":
-        tickets_filtrados = sorted(tickets_filtrados, key=lambda x: x['cantidad_registros'], reverse=True)
+    estado_sql = None if filtro_estado == "Todos" else filtro_estado
+    usuario_sql = None if filtro_usuario == "Todos" else filtro_usuario
+    filtros = (texto_busqueda, estado_sql, usuario_sql, ordenar_por, por_pagina, incluir_archivados)
+    despues = cursor_actual("admin_tickets", filtros)
+
+    def cargar_pagina():
+        if texto_busqueda:
+            # Con búsqueda el orden es por relevancia
+            tickets, siguiente = buscar_tickets(
+                texto_busqueda,
+                estado=estado_sql,
+                usuario=usuario_sql,
+                limite=por_pagina,
+                despues=despues,
+                incluir_archivados=incluir_archivados
+            )
+        else:
+            tickets, siguiente = repositorio.listar_tickets(
+                estado=estado_sql,
+                usuario=usuario_sql,
+                orden=ordenar_por,
+                limite=por_pagina,
+                despues=despues,
+                incluir_archivados=incluir_archivados
+            )
+        return tickets, siguiente, repositorio.comentarios_de_tickets([t['id'] for t in tickets])
+
+    # Entre reruns sin cambios en tickets se reutiliza la página ya leída
+    tickets_filtrados, siguiente, comentarios = listado_sincronizado(
+        "admin_pagina", (filtros, despues), cargar_pagina
+    )
 
     st.divider()
 
     if not tickets_filtrados:
         st.info("📭 No hay tickets con estos filtros")
     else:
-        st.subheader(f"📋 Tickets ({len(tickets_filtrados)})")
+        # Sin COUNT(*) por recarga: el total exacto sale del resumen cuando
+        # los filtros coinciden con él; si no, se navega con "siguiente"
+        if texto_busqueda or usuario_sql or incluir_archivados:
+            st.subheader("📋 Tickets")
+        else:
+            total = por_estado.get(estado_sql, 0) if estado_sql else resumen['total']
+            st.subheader(f"📋 Tickets ({total})")
 
         df_display = pd.DataFrame([{
             'ID': t['id'],
             'Título': t['titulo'][:50],
             'Usuario': t['usuario'],
-            'Estado': t['estado'],
+            'Estado': f"{t['estado']} 📦" if t['archivado'] else t['estado'],
             'Registros': t['cantidad_registros'],
-            'Creado': t['fecha_creacion'],
-            'Actualizado': t['fecha_actualizacion']
+            'Creado': formatear_fecha(t['fecha_creacion']),
+            'Actualizado': formatear_fecha(t['fecha_actualizacion'])
         } for t in tickets_filtrados])
-        st.dataframe(df_display, use_container_width=True, hide_index=True)
+        modo_masivo = st.toggle("☑️ Selección múltiple", key="modo_masivo")
+        # Otra página u otros filtros: selección nueva
+        clave_tabla = f"{filtros}_{despues}"
+        evento = st.dataframe(
+            df_display,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row" if modo_masivo else "single-row",
+            key=f"tabla_tickets_{'masivo' if modo_masivo else 'detalle'}_{clave_tabla}"
+        )
+        # Tras un cambio la fila puede salir de la página
+        filas = [i for i in evento.selection.rows if i < len(tickets_filtrados)]
+        seleccionado = None
+        if modo_masivo:
+            acciones_masivas([tickets_filtrados[i] for i in filas], username)
+        elif filas:
+            seleccionado = tickets_filtrados[filas[0]]
+        controles_paginacion("admin_tickets", siguiente)
 
         st.divider()
-        st.subheader("🎫 Detalles de Tickets")
-
-        for ticket in tickets_filtrados:
-            color = '🔴' if ticket['estado'] == 'Abierto' else '🟡' if ticket['estado'] == 'En Progreso' else '🟢'
-
-            with st.expander(f"{color} [{ticket['id']}] {ticket['titulo']}"):
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    st.write("**Información General**")
-                    st.write(f"**ID:** {ticket['id']}")
-                    st.write(f"**Usuario:** {ticket['usuario']}")
-                    st.write(f"**Registros:** {ticket['cantidad_registros']}")
-
-                with col2:
-                    st.write("**Fechas**")
-                    st.write(f"**Creado:** {ticket['fecha_creacion']}")
-                    st.write(f"**Actualizado:** {ticket['fecha_actualizacion']}")
-
-                with col3:
-                    st.write("**Cambiar Estado**")
-                    nuevo_estado = st.selectbox(
-                        "Estado:",
-                        ["Abierto", "En Progreso", "Cerrado"],
-                        index=["Abierto", "En Progreso", "Cerrado"].index(ticket['estado']),
-                        key=f"estado_{ticket['id']}"
-                    )
-                    if nuevo_estado != ticket['estado']:
-                        if st.button("✅ Actualizar", key=f"btn_update_{ticket['id']}"):
-                            cambiar_estado_ticket(ticket['id'], nuevo_estado, ticket['titulo'])
-                            st.success("✅ Estado actualizado")
-                            st.rerun()
-                st.divider()
-                st.write("**Descripción:**")
-                st.write(ticket['descripcion'])
-                st.divider()
-
-                st.write("**📎 Archivo Adjunto:**")
-                archivo_binario, nombre_archivo = obtener_archivo(ticket['id'])
-                if archivo_binario and nombre_archivo:
-                    col1, col2 = st.columns([0.7, 0.3])
-                    with col1:
-                        st.write(f"📁 `{nombre_archivo}`")
-                    with col2:
-                        st.download_button(
-                            label="📥 Descargar",
-                            data=archivo_binario,
-                            file_name=nombre_archivo,
-                            key=f"download_{ticket['id']}"
-                        )
-                    st.write("**📊 Vista previa de datos:**")
-                    try:
-                        df_datos = pd.read_excel(io.BytesIO(archivo_binario))
-                        st.dataframe(df_datos, use_container_width=True, height=300)
-                        csv = df_datos.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="📊 Descargar como CSV",
-                            data=csv,
-                            file_name=f"{ticket['id']}_datos.csv",
-                            mime="text/csv",
-                            key=f"csv_{ticket['id']}"
-                        )
-                    except Exception as e:
-                        st.error(f"Error al leer archivo: {str(e)}")
-
-                st.divider()
-                st.write("**💬 Comentarios:**")
-                if ticket['comentarios']:
-                    for com in ticket['comentarios']:
-                        st.write(f"👤 **{com['usuario']}** _{com['fecha']}_")
-                        st.write(f"> {com['texto']}")
-                else:
-                    st.info("Sin comentarios")
-
-                nuevo_comentario = st.text_area("Agregar comentario:", key=f"comentario_{ticket['id']}", height=80)
-                col1, col2 = st.columns([0.7, 0.3])
-                with col2:
-                    if st.button("💬 Enviar", key=f"btn_comentario_{ticket['id']}"):
-                        if nuevo_comentario.strip():
-                            agregar_comentario(ticket['id'], username, nuevo_comentario)
-                            st.success("✅ Comentario agregado")
-                            st.rerun()
-                        else:
-                            st.warning("Escribe un comentario")
-
-                st.divider()
-                st.write("**⚠️ Acciones Administrativas**")
-                col1, col2 = st.columns([0.7, 0.3])
-                with col2:
-                    if st.button("🗑️ Eliminar Ticket", key=f"delete_{ticket['id']}", type="secondary"):
-                        eliminar_ticket(ticket['id'])
-                        st.warning("✅ Ticket eliminado")
-                        st.rerun()
+        st.subheader("🎫 Detalle del Ticket")
+        if seleccionado is None:
+            st.info("👆 Selecciona un ticket en la tabla para ver su detalle")
+        else:
+            detalle_ticket(seleccionado, comentarios, username)
 
-    st.divider()
-    st.subheader("📊 Exportación de Datos")
-    if st.button("📥 Exportar Tickets a CSV", use_container_width=True):
-        df_export = pd.DataFrame([{
-            'ID': t['id'],
-            'Título': t['titulo'],
-            'Usuario': t['usuario'],
-            'Estado': t['estado'],
-            'Registros': t['cantidad_registros'],
-            'Creado': t['fecha_creacion'],
-            'Actualizado': t['fecha_actualizacion']
-        } for t in tickets])
-        csv = df_export.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Descargar CSV",
-            data=csv,
-            file_name=f"tickets_{datetime.now().strftime('%d_%m_%Y')}.csv",
-            mime="text/csv"
-        )
+    panel_lateral()
+
+    # Filas de adjuntos, SLA y exportación solo existen en Postgres
+    if repositorio.extras:
+        secciones_analisis(resumen)
 
 # ============================================================
 # MAIN
@@ -5,6 +5,7 @@ from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from auth import require_auth
+from lectura_excel import MOTOR, leer_excel
 
 
 st.title("📊 Comparador de Asistencia entre 2 Archivos")
@@ -15,10 +16,24 @@ st.sidebar.header("📁 Cargar Archivos")
 uploaded_file_1 = st.sidebar.file_uploader("Archivo 1 (período 1)", type=["xlsx", "xls"], key="file1")
 uploaded_file_2 = st.sidebar.file_uploader("Archivo 2 (período 2)", type=["xlsx", "xls"], key="file2")
 
+# Columnas que usa la página; el resto del export no se lee
+COLUMNAS_ASISTENCIA = [
+    'FECHA', 'CÓDIGO EMPLEADO', 'TRABAJADOR', 'SUPERVISOR', 'GRUPO',
+    'ACTIVIDAD', 'H. INICIO', 'H. FIN', 'TOTAL',
+]
+TIPOS_ASISTENCIA = {
+    'TRABAJADOR': str,
+    'SUPERVISOR': str,
+    'GRUPO': str,
+    'ACTIVIDAD': str,
+    'TOTAL': str,
+}
+
 def procesar_archivo(uploaded_file, nombre):
     """Procesa un archivo Excel y retorna dataframe preparado"""
     try:
-        df = pd.read_excel(uploaded_file)
+        df, segundos = leer_excel(uploaded_file, COLUMNAS_ASISTENCIA, TIPOS_ASISTENCIA)
+        st.sidebar.caption(f"⏱️ {nombre} leído en {segundos:.2f} s ({MOTOR})")
         
         # Convertir FECHA a datetime
         df['FECHA'] = pd.to_datetime(df['FECHA'], format='%d/%m/%Y')
@@ -4,6 +4,16 @@ import plotly.graph_objs as go
 import plotly.express as px
 import numpy as np
 from auth import require_auth
+from lectura_excel import MOTOR, leer_excel
+
+# Se leen todas las columnas: la tabla final muestra el archivo completo
+TIPOS_INCIDENCIAS = {
+    'ÁREA/FUNDO INVOLUCRADA': str,
+    'RESPONSABLE DE INCIDENCIA': str,
+    'EMPRESA': str,
+    'TIPO INCIDENCIA': str,
+    'TIPO': str,
+}
 
 def calcular_indicadores(df):
     # Total de modificaciones
@@ -244,7 +254,8 @@ def main():
     
     if uploaded_file is not None:
         # Leer archivo
-        df = pd.read_excel(uploaded_file)
+        df, segundos = leer_excel(uploaded_file, tipos=TIPOS_INCIDENCIAS)
+        st.caption(f"⏱️ {len(df):,} registros leídos en {segundos:.2f} s ({MOTOR})")
         
         # Convertir FECHA a datetime
         df['FECHA'] = pd.to_datetime(df['FECHA'])
@@ -5,13 +5,18 @@ Archivos en PostgreSQL - BD COMPARTIDA
 """
 
 import streamlit as st
-import pandas as pd
-import json
-import psycopg2
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 import io
 from auth import require_auth
+from tickets_db import formatear_fecha
+from repositorio import obtener_repositorio
+from paginacion import cursor_actual, controles_paginacion
+from sincronizacion import listado_sincronizado
+from vistas_previas import generar_vista_previa
+from ingesta import COLUMNAS_FILAS
+from blobs import AdjuntoDemasiadoGrandeError, tamano_maximo, validar_tamano
+from lectura_excel import leer_excel
 
 # ============================================================
 # AUTENTICACIÓN
@@ -22,138 +27,8 @@ from auth import require_auth
 # ============================================================
 
 
-COLUMNAS_REQUERIDAS = ['DNI', 'NOMBRES Y APELLIDOS', 'ACTIVIDAD', 'SUPER', 'FUNDO', 'OBSERVACIONES']
-
-# ============================================================
-# CONEXIÓN A BASE DE DATOS
-# ============================================================
-
-def get_db_connection():
-    """Conectar a PostgreSQL"""
-    try:
-        conn = psycopg2.connect(st.secrets["database_url"])
-        return conn
-    except KeyError:
-        st.error("❌ Error: variable 'database_url' no encontrada en Secrets")
-        st.info("Agrega tu URL de Supabase en Settings → Secrets con el nombre 'database_url'")
-        st.stop()
-    except psycopg2.OperationalError as e:
-        st.error(f"❌ Error de conexión a la BD: {str(e)}")
-        st.stop()
-    except Exception as e:
-        st.error(f"❌ Error desconocido: {type(e).__name__}: {str(e)}")
-        st.stop()
-
-def inicializar_db():
-    """Inicializar tabla en PostgreSQL"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tickets (
-            id TEXT PRIMARY KEY,
-            titulo TEXT NOT NULL,
-            descripcion TEXT,
-            usuario TEXT NOT NULL,
-            estado TEXT NOT NULL,
-            fecha_creacion TEXT,
-            fecha_actualizacion TEXT,
-            cantidad_registros INTEGER,
-            comentarios TEXT,
-            archivo_binario BYTEA,
-            nombre_archivo TEXT
-        )
-    ''')
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def cargar_tickets():
-    """Cargar todos los tickets"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tickets ORDER BY fecha_creacion DESC')
-    columnas = [desc[0] for desc in cursor.description]
-    
-    tickets = []
-    for row in cursor.fetchall():
-        ticket = dict(zip(columnas, row))
-        ticket['comentarios'] = json.loads(ticket['comentarios'] or '[]')
-        tickets.append(ticket)
-    
-    cursor.close()
-    conn.close()
-    return tickets
-
-def guardar_ticket(ticket, contenido_archivo=None):
-    """Guardar ticket en PostgreSQL"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO tickets 
-        (id, titulo, descripcion, usuario, estado, fecha_creacion, fecha_actualizacion, cantidad_registros, comentarios, archivo_binario, nombre_archivo)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ''', (
-        ticket['id'],
-        ticket['titulo'],
-        ticket['descripcion'],
-        ticket['usuario'],
-        ticket['estado'],
-        ticket['fecha_creacion'],
-        ticket['fecha_actualizacion'],
-        ticket['cantidad_registros'],
-        json.dumps(ticket['comentarios']),
-        contenido_archivo,
-        ticket.get('nombre_archivo')
-    ))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def agregar_comentario(ticket_id, usuario, comentario):
-    """Agregar comentario a un ticket"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT comentarios FROM tickets WHERE id = %s', (ticket_id,))
-    resultado = cursor.fetchone()
-    comentarios = json.loads(resultado[0] or '[]') if resultado else []
-    
-    comentarios.append({
-        'usuario': usuario,
-        'texto': comentario,
-        'fecha': datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    })
-    
-    cursor.execute('''
-        UPDATE tickets 
-        SET comentarios = %s, fecha_actualizacion = %s
-        WHERE id = %s
-    ''', (json.dumps(comentarios), datetime.now().strftime('%d/%m/%Y %H:%M:%S'), ticket_id))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def obtener_archivo(ticket_id):
-    """Obtener archivo de un ticket"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT archivo_binario, nombre_archivo FROM tickets WHERE id = %s', (ticket_id,))
-    resultado = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    
-    if resultado:
-        archivo_binario, nombre_archivo = resultado
-        # Convertir memoryview a bytes si es necesario
-        if isinstance(archivo_binario, memoryview):
-            archivo_binario = bytes(archivo_binario)
-        return archivo_binario, nombre_archivo
-    return None, None
+COLUMNAS_REQUERIDAS = list(COLUMNAS_FILAS)
+TICKETS_POR_PAGINA = 20
 
 # ============================================================
 # FUNCIONES DE UTILIDAD
@@ -182,24 +57,30 @@ def crear_ticket(titulo, descripcion, usuario, archivo, df_datos):
         'descripcion': descripcion,
         'usuario': usuario,
         'estado': 'Abierto',
-        'fecha_creacion': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-        'fecha_actualizacion': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+        'fecha_creacion': datetime.now(timezone.utc),
+        'fecha_actualizacion': datetime.now(timezone.utc),
         'nombre_archivo': archivo.name,
-        'cantidad_registros': len(df_datos),
-        'comentarios': []
+        'cantidad_registros': len(df_datos)
     }
     
-    contenido = archivo.getbuffer().tobytes()
-    guardar_ticket(ticket, contenido)
+    # El adjunto se guarda por trozos directo desde el archivo subido
+    repositorio = obtener_repositorio()
+    vista_previa = generar_vista_previa(df_datos) if repositorio.extras else None
+    repositorio.guardar_ticket(ticket, archivo, vista_previa, df_datos)
     
     return ticket
 
+def mostrar_comentarios(comentarios):
+    for com in comentarios:
+        st.write(f"👤 **{com['usuario']}** _{formatear_fecha(com['fecha'])}_")
+        st.write(f"> {com['texto']}")
+
 # ============================================================
 # VISTA PRINCIPAL - USUARIO
 # ============================================================
 def main():
-    inicializar_db()
     username = st.session_state.get('user', {}).get('usuario', '')
+    repositorio = obtener_repositorio()
 
     if "ticket_creado" not in st.session_state:
         st.session_state.ticket_creado = False
@@ -216,64 +97,91 @@ def main():
 
     with tab1:
         st.subheader("📋 Mis Tickets de Soporte")
-        tickets = cargar_tickets()
-        mis_tickets = [t for t in tickets if t['usuario'] == username]
+        col1, col2 = st.columns([0.7, 0.3])
+        with col1:
+            filtro_estado = st.selectbox("Filtrar por estado:", ["Todos", "Abierto", "En Progreso", "Cerrado"])
+        with col2:
+            incluir_archivados = st.toggle("📦 Incluir archivados", key="mis_archivados")
+        estado_sql = None if filtro_estado == "Todos" else filtro_estado
+        filtros = (username, estado_sql, incluir_archivados)
+        despues = cursor_actual("mis_tickets", filtros)
+
+        def cargar_pagina():
+            tickets, siguiente = repositorio.listar_tickets(
+                estado=estado_sql,
+                usuario=username,
+                limite=TICKETS_POR_PAGINA,
+                despues=despues,
+                incluir_archivados=incluir_archivados
+            )
+            return tickets, siguiente, repositorio.comentarios_de_tickets([t['id'] for t in tickets])
 
-        if not mis_tickets:
-            st.info("📭 No tienes tickets aún. ¡Crea tu primer ticket!")
-        else:
-            estados_disponibles = list(set([t['estado'] for t in mis_tickets]))
-            filtro_estado = st.selectbox("Filtrar por estado:", ["Todos"] + estados_disponibles)
-            tickets_filtrados = mis_tickets if filtro_estado == "Todos" else [t for t in mis_tickets if t['estado'] == filtro_estado]
+        # Solo la página visible vive en la sesión; se relee si cambió algún ticket
+        tickets_filtrados, siguiente, comentarios = listado_sincronizado(
+            "mis_tickets_pagina", (filtros, despues), cargar_pagina
+        )
 
+        if not tickets_filtrados:
+            if filtro_estado == "Todos":
+                st.info("📭 No tienes tickets aún. ¡Crea tu primer ticket!")
+            else:
+                st.info("📭 No tienes tickets con este estado")
+        else:
             for ticket in tickets_filtrados:
                 color = '🔴' if ticket['estado'] == 'Abierto' else '🟡' if ticket['estado'] == 'En Progreso' else '🟢'
 
-                with st.expander(f"{color} [{ticket['id']}] {ticket['titulo']} - {ticket['estado']}"):
+                archivado = " 📦" if ticket['archivado'] else ""
+                with st.expander(f"{color} [{ticket['id']}] {ticket['titulo']} - {ticket['estado']}{archivado}"):
                     col1, col2, col3 = st.columns(3)
                     with col1:
                         st.metric("ID Ticket", ticket['id'])
                         st.metric("Estado", ticket['estado'])
                     with col2:
                         st.metric("Registros", ticket['cantidad_registros'])
-                        st.metric("Creado", ticket['fecha_creacion'])
+                        st.metric("Creado", formatear_fecha(ticket['fecha_creacion']))
                     with col3:
                         st.metric("Archivo", ticket['nombre_archivo'][:30])
-                        st.metric("Actualizado", ticket['fecha_actualizacion'])
+                        st.metric("Actualizado", formatear_fecha(ticket['fecha_actualizacion']))
 
                     st.divider()
                     st.write("**Descripción:**")
                     st.write(ticket['descripcion'])
                     st.divider()
 
-                    archivo_binario, nombre_archivo = obtener_archivo(ticket['id'])
-                    if archivo_binario:
+                    # El adjunto se copia de la BD por trozos recién al hacer clic
+                    if ticket['nombre_archivo']:
                         st.download_button(
-                            label=f"📥 Descargar: {nombre_archivo}",
-                            data=archivo_binario,
-                            file_name=nombre_archivo,
+                            label=f"📥 Descargar: {ticket['nombre_archivo']}",
+                            data=lambda ticket_id=ticket['id']: repositorio.archivo_temporal(ticket_id),
+                            file_name=ticket['nombre_archivo'],
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                             key=f"download_{ticket['id']}"
                         )
 
                     st.divider()
                     st.write("**💬 Comentarios:**")
-                    if ticket['comentarios']:
-                        for com in ticket['comentarios']:
-                            st.write(f"👤 **{com['usuario']}** _{com['fecha']}_")
-                            st.write(f"> {com['texto']}")
+                    ultimos, hay_mas = comentarios[ticket['id']]
+                    if hay_mas and st.toggle("Ver historial completo", key=f"historial_{ticket['id']}"):
+                        clave = f"comentarios_{ticket['id']}"
+                        pagina, siguiente_com = repositorio.listar_comentarios(ticket['id'], despues=cursor_actual(clave, None))
+                        mostrar_comentarios(pagina)
+                        controles_paginacion(clave, siguiente_com)
+                    elif ultimos:
+                        mostrar_comentarios(ultimos)
                     else:
                         st.info("Sin comentarios aún")
 
                     nuevo_comentario = st.text_area("Agregar comentario:", key=f"comentario_{ticket['id']}", height=80)
                     if st.button("💬 Enviar comentario", key=f"btn_comentario_{ticket['id']}"):
                         if nuevo_comentario.strip():
-                            agregar_comentario(ticket['id'], username, nuevo_comentario)
+                            repositorio.agregar_comentario(ticket['id'], username, nuevo_comentario)
                             st.success("✅ Comentario agregado")
                             st.rerun()
                         else:
                             st.warning("⚠️ Escribe un comentario")
 
+            controles_paginacion("mis_tickets", siguiente)
+
     with tab2:
         if st.session_state.ticket_creado:
             st.success("✅ ¡Ticket creado exitosamente!")
@@ -336,7 +244,10 @@ def main():
             titulo = st.text_input("📌 Título del ticket:")
             descripcion = st.text_area("📝 Descripción (opcional):", height=100)
             st.divider()
-            archivo = st.file_uploader("📎 Archivo Excel:", type=['xlsx', 'xls'])
+            archivo = st.file_uploader(
+                "📎 Archivo Excel:", type=['xlsx', 'xls'],
+                help=f"Máximo {tamano_maximo() / 1024 / 1024:.0f} MB"
+            )
             st.divider()
             col1, col2 = st.columns([0.7, 0.3])
             with col2:
@@ -349,7 +260,9 @@ def main():
                     st.error("❌ Debes adjuntar un archivo")
                 else:
                     try:
-                        df = pd.read_excel(archivo)
+                        # Se rechaza por tamaño antes de leer el Excel
+                        validar_tamano(archivo.size)
+                        df, _ = leer_excel(archivo)
                         es_valido, mensaje = validar_formato_excel(df)
                         if not es_valido:
                             st.error(mensaje)
@@ -361,6 +274,8 @@ def main():
                             import time
                             time.sleep(1.5)
                             st.rerun()
+                    except AdjuntoDemasiadoGrandeError as e:
+                        st.error(f"❌ {str(e)}")
                     except Exception as e:
                         st.error(f"❌ Error: {str(e)}")
 
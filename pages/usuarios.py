@@ -1,16 +1,10 @@
 import streamlit as st
-import requests
 from auth import require_auth
-import os
+from directorio import actualizar_usuario, crear_usuario, eliminar_usuario, listar_usuarios
 
 require_auth(roles_permitidos=['ADMIN'])
 
-import os
-import streamlit as st
-
-API_URL = st.secrets.get("API_URL", os.getenv("API_URL", "http://localhost:3000"))
-def get_headers():
-    return {"Authorization": f"Bearer {st.session_state.get('token', '')}"}
+token = st.session_state.get('token', '')
 
 st.title("👥 Maestro de Usuarios")
 st.divider()
@@ -21,9 +15,8 @@ with tab1:
     st.subheader("📋 Usuarios del Sistema")
 
     try:
-        response = requests.get(f"{API_URL}/users", headers=get_headers())
-        if response.status_code == 200:
-            usuarios = response.json()
+        usuarios = listar_usuarios(token)
+        if usuarios is not None:
 
             if not usuarios:
                 st.info("No hay usuarios registrados")
@@ -54,10 +47,9 @@ with tab1:
                             nuevo_activo = st.checkbox("Activo", value=user['activo'], key=f"activo_{user['id']}")
 
                             if st.button("💾 Actualizar", key=f"update_{user['id']}"):
-                                r = requests.put(
-                                    f"{API_URL}/users/{user['id']}",
-                                    json={"rol": nuevo_rol, "activo": nuevo_activo},
-                                    headers=get_headers()
+                                r = actualizar_usuario(
+                                    token, user['id'],
+                                    {"rol": nuevo_rol, "activo": nuevo_activo}
                                 )
                                 if r.status_code == 200:
                                     st.success("✅ Usuario actualizado")
@@ -69,10 +61,9 @@ with tab1:
                             nueva_password = st.text_input("Nueva Contraseña:", type="password", key=f"pass_{user['id']}")
                             if st.button("🔑 Cambiar Password", key=f"pass_btn_{user['id']}"):
                                 if nueva_password:
-                                    r = requests.put(
-                                        f"{API_URL}/users/{user['id']}",
-                                        json={"password": nueva_password},
-                                        headers=get_headers()
+                                    r = actualizar_usuario(
+                                        token, user['id'],
+                                        {"password": nueva_password}
                                     )
                                     if r.status_code == 200:
                                         st.success("✅ Password actualizado")
@@ -83,7 +74,7 @@ with tab1:
 
                         st.divider()
                         if st.button("🗑️ Eliminar Usuario", key=f"delete_{user['id']}", type="secondary"):
-                            r = requests.delete(f"{API_URL}/users/{user['id']}", headers=get_headers())
+                            r = eliminar_usuario(token, user['id'])
                             if r.status_code == 200:
                                 st.success("✅ Usuario eliminado")
                                 st.rerun()
@@ -109,10 +100,9 @@ with tab2:
                 st.error("❌ Todos los campos son obligatorios")
             else:
                 try:
-                    r = requests.post(
-                        f"{API_URL}/users",
-                        json={"nombre": nombre, "usuario": usuario, "password": password, "email": email, "rol": rol},
-                        headers=get_headers()
+                    r = crear_usuario(
+                        token,
+                        {"nombre": nombre, "usuario": usuario, "password": password, "email": email, "rol": rol}
                     )
                     if r.status_code in [200, 201]:
                         st.success(f"✅ Usuario '{usuario}' creado exitosamente")
@@ -0,0 +1,31 @@
+"""
+PAGINACIÓN POR CURSOR (KEYSET)
+Guarda en session_state la pila de cursores de cada listado
+"""
+
+import streamlit as st
+
+
+def cursor_actual(clave, filtros):
+    """Cursor de la página visible; vuelve a la primera si cambian los filtros"""
+    estado = st.session_state.setdefault(clave, {'filtros': None, 'pila': []})
+    if estado['filtros'] != filtros:
+        estado['filtros'] = filtros
+        estado['pila'] = []
+    return estado['pila'][-1] if estado['pila'] else None
+
+
+def controles_paginacion(clave, siguiente):
+    """Botones Anterior/Siguiente para el listado `clave`"""
+    estado = st.session_state[clave]
+    col1, col2, col3 = st.columns([0.2, 0.6, 0.2])
+    with col1:
+        if estado['pila'] and st.button("⬅️ Anterior", key=f"{clave}_anterior"):
+            estado['pila'].pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Página {len(estado['pila']) + 1}")
+    with col3:
+        if siguiente is not None and st.button("Siguiente ➡️", key=f"{clave}_siguiente"):
+            estado['pila'].append(siguiente)
+            st.rerun()
@@ -0,0 +1,532 @@
+"""
+REPOSITORIO DE TICKETS
+Operaciones de las páginas admin y ticketera detrás de una interfaz común:
+listar, cargar cambios, guardar, comentar, cambiar estado, eliminar y
+leer adjuntos. Postgres es el backend de producción; SQLite permite
+correr y medir las páginas en local sin Supabase.
+
+Configuración opcional en Secrets:
+
+    [repositorio]
+    backend = "postgres"       # o "sqlite"
+    ruta = "tickets.sqlite"    # solo para sqlite
+
+Con SQLite no hay búsqueda, vistas previas, filas de adjuntos, SLA,
+exportación, outbox ni archivo automático: las páginas ocultan esas
+secciones (ver `extras`).
+"""
+
+import io
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import streamlit as st
+
+import tickets_db
+from blobs import TAMANO_TROZO, validar_tamano
+from tickets_db import COLUMNAS_LISTADO, ORDENES
+
+# ============================================================
+# INTERFAZ
+# ============================================================
+
+class RepositorioTickets:
+    """Interfaz común de los backends
+
+    Mismas firmas y resultados que las funciones de tickets_db.
+    """
+
+    # Búsqueda, vistas previas, SLA, exportación, outbox y archivo
+    extras = False
+
+    def listar_tickets(self, estado=None, usuario=None, orden='Más recientes', limite=25, despues=None,
+                       desde=None, hasta=None, incluir_archivados=False):
+        """(tickets, cursor_siguiente) de una página ordenada por `orden`"""
+        raise NotImplementedError
+
+    def contar_tickets(self, estado=None, usuario=None, desde=None, hasta=None, incluir_archivados=False):
+        raise NotImplementedError
+
+    def resumen_tickets(self):
+        """{'total', 'por_estado', 'usuarios'} para el dashboard"""
+        raise NotImplementedError
+
+    def cambios_desde(self, marcador=None, usuario=None, incluir_archivados=False):
+        """(tickets, ids_eliminados, nuevo_marcador); sin marcador, todos"""
+        raise NotImplementedError
+
+    def hay_cambios(self, marcador):
+        raise NotImplementedError
+
+    def marcador_actual(self):
+        raise NotImplementedError
+
+    def comentarios_de_tickets(self, ticket_ids, limite=5):
+        """{ticket_id: (últimos comentarios, hay_mas)}"""
+        raise NotImplementedError
+
+    def listar_comentarios(self, ticket_id, limite=20, despues=None):
+        """(comentarios, cursor_siguiente) en orden cronológico"""
+        raise NotImplementedError
+
+    def obtener_archivo(self, ticket_id):
+        """(contenido, nombre_archivo), o (None, None)"""
+        raise NotImplementedError
+
+    def archivo_temporal(self, ticket_id):
+        """Archivo temporal de solo lectura con el adjunto, o None (ver tickets_db.para_descarga)"""
+        raise NotImplementedError
+
+    def guardar_ticket(self, ticket, archivo=None, vista_previa=None, df_filas=None):
+        raise NotImplementedError
+
+    def agregar_comentario_tickets(self, ticket_ids, usuario, comentario):
+        raise NotImplementedError
+
+    def cambiar_estado_tickets(self, ticket_ids, nuevo_estado, token=None, usuario=None):
+        """Devuelve [(id, titulo)] de los tickets que cambiaron de estado"""
+        raise NotImplementedError
+
+    def eliminar_tickets(self, ticket_ids):
+        """Devuelve los ids eliminados"""
+        raise NotImplementedError
+
+    def agregar_comentario(self, ticket_id, usuario, comentario):
+        self.agregar_comentario_tickets([ticket_id], usuario, comentario)
+
+    def actualizar_estado_ticket(self, ticket_id, nuevo_estado, token=None, usuario=None):
+        self.cambiar_estado_tickets([ticket_id], nuevo_estado, token, usuario)
+
+    def eliminar_ticket(self, ticket_id):
+        self.eliminar_tickets([ticket_id])
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class PostgresRepositorio(RepositorioTickets):
+    """Las funciones de tickets_db, sobre el pool de db.py"""
+
+    extras = True
+
+    listar_tickets = staticmethod(tickets_db.listar_tickets)
+    contar_tickets = staticmethod(tickets_db.contar_tickets)
+    resumen_tickets = staticmethod(tickets_db.resumen_tickets)
+    cambios_desde = staticmethod(tickets_db.cambios_desde)
+    hay_cambios = staticmethod(tickets_db.hay_cambios)
+    marcador_actual = staticmethod(tickets_db.marcador_actual)
+    comentarios_de_tickets = staticmethod(tickets_db.comentarios_de_tickets)
+    listar_comentarios = staticmethod(tickets_db.listar_comentarios)
+    obtener_archivo = staticmethod(tickets_db.obtener_archivo)
+    archivo_temporal = staticmethod(tickets_db.archivo_temporal)
+    guardar_ticket = staticmethod(tickets_db.guardar_ticket)
+    agregar_comentario_tickets = staticmethod(tickets_db.agregar_comentario_tickets)
+    cambiar_estado_tickets = staticmethod(tickets_db.cambiar_estado_tickets)
+    eliminar_tickets = staticmethod(tickets_db.eliminar_tickets)
+
+
+def _fecha_a_texto(valor):
+    # Siempre UTC y con microsegundos: el texto ordena igual que la fecha
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _a_sqlite(parametros):
+    return [_fecha_a_texto(valor) if isinstance(valor, datetime) else valor for valor in parametros]
+
+
+# Columnas que vuelven como en Postgres; el resto queda como lo guarda SQLite
+COLUMNAS_FECHA = {'fecha_creacion', 'fecha_actualizacion', 'fecha'}
+
+
+def _desde_sqlite(cursor, fila):
+    return tuple(
+        datetime.fromisoformat(valor) if nombre in COLUMNAS_FECHA and valor is not None
+        else bool(valor) if nombre == 'archivado'
+        else valor
+        for (nombre, *_), valor in zip(cursor.description, fila)
+    )
+
+
+class _ConexionSqlite(sqlite3.Connection):
+    """Conexión que convierte fechas y booleanos por su cuenta
+
+    Sin register_adapter/register_converter: esos cambian sqlite3 para
+    todo el proceso, no solo para este repositorio.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_factory = _desde_sqlite
+
+    def execute(self, sql, parametros=()):
+        return super().execute(sql, _a_sqlite(parametros))
+
+    def executemany(self, sql, filas):
+        return super().executemany(sql, (_a_sqlite(fila) for fila in filas))
+
+
+ESQUEMA_SQLITE = '''
+    CREATE TABLE IF NOT EXISTS tickets (
+        id TEXT PRIMARY KEY,
+        titulo TEXT,
+        descripcion TEXT,
+        usuario TEXT,
+        estado TEXT,
+        fecha_creacion TIMESTAMPTZ,
+        fecha_actualizacion TIMESTAMPTZ,
+        cantidad_registros INTEGER,
+        nombre_archivo TEXT,
+        archivado BOOLEAN NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tickets_fecha_creacion ON tickets (fecha_creacion, id);
+    CREATE INDEX IF NOT EXISTS idx_tickets_usuario_fecha ON tickets (usuario, fecha_creacion, id);
+    CREATE INDEX IF NOT EXISTS idx_tickets_registros ON tickets ((COALESCE(cantidad_registros, 0)), id);
+    CREATE INDEX IF NOT EXISTS idx_tickets_version ON tickets (version);
+
+    CREATE TABLE IF NOT EXISTS ticket_comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+        usuario TEXT NOT NULL,
+        texto TEXT NOT NULL,
+        fecha TIMESTAMPTZ NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ticket_comments_ticket_fecha ON ticket_comments (ticket_id, fecha, id);
+
+    CREATE TABLE IF NOT EXISTS ticket_adjuntos (
+        ticket_id TEXT PRIMARY KEY REFERENCES tickets(id) ON DELETE CASCADE,
+        contenido BLOB NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS tickets_eliminados (
+        id TEXT NOT NULL,
+        usuario TEXT,
+        version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tickets_eliminados_version ON tickets_eliminados (version);
+
+    CREATE TABLE IF NOT EXISTS versiones (valor INTEGER NOT NULL);
+    INSERT INTO versiones (valor) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM versiones);
+'''
+
+
+class SqliteRepositorio(RepositorioTickets):
+    """Tickets en un archivo SQLite, con el mismo comportamiento que Postgres
+
+    `version` sale de un contador que sube con cada escritura (en Postgres
+    es el id de transacción) y los borrados dejan lápida en
+    tickets_eliminados, igual que la migración 'cambios'.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with self._conexion() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript(ESQUEMA_SQLITE)
+
+    @contextmanager
+    def _conexion(self):
+        # Una conexión por operación: sqlite3 no comparte conexiones entre hilos
+        conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, factory=_ConexionSqlite)
+        try:
+            conn.execute('PRAGMA foreign_keys = ON')
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaccion(self, escritura=False):
+        with self._conexion() as conn:
+            conn.execute('BEGIN IMMEDIATE' if escritura else 'BEGIN')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _siguiente_version(self, conn):
+        return conn.execute('UPDATE versiones SET valor = valor + 1 RETURNING valor').fetchone()[0]
+
+    @staticmethod
+    def _condiciones(estado=None, usuario=None, desde=None, hasta=None, archivados=True):
+        condiciones, params = [], []
+        if not archivados:
+            condiciones.append('NOT archivado')
+        if estado:
+            condiciones.append('estado = ?')
+            params.append(estado)
+        if usuario:
+            condiciones.append('usuario = ?')
+            params.append(usuario)
+        if desde:
+            condiciones.append('fecha_creacion >= ?')
+            params.append(desde)
+        if hasta:
+            condiciones.append('fecha_creacion < ?')
+            params.append(hasta)
+        return condiciones, params
+
+    @staticmethod
+    def _marcadores(cantidad):
+        return ', '.join('?' * cantidad)
+
+    # ------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------
+
+    def listar_tickets(self, estado=None, usuario=None, orden='Más recientes', limite=25, despues=None,
+                       desde=None, hasta=None, incluir_archivados=False):
+        expresion, direccion = ORDENES[orden]
+        condiciones, params = self._condiciones(estado, usuario, desde, hasta, incluir_archivados)
+        if despues is not None:
+            comparador = '<' if direccion == 'DESC' else '>'
+            condiciones.append(f'({expresion}, id) {comparador} (?, ?)')
+            params.extend(despues)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        with self._conexion() as conn:
+            cursor = conn.execute(f'''
+                SELECT {expresion} AS orden_valor, {', '.join(COLUMNAS_LISTADO)}
+                FROM tickets
+                {where}
+                ORDER BY {expresion} {direccion}, id {direccion}
+                LIMIT ?
+            ''', params + [limite + 1])
+            columnas = [desc[0] for desc in cursor.description]
+            filas = cursor.fetchall()
+
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        tickets = [dict(zip(columnas[1:], row[1:])) for row in filas]
+        siguiente = (filas[-1][0], filas[-1][1]) if hay_mas else None
+        return tickets, siguiente
+
+    def contar_tickets(self, estado=None, usuario=None, desde=None, hasta=None, incluir_archivados=False):
+        condiciones, params = self._condiciones(estado, usuario, desde, hasta, incluir_archivados)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        with self._conexion() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM tickets {where}', params).fetchone()[0]
+
+    def resumen_tickets(self):
+        with self._transaccion() as conn:
+            por_estado = dict(conn.execute(
+                'SELECT estado, COUNT(*) FROM tickets WHERE NOT archivado GROUP BY estado'
+            ).fetchall())
+            usuarios = [fila[0] for fila in conn.execute('SELECT DISTINCT usuario FROM tickets ORDER BY usuario')]
+        return {
+            'total': sum(por_estado.values()),
+            'por_estado': por_estado,
+            'usuarios': usuarios,
+        }
+
+    def cambios_desde(self, marcador=None, usuario=None, incluir_archivados=False):
+        condiciones, params = self._condiciones(
+            usuario=usuario, archivados=incluir_archivados or marcador is not None
+        )
+        if marcador is not None:
+            condiciones.append('version >= ?')
+            params.append(marcador)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        with self._transaccion() as conn:
+            nuevo_marcador = self._marcador(conn)
+            cursor = conn.execute(f"SELECT {', '.join(COLUMNAS_LISTADO)} FROM tickets {where}", params)
+            columnas = [desc[0] for desc in cursor.description]
+            tickets = [dict(zip(columnas, row)) for row in cursor.fetchall()]
+            eliminados = []
+            if marcador is not None:
+                condiciones, params = self._condiciones(usuario=usuario)
+                condiciones.append('version >= ?')
+                params.append(marcador)
+                eliminados = [
+                    fila[0] for fila in conn.execute(
+                        f"SELECT id FROM tickets_eliminados WHERE {' AND '.join(condiciones)}", params
+                    )
+                ]
+        if not incluir_archivados:
+            eliminados += [t['id'] for t in tickets if t['archivado']]
+            tickets = [t for t in tickets if not t['archivado']]
+        return tickets, eliminados, nuevo_marcador
+
+    def hay_cambios(self, marcador):
+        with self._conexion() as conn:
+            return bool(conn.execute('''
+                SELECT EXISTS (SELECT 1 FROM tickets WHERE version >= ?)
+                    OR EXISTS (SELECT 1 FROM tickets_eliminados WHERE version >= ?)
+            ''', (marcador, marcador)).fetchone()[0])
+
+    def _marcador(self, conn):
+        # La próxima escritura recibe una versión >= a este marcador
+        return conn.execute('SELECT valor + 1 FROM versiones').fetchone()[0]
+
+    def marcador_actual(self):
+        with self._conexion() as conn:
+            return self._marcador(conn)
+
+    def comentarios_de_tickets(self, ticket_ids, limite=5):
+        resultado = {ticket_id: ([], False) for ticket_id in ticket_ids}
+        if not ticket_ids:
+            return resultado
+        with self._conexion() as conn:
+            filas = conn.execute(f'''
+                SELECT ticket_id, id, usuario, texto, fecha FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY ticket_id ORDER BY fecha DESC, id DESC
+                    ) AS n
+                    FROM ticket_comments
+                    WHERE ticket_id IN ({self._marcadores(len(ticket_ids))})
+                )
+                WHERE n <= ?
+                ORDER BY ticket_id, n
+            ''', list(ticket_ids) + [limite + 1]).fetchall()
+
+        por_ticket = {}
+        for ticket_id, comentario_id, usuario, texto, fecha in filas:
+            por_ticket.setdefault(ticket_id, []).append(
+                {'id': comentario_id, 'usuario': usuario, 'texto': texto, 'fecha': fecha}
+            )
+        for ticket_id, comentarios in por_ticket.items():
+            resultado[ticket_id] = (comentarios[:limite][::-1], len(comentarios) > limite)
+        return resultado
+
+    def listar_comentarios(self, ticket_id, limite=20, despues=None):
+        condicion, params = '', [ticket_id]
+        if despues is not None:
+            condicion = 'AND (fecha, id) > (?, ?)'
+            params.extend(despues)
+        with self._conexion() as conn:
+            filas = conn.execute(f'''
+                SELECT id, usuario, texto, fecha FROM ticket_comments
+                WHERE ticket_id = ? {condicion}
+                ORDER BY fecha, id
+                LIMIT ?
+            ''', params + [limite + 1]).fetchall()
+
+        comentarios = [
+            {'id': comentario_id, 'usuario': usuario, 'texto': texto, 'fecha': fecha}
+            for comentario_id, usuario, texto, fecha in filas[:limite]
+        ]
+        siguiente = None
+        if len(filas) > limite:
+            siguiente = (comentarios[-1]['fecha'], comentarios[-1]['id'])
+        return comentarios, siguiente
+
+    def obtener_archivo(self, ticket_id):
+        with self._conexion() as conn:
+            fila = conn.execute('''
+                SELECT a.contenido, t.nombre_archivo
+                FROM tickets t LEFT JOIN ticket_adjuntos a ON a.ticket_id = t.id
+                WHERE t.id = ?
+            ''', (ticket_id,)).fetchone()
+        return tuple(fila) if fila else (None, None)
+
+    def archivo_temporal(self, ticket_id):
+        with self._conexion() as conn:
+            fila = conn.execute('SELECT rowid FROM ticket_adjuntos WHERE ticket_id = ?', (ticket_id,)).fetchone()
+            if fila is None:
+                return None
+            destino = tempfile.TemporaryFile()
+            try:
+                # Lectura incremental del BLOB, de a TAMANO_TROZO bytes
+                with conn.blobopen('ticket_adjuntos', 'contenido', fila[0], readonly=True) as blob:
+                    while trozo := blob.read(TAMANO_TROZO):
+                        destino.write(trozo)
+            except Exception:
+                destino.close()
+                raise
+        return tickets_db.para_descarga(destino)
+
+    # ------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------
+
+    def guardar_ticket(self, ticket, archivo=None, vista_previa=None, df_filas=None):
+        # Sin vistas previas ni filas de adjuntos: se ignoran
+        tamano = None
+        if archivo is not None:
+            tamano = archivo.seek(0, io.SEEK_END)
+            validar_tamano(tamano)
+            archivo.seek(0)
+        with self._transaccion(escritura=True) as conn:
+            conn.execute('''
+                INSERT INTO tickets
+                (id, titulo, descripcion, usuario, estado, fecha_creacion, fecha_actualizacion,
+                 cantidad_registros, nombre_archivo, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                ticket['id'],
+                ticket['titulo'],
+                ticket['descripcion'],
+                ticket['usuario'],
+                ticket['estado'],
+                ticket['fecha_creacion'],
+                ticket['fecha_actualizacion'],
+                ticket['cantidad_registros'],
+                ticket.get('nombre_archivo'),
+                self._siguiente_version(conn),
+            ))
+            if tamano is not None:
+                # zeroblob reserva el espacio y el contenido se copia por trozos
+                cursor = conn.execute(
+                    'INSERT INTO ticket_adjuntos (ticket_id, contenido) VALUES (?, zeroblob(?))',
+                    (ticket['id'], tamano)
+                )
+                with conn.blobopen('ticket_adjuntos', 'contenido', cursor.lastrowid) as blob:
+                    while trozo := archivo.read(TAMANO_TROZO):
+                        blob.write(trozo)
+
+    def agregar_comentario_tickets(self, ticket_ids, usuario, comentario):
+        if not ticket_ids:
+            return
+        ahora = datetime.now(timezone.utc)
+        with self._transaccion(escritura=True) as conn:
+            conn.executemany(
+                'INSERT INTO ticket_comments (ticket_id, usuario, texto, fecha) VALUES (?, ?, ?, ?)',
+                [(ticket_id, usuario, comentario, ahora) for ticket_id in ticket_ids]
+            )
+            conn.execute(f'''
+                UPDATE tickets SET fecha_actualizacion = ?, version = ?
+                WHERE id IN ({self._marcadores(len(ticket_ids))})
+            ''', [ahora, self._siguiente_version(conn)] + list(ticket_ids))
+
+    def cambiar_estado_tickets(self, ticket_ids, nuevo_estado, token=None, usuario=None):
+        # Sin outbox ni historial de eventos: `token` y `usuario` no se usan
+        if not ticket_ids:
+            return []
+        with self._transaccion(escritura=True) as conn:
+            return conn.execute(f'''
+                UPDATE tickets SET estado = ?, fecha_actualizacion = ?, archivado = 0, version = ?
+                WHERE id IN ({self._marcadores(len(ticket_ids))}) AND estado <> ?
+                RETURNING id, titulo
+            ''', [nuevo_estado, datetime.now(timezone.utc), self._siguiente_version(conn)]
+                + list(ticket_ids) + [nuevo_estado]).fetchall()
+
+    def eliminar_tickets(self, ticket_ids):
+        if not ticket_ids:
+            return []
+        with self._transaccion(escritura=True) as conn:
+            version = self._siguiente_version(conn)
+            eliminados = conn.execute(f'''
+                DELETE FROM tickets WHERE id IN ({self._marcadores(len(ticket_ids))})
+                RETURNING id, usuario
+            ''', list(ticket_ids)).fetchall()
+            conn.executemany(
+                'INSERT INTO tickets_eliminados (id, usuario, version) VALUES (?, ?, ?)',
+                [(ticket_id, usuario, version) for ticket_id, usuario in eliminados]
+            )
+        return [ticket_id for ticket_id, _ in eliminados]
+
+
+@st.cache_resource
+def obtener_repositorio():
+    """Backend configurado en Secrets, compartido por el proceso"""
+    config = st.secrets.get("repositorio", {})
+    if config.get("backend", "postgres") == "sqlite":
+        return SqliteRepositorio(config.get("ruta", "tickets.sqlite"))
+    return PostgresRepositorio()
@@ -0,0 +1,113 @@
+"""
+SINCRONIZACIÓN INCREMENTAL DE TICKETS
+Cada fila de tickets guarda en `version` el id de la transacción que la
+escribió y los borrados dejan una lápida en tickets_eliminados (migración
+'cambios'). La sesión guarda solo la página visible junto con un
+marcador, y en el siguiente rerun la relee únicamente si algún ticket
+cambió o se eliminó desde entonces.
+
+Con LISTEN/NOTIFY un hilo por proceso escucha el canal tickets_cambios y
+las sesiones no consultan nada mientras no llegue un aviso (solo con el
+repositorio de Postgres, ver repositorio.py):
+
+    [sincronizacion]
+    listen = true
+"""
+
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+import streamlit as st
+
+from repositorio import obtener_repositorio
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# LISTEN/NOTIFY
+# ============================================================
+
+class EscuchaCambios:
+    """Hilo con conexión propia en LISTEN; `generacion` sube con cada aviso"""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.generacion = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self._bucle, name="escucha-tickets", daemon=True).start()
+
+    def _avanzar(self):
+        with self._lock:
+            self.generacion += 1
+
+    def _bucle(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute('LISTEN tickets_cambios')
+                # Sin conexión pudieron perderse avisos
+                self._avanzar()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self._avanzar()
+            except psycopg2.Error:
+                logger.exception("Se perdió la escucha de cambios, reconectando")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+@st.cache_resource
+def obtener_escucha():
+    """Escucha única por proceso, o None si no está activada en Secrets"""
+    if not st.secrets.get("sincronizacion", {}).get("listen", False) or not obtener_repositorio().extras:
+        return None
+    return EscuchaCambios(st.secrets["database_url"])
+
+
+def _generacion():
+    escucha = obtener_escucha()
+    return escucha.generacion if escucha else None
+
+
+# ============================================================
+# ESTADO POR SESIÓN
+# ============================================================
+
+def listado_sincronizado(clave, parametros, cargar):
+    """Resultado de `cargar()` reutilizado mientras no cambie ningún ticket
+
+    Para la página visible de un listado (admin, "Mis Tickets"): si
+    cambian `parametros` o algún ticket, se vuelve a cargar.
+    """
+    generacion = _generacion()
+    estado = st.session_state.get(clave)
+    repositorio = obtener_repositorio()
+    if estado and estado['parametros'] == parametros:
+        if generacion is not None:
+            if generacion == estado['generacion']:
+                return estado['resultado']
+        elif not repositorio.hay_cambios(estado['marcador']):
+            return estado['resultado']
+
+    marcador = repositorio.marcador_actual()
+    resultado = cargar()
+    st.session_state[clave] = {
+        'parametros': parametros,
+        'marcador': marcador,
+        'generacion': generacion,
+        'resultado': resultado,
+    }
+    return resultado
@@ -0,0 +1,81 @@
+"""
+MÉTRICAS DE SLA
+Tiempos de primera respuesta y de resolución por ticket. Los triggers de
+la migración 'sla' registran cada transición en ticket_eventos y
+actualizan ticket_sla al escribir; aquí solo se agregan esas filas.
+
+Primera respuesta: primer cambio fuera de 'Abierto' o primer comentario
+de alguien distinto al autor. Resolución: último paso a 'Cerrado' (si se
+reabre, vuelve a contar).
+"""
+
+import pandas as pd
+import streamlit as st
+
+from db import conexion
+
+# Agrupación de la UI -> expresión SQL sobre ticket_sla
+AGRUPACIONES = {
+    'Usuario': 'usuario',
+    'Mes': "to_char(date_trunc('month', creado), 'YYYY-MM')",
+    'Semana': "to_char(date_trunc('week', creado), 'YYYY-MM-DD')",
+}
+
+
+def _filtro_fechas(desde=None, hasta=None):
+    condiciones, params = [], []
+    if desde:
+        condiciones.append('creado >= %s')
+        params.append(desde)
+    if hasta:
+        condiciones.append('creado < %s')
+        params.append(hasta)
+    return f"WHERE {' AND '.join(condiciones)}" if condiciones else '', params
+
+
+@st.cache_data(ttl=300)
+def metricas_sla(agrupar=None, desde=None, hasta=None):
+    """Tiempos en horas por grupo (clave de AGRUPACIONES) o del total
+
+    Columnas: tickets, respondidos, resueltos, y promedio/p50/p90 de
+    primera respuesta y de resolución.
+    """
+    grupo = AGRUPACIONES[agrupar] if agrupar else "'Total'"
+    where, params = _filtro_fechas(desde, hasta)
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {grupo} AS grupo,
+                       COUNT(*) AS tickets,
+                       COUNT(primera_respuesta) AS respondidos,
+                       COUNT(resuelto) AS resueltos,
+                       AVG(primera_respuesta_seg) / 3600 AS respuesta_promedio_h,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY primera_respuesta_seg) / 3600 AS respuesta_p50_h,
+                       percentile_cont(0.9) WITHIN GROUP (ORDER BY primera_respuesta_seg) / 3600 AS respuesta_p90_h,
+                       AVG(resolucion_seg) / 3600 AS resolucion_promedio_h,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY resolucion_seg) / 3600 AS resolucion_p50_h,
+                       percentile_cont(0.9) WITHIN GROUP (ORDER BY resolucion_seg) / 3600 AS resolucion_p90_h
+                FROM ticket_sla
+                {where}
+                GROUP BY 1
+                ORDER BY 1
+            ''', params)
+            columnas = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(cursor.fetchall(), columns=columnas)
+    horas = [col for col in columnas if col.endswith('_h')]
+    df[horas] = df[horas].astype(float).round(2)
+    return df
+
+
+def eventos_ticket(ticket_id):
+    """Historial de eventos de un ticket, en orden"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT fecha, tipo, estado_anterior, estado_nuevo, usuario
+                FROM ticket_eventos
+                WHERE ticket_id = %s
+                ORDER BY fecha, id
+            ''', (ticket_id,))
+            columnas = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columnas)
@@ -0,0 +1,156 @@
+"""
+Fixtures compartidas. Las pruebas contra Postgres usan la base de
+TEST_DATABASE_URL (local o de pruebas, nunca la de Secrets) y se saltan
+si no está definida:
+
+    TEST_DATABASE_URL=postgresql://localhost/tickets_test python -m pytest
+"""
+
+import fnmatch
+import io
+import os
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.secrets import Secrets
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def excel_de_prueba(filas=3):
+    """Bytes de un Excel con el formato de la ticketera"""
+    from ingesta import COLUMNAS_FILAS
+    df = pd.DataFrame({col: [f"{col.lower()} {i}" for i in range(filas)] for col in COLUMNAS_FILAS})
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def ticket_de_prueba(usuario, **campos):
+    ahora = datetime.now(timezone.utc)
+    ticket = {
+        'id': f"p{uuid.uuid4().hex[:7]}",
+        'titulo': "Ticket de prueba",
+        'descripcion': "Generado por las pruebas",
+        'usuario': usuario,
+        'estado': 'Abierto',
+        'fecha_creacion': ahora,
+        'fecha_actualizacion': ahora,
+        'nombre_archivo': 'prueba.xlsx',
+        'cantidad_registros': 3,
+    }
+    ticket.update(campos)
+    return ticket
+
+
+def _usar_secrets(monkeypatch, valores):
+    # Igual que AppTest: reemplazar st.secrets para todo el proceso
+    secretos = Secrets()
+    secretos._secrets = valores
+    monkeypatch.setattr(st, 'secrets', secretos)
+
+
+@pytest.fixture(autouse=True)
+def _raiz_y_caches(monkeypatch):
+    """Las páginas se abren con rutas relativas a la raíz; cachés limpias en cada prueba"""
+    monkeypatch.chdir(RAIZ)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    yield
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+@pytest.fixture
+def dsn_prueba(monkeypatch):
+    """DSN de TEST_DATABASE_URL con el esquema migrado; st.secrets apunta a esa base"""
+    dsn = os.environ.get('TEST_DATABASE_URL')
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    _usar_secrets(monkeypatch, {'database_url': dsn})
+    from db import obtener_pool
+    from migraciones import aplicar_migraciones
+    aplicar_migraciones()
+    yield dsn
+    obtener_pool().cerrar()
+
+
+@pytest.fixture
+def usuario_postgres(dsn_prueba):
+    """Usuario único; sus tickets se eliminan al terminar"""
+    import tickets_db
+    usuario = f"prueba_{uuid.uuid4().hex[:8]}"
+    yield usuario
+    tickets, _, _ = tickets_db.cambios_desde(None, usuario=usuario, incluir_archivados=True)
+    tickets_db.eliminar_tickets([t['id'] for t in tickets])
+
+
+@pytest.fixture
+def ruta_sqlite(tmp_path):
+    return str(tmp_path / "tickets.sqlite")
+
+
+@pytest.fixture
+def descargas(monkeypatch):
+    """Registra los download_button diferidos para "hacer clic" después del run
+
+    Devuelve una función que ejecuta cada callable (o los cuyo nombre de
+    archivo coincide con el patrón `nombre`) por el mismo camino que Streamlit al hacer clic y devuelve la lista de
+    bytes descargados.
+    """
+    registradas = []
+    add_deferred = MediaFileManager.add_deferred
+
+    def registrar(self, data_callable, mimetype, coordinates, file_name=None):
+        file_id = add_deferred(self, data_callable, mimetype, coordinates, file_name=file_name)
+        registradas.append((self, file_id, file_name))
+        return file_id
+
+    monkeypatch.setattr(MediaFileManager, 'add_deferred', registrar)
+    # Sin esto, al terminar el run se descartan los callables de la sesión
+    monkeypatch.setattr(MediaFileManager, '_remove_orphaned_deferred_callables', lambda self: None)
+
+    def descargar(nombre=None):
+        contenidos = []
+        for manager, file_id, file_name in registradas:
+            if nombre is not None and not fnmatch.fnmatch(file_name or '', nombre):
+                continue
+            url = manager.execute_deferred(file_id)
+            contenidos.append(manager._storage.get_file(url.rsplit('/', 1)[1]).content)
+        return contenidos
+
+    return descargar
+
+
+@pytest.fixture
+def seleccion_de_filas(monkeypatch):
+    """st.dataframe con on_select devuelve las filas de session_state['_filas']
+
+    AppTest no puede marcar filas de una tabla.
+    """
+    dataframe = st.dataframe
+
+    def con_seleccion(*args, **kwargs):
+        resultado = dataframe(*args, **kwargs)
+        if kwargs.get('on_select') == 'rerun':
+            return SimpleNamespace(selection=SimpleNamespace(rows=st.session_state.get('_filas', [])))
+        return resultado
+
+    monkeypatch.setattr(st, 'dataframe', con_seleccion)
+
+
+def sesion_de_pagina(pagina, usuario, rol, secretos):
+    """AppTest de una página con la sesión ya autenticada"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(pagina, default_timeout=60)
+    at.secrets.update(secretos)
+    at.session_state['token'] = 'prueba'
+    at.session_state['rol'] = rol
+    at.session_state['nombre'] = usuario
+    at.session_state['user'] = {'usuario': usuario, 'rol': rol, 'nombre': usuario}
+    return at
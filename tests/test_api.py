@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from api import API_DEFAULTS, CircuitoAbiertoError, ClienteAPI
+
+
+def _cliente(monkeypatch, respuestas):
+    """Cliente cuyo session.request devuelve o lanza, en orden, `respuestas`"""
+    cliente = ClienteAPI("http://backend", **dict(API_DEFAULTS, umbral_circuito=1))
+
+    def request(metodo, url, **kwargs):
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, BaseException):
+            raise respuesta
+        return respuesta
+
+    monkeypatch.setattr(cliente.session, 'request', request)
+    return cliente
+
+
+def test_error_ajeno_al_backend_no_deja_el_circuito_semiabierto(monkeypatch):
+    cliente = _cliente(monkeypatch, [
+        SimpleNamespace(status_code=503),
+        ValueError("cabecera inválida"),
+        SimpleNamespace(status_code=200),
+    ])
+    cliente.circuito.enfriamiento = 0
+    assert cliente.get("/users").status_code == 503
+    assert cliente.circuito.estado() == 'abierto'
+
+    # La llamada de prueba falla antes de llegar al backend
+    with pytest.raises(ValueError):
+        cliente.get("/users")
+    assert cliente.get("/users").status_code == 200
+    assert cliente.circuito.estado() == 'cerrado'
+
+
+def test_rechazadas_no_cuentan_como_latencia(monkeypatch):
+    cliente = _cliente(monkeypatch, [SimpleNamespace(status_code=503)])
+    cliente.circuito.enfriamiento = 60
+    cliente.get("/users")
+    for _ in range(3):
+        with pytest.raises(CircuitoAbiertoError):
+            cliente.get("/users")
+
+    endpoint = cliente.estadisticas()['endpoints']['GET /users']
+    assert (endpoint['llamadas'], endpoint['errores'], endpoint['rechazadas']) == (1, 1, 3)
+    assert endpoint['p50_ms'] > 0
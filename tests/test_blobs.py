@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from blobs import PostgresBlobStore, calcular_hash
+from db import conexion
+
+
+def _contenido():
+    # Texto sin firma conocida: se comprime; más de un trozo
+    return uuid.uuid4().hex.encode() + b"fila de prueba;" * 60_000
+
+
+def _trozos_con_clave(clave):
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM ticket_blob_trozos WHERE hash = %s', (clave,))
+            return cursor.fetchone()[0]
+
+
+def _guardar_legado(contenido):
+    """Blob como lo deja la migración 8: todo en ticket_blobs.contenido"""
+    hash_blob = calcular_hash(contenido)
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO ticket_blobs (hash, contenido, tamano) VALUES (%s, %s, %s)',
+                (hash_blob, contenido, len(contenido))
+            )
+        conn.commit()
+    return hash_blob
+
+
+@pytest.mark.parametrize('legado', [False, True], ids=['trozos', 'contenido'])
+def test_lectura_durante_recompresion(dsn_prueba, legado):
+    contenido = _contenido()
+    store = PostgresBlobStore()
+    hash_blob = _guardar_legado(contenido) if legado else PostgresBlobStore(comprimir=False).guardar(contenido)
+    try:
+        lector = store.abrir(hash_blob)
+        primero = next(lector)
+        datos = store.recomprimir(hash_blob)
+        assert datos['codec'] != 'ninguno'
+
+        # La lectura empezada sigue con los trozos y el códec que leyó
+        assert primero + b''.join(lector) == contenido
+        assert store.leer(hash_blob) == contenido
+
+        store.limpiar_versiones()
+        assert _trozos_con_clave(hash_blob) == 0
+        assert store.leer(hash_blob) == contenido
+    finally:
+        store.eliminar(hash_blob)
@@ -0,0 +1,40 @@
+import tickets_db
+from conftest import ticket_de_prueba
+from db import conexion
+
+
+def _documento(ticket_id):
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT busqueda::text, tickets_documento(id, titulo, descripcion)::text
+                FROM tickets WHERE id = %s
+            ''', (ticket_id,))
+            return cursor.fetchone()
+
+
+def test_comentario_entra_en_la_busqueda(dsn_prueba, usuario_postgres):
+    ticket = ticket_de_prueba(usuario_postgres)
+    tickets_db.guardar_ticket(ticket)
+
+    tickets_db.agregar_comentario(ticket['id'], 'admin', "Revisado el riego del fundo")
+    tickets_db.agregar_comentario(ticket['id'], 'admin', "Planilla corregida")
+
+    for texto in ("riego", "planilla corregida"):
+        encontrados, _ = tickets_db.buscar_tickets(texto, usuario=usuario_postgres)
+        assert [t['id'] for t in encontrados] == [ticket['id']]
+    # Mismo contenido que el documento armado desde cero
+    incremental, completo = _documento(ticket['id'])
+    assert incremental == completo
+
+
+def test_fragmento_conserva_las_tildes(dsn_prueba, usuario_postgres):
+    descripcion = "Pedimos la revisión del código tras la publicación " + "del reporte " * 40 + "y otra revisión."
+    ticket = ticket_de_prueba(usuario_postgres, descripcion=descripcion)
+    tickets_db.guardar_ticket(ticket)
+
+    [encontrado], _ = tickets_db.buscar_tickets("revision codigo publicacion", usuario=usuario_postgres)
+    assert encontrado['fragmento'].startswith(
+        "Pedimos la **revisión** del **código** tras la **publicación**"
+    )
+    assert encontrado['fragmento'].endswith("y otra **revisión**")
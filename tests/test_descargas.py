@@ -0,0 +1,55 @@
+import io
+
+import tickets_db
+from conftest import excel_de_prueba, sesion_de_pagina, ticket_de_prueba
+
+
+def test_descarga_de_adjunto_usuario_postgres(dsn_prueba, usuario_postgres, descargas):
+    contenido = excel_de_prueba()
+    tickets_db.guardar_ticket(ticket_de_prueba(usuario_postgres), io.BytesIO(contenido))
+
+    at = sesion_de_pagina('pages/ticketera_user.py', usuario_postgres, 'USER', {'database_url': dsn_prueba})
+    at.run()
+
+    assert not at.exception
+    assert descargas('prueba.xlsx') == [contenido]
+
+
+def test_descarga_de_adjunto_admin_postgres(dsn_prueba, usuario_postgres, descargas, seleccion_de_filas):
+    contenido = excel_de_prueba()
+    ticket = ticket_de_prueba(usuario_postgres)
+    tickets_db.guardar_ticket(ticket, io.BytesIO(contenido))
+
+    at = sesion_de_pagina('pages/admin.py', 'admin_prueba', 'ADMIN', {'database_url': dsn_prueba})
+    at.session_state['_filas'] = [0]
+    at.run()
+    at.toggle(key=f"ver_adjunto_{ticket['id']}").set_value(True)
+    at.run()
+
+    assert not at.exception
+    assert descargas('prueba.xlsx') == [contenido]
+
+
+def test_descarga_de_adjunto_sqlite(ruta_sqlite, descargas, seleccion_de_filas):
+    from repositorio import SqliteRepositorio
+    contenido = excel_de_prueba()
+    ticket = ticket_de_prueba('user1')
+    SqliteRepositorio(ruta_sqlite).guardar_ticket(ticket, io.BytesIO(contenido))
+    # Con una base inalcanzable, cualquier consulta a Postgres fallaría
+    secretos = {
+        'repositorio': {'backend': 'sqlite', 'ruta': ruta_sqlite},
+        'database_url': 'postgresql://nadie@/nada?host=/nonexistent',
+    }
+
+    at = sesion_de_pagina('pages/ticketera_user.py', 'user1', 'USER', secretos)
+    at.run()
+    assert not at.exception
+    assert descargas('prueba.xlsx') == [contenido]
+
+    at = sesion_de_pagina('pages/admin.py', 'admin_prueba', 'ADMIN', secretos)
+    at.session_state['_filas'] = [0]
+    at.run()
+    at.toggle(key=f"ver_adjunto_{ticket['id']}").set_value(True)
+    at.run()
+    assert not at.exception
+    assert descargas('prueba.xlsx') == [contenido, contenido]
@@ -0,0 +1,90 @@
+import threading
+from types import SimpleNamespace
+
+import directorio
+from directorio import DirectorioUsuarios
+
+
+class _BackendLento:
+    """GET /users que no responde hasta que se libera `soltar`"""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.en_curso = threading.Event()
+        self.soltar = threading.Event()
+
+    def get(self, ruta, headers=None, token=None):
+        self.llamadas += 1
+        if self.llamadas > 1:
+            self.en_curso.set()
+            assert self.soltar.wait(5)
+        return SimpleNamespace(status_code=200, headers={}, json=lambda: [{'usuario': f"u{self.llamadas}"}])
+
+
+def test_consulta_al_backend_no_bloquea_a_las_demas_sesiones(monkeypatch):
+    backend = _BackendLento()
+    monkeypatch.setattr(directorio, 'cliente_api', lambda: backend)
+    cache = DirectorioUsuarios(revalidar=10, ttl=0)
+    assert cache.obtener('t') == [{'usuario': 'u1'}]
+
+    # TTL vencido: un hilo revalida y queda esperando al backend
+    resultado = {}
+    hilo = threading.Thread(target=lambda: resultado.update(lista=cache.obtener('t')))
+    hilo.start()
+    assert backend.en_curso.wait(5)
+
+    # Mientras tanto otra sesión recibe la lista que ya había, sin esperar
+    assert cache.obtener('t') == [{'usuario': 'u1'}]
+    assert backend.llamadas == 2
+
+    backend.soltar.set()
+    hilo.join(5)
+    assert resultado['lista'] == [{'usuario': 'u2'}]
+
+
+def test_respuesta_previa_a_una_invalidacion_no_se_guarda(monkeypatch):
+    backend = _BackendLento()
+    monkeypatch.setattr(directorio, 'cliente_api', lambda: backend)
+    cache = DirectorioUsuarios(revalidar=10, ttl=60)
+    backend.llamadas = 1
+
+    hilo = threading.Thread(target=cache.obtener, args=('t',))
+    hilo.start()
+    assert backend.en_curso.wait(5)
+    cache.invalidar()
+    backend.soltar.set()
+    hilo.join(5)
+
+    assert cache.obtener('t') == [{'usuario': 'u3'}]
+
+
+class _BackendPorToken:
+    """200 al primer GET, luego 304 a los tokens válidos y 401 al resto"""
+
+    def __init__(self, validos):
+        self.validos = validos
+        self.tokens = []
+
+    def get(self, ruta, headers=None, token=None):
+        self.tokens.append(token)
+        if token not in self.validos:
+            return SimpleNamespace(status_code=401, headers={})
+        if headers:
+            return SimpleNamespace(status_code=304, headers={})
+        return SimpleNamespace(status_code=200, headers={'ETag': '"v1"'}, json=lambda: [{'usuario': 'u1'}])
+
+
+def test_copia_compartida_solo_para_tokens_aceptados(monkeypatch):
+    backend = _BackendPorToken(validos={'admin1', 'admin2'})
+    monkeypatch.setattr(directorio, 'cliente_api', lambda: backend)
+    cache = DirectorioUsuarios(revalidar=10, ttl=60)
+
+    assert cache.obtener('admin1') == [{'usuario': 'u1'}]
+    # Otro token con la lista vigente: GET condicional con ese token
+    assert cache.obtener('vencido') is None
+    assert cache.obtener('admin2') == [{'usuario': 'u1'}]
+    assert backend.tokens == ['admin1', 'vencido', 'admin2']
+
+    # Ya aceptados, se sirven de la copia compartida
+    assert cache.obtener('admin1') == cache.obtener('admin2') == [{'usuario': 'u1'}]
+    assert len(backend.tokens) == 3
@@ -0,0 +1,33 @@
+import io
+
+import pandas as pd
+import pytest
+
+import tickets_db
+from conftest import sesion_de_pagina, ticket_de_prueba
+from exportacion import FORMATOS
+
+
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_exportacion_desde_la_pagina_admin(dsn_prueba, usuario_postgres, descargas, formato):
+    tickets_db.guardar_ticket(ticket_de_prueba(usuario_postgres, cantidad_registros=5))
+    tickets_db.guardar_ticket(ticket_de_prueba(usuario_postgres, cantidad_registros=None, nombre_archivo=None))
+
+    at = sesion_de_pagina('pages/admin.py', 'admin_prueba', 'ADMIN', {'database_url': dsn_prueba})
+    at.run()
+    at.radio(key="export_formato").set_value(formato)
+    at.selectbox(key="export_usuario").set_value(usuario_postgres)
+    at.run()
+    assert not at.exception
+
+    extension, _ = FORMATOS[formato]
+    # El último run es el que tiene los filtros elegidos
+    contenido = descargas(f"tickets_*.{extension}")[-1]
+    if extension == 'csv':
+        lineas = contenido.decode('utf-8').splitlines()
+        assert lineas[0].split(',')[5] == 'Registros'
+        assert [linea.split(',')[5] for linea in lineas[1:]] == ['5', '']
+    else:
+        df = pd.read_parquet(io.BytesIO(contenido))
+        assert df['Registros'].tolist()[0] == 5
+        assert pd.isna(df['Registros'].tolist()[1])
@@ -0,0 +1,131 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+
+import outbox
+from conftest import _usar_secrets
+from db import conexion, obtener_pool
+
+
+def _filas():
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT id, estado, token, intentos FROM notificaciones_outbox ORDER BY id')
+            return cursor.fetchall()
+
+
+@pytest.fixture
+def outbox_vacio(dsn_prueba):
+    def vaciar():
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('DELETE FROM notificaciones_outbox')
+            conn.commit()
+    vaciar()
+    yield
+    vaciar()
+
+
+def _encolar(*avisos):
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            for estado, tickets, token in avisos:
+                outbox.encolar_cambio_estado(cursor, estado, tickets, token)
+        conn.commit()
+
+
+def test_envio_fuera_de_la_transaccion(dsn_prueba, outbox_vacio, monkeypatch):
+    _encolar(('Cerrado', [('t1', 'Uno')], 'token_admin'))
+    durante_envio = {}
+
+    def enviar(estado, tickets, token, masivo):
+        # Otra conexión puede tomar las filas: nadie las tiene bloqueadas
+        with psycopg2.connect(dsn_prueba) as otra:
+            with otra.cursor() as cursor:
+                cursor.execute('SELECT id FROM notificaciones_outbox FOR UPDATE NOWAIT')
+                durante_envio['filas'] = cursor.rowcount
+        durante_envio['en_uso'] = obtener_pool().estadisticas()['en_uso']
+
+    monkeypatch.setattr(outbox, '_enviar', enviar)
+    assert outbox.procesar_lote() == 1
+
+    assert durante_envio == {'filas': 1, 'en_uso': 0}
+    [(_, estado, token, intentos)] = _filas()
+    assert (estado, token, intentos) == ('enviada', None, 1)
+
+
+def test_fallida_no_conserva_el_token(dsn_prueba, outbox_vacio, monkeypatch):
+    _usar_secrets(monkeypatch, {'database_url': dsn_prueba, 'outbox': {'max_intentos': 1}})
+    _encolar(('Cerrado', [('t1', 'Uno')], 'token_admin'))
+
+    def enviar(estado, tickets, token, masivo):
+        raise RuntimeError("backend caído")
+
+    monkeypatch.setattr(outbox, '_enviar', enviar)
+    assert outbox.procesar_lote() == 1
+
+    [(_, estado, token, _)] = _filas()
+    assert (estado, token) == ('fallida', None)
+
+
+class _BackendSinMasivo:
+    def __init__(self):
+        self.llamadas = []
+
+    def put(self, ruta, json, token, id=None):
+        self.llamadas.append(ruta.format(id=id))
+        estado = 404 if ruta == "/tickets/estado" else 200
+        return SimpleNamespace(status_code=estado, raise_for_status=lambda: None)
+
+
+def test_envio_masivo_opcional_con_vuelta_a_envio_por_ticket(dsn_prueba, outbox_vacio, monkeypatch):
+    backend = _BackendSinMasivo()
+    monkeypatch.setattr(outbox, 'cliente_api', lambda: backend)
+    avisos = (
+        ('Cerrado', [('t1', 'Uno')], None),
+        ('Cerrado', [('t2', 'Dos')], None),
+        ('Cerrado', [('t3', 'Tres'), ('t4', 'Cuatro')], None),
+    )
+
+    # Por defecto cada ticket va por su ruta, sin juntar filas distintas
+    _encolar(*avisos)
+    assert outbox.procesar_lote() == 3
+    assert backend.llamadas == ["/tickets/t1/estado", "/tickets/t2/estado",
+                                "/tickets/t3/estado", "/tickets/t4/estado"]
+
+    # Con envio_masivo, si el backend no tiene la ruta se envía por ticket
+    _usar_secrets(monkeypatch, {'database_url': dsn_prueba, 'outbox': {'envio_masivo': True}})
+    backend.llamadas.clear()
+    _encolar(avisos[2])
+    assert outbox.procesar_lote() == 1
+    assert backend.llamadas == ["/tickets/estado", "/tickets/t3/estado", "/tickets/t4/estado"]
+    assert {estado for _, estado, _, _ in _filas()} == {'enviada'}
+
+
+def test_lote_lento_no_se_entrega_dos_veces(dsn_prueba, outbox_vacio, monkeypatch):
+    _usar_secrets(monkeypatch, {'database_url': dsn_prueba, 'outbox': {'arriendo': 1}})
+    _encolar(('Cerrado', [('t1', 'Uno')], None))
+    envios = []
+    en_curso = threading.Event()
+
+    def enviar(estado, tickets, token, masivo):
+        envios.append(tickets)
+        en_curso.set()
+        time.sleep(2.5)
+
+    monkeypatch.setattr(outbox, '_enviar', enviar)
+    primero = threading.Thread(target=outbox.procesar_lote)
+    primero.start()
+    assert en_curso.wait(5)
+
+    # Pasado el arriendo original, otra pasada no toma la fila en curso
+    time.sleep(1.5)
+    assert outbox.procesar_lote() == 0
+    primero.join(10)
+
+    assert len(envios) == 1
+    [(_, estado, _, _)] = _filas()
+    assert estado == 'enviada'
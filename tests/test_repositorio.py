@@ -0,0 +1,24 @@
+import sqlite3
+from datetime import datetime, timezone
+
+from conftest import ticket_de_prueba
+from repositorio import SqliteRepositorio
+
+
+def test_sqlite_convierte_fechas_sin_tocar_sqlite3_global(ruta_sqlite):
+    repositorio = SqliteRepositorio(ruta_sqlite)
+    ticket = ticket_de_prueba('user1')
+    repositorio.guardar_ticket(ticket)
+    repositorio.agregar_comentario_tickets([ticket['id']], 'admin', "Revisado")
+
+    [leido], _ = repositorio.listar_tickets(usuario='user1')
+    assert leido['fecha_creacion'] == ticket['fecha_creacion']
+    assert leido['archivado'] is False
+    [comentario], _ = repositorio.listar_comentarios(ticket['id'])
+    assert comentario['fecha'].tzinfo is not None
+    assert repositorio.contar_tickets(usuario='user1', desde=ticket['fecha_creacion']) == 1
+
+    # Otra conexión del proceso sigue con la conversión de sqlite3
+    fecha = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    with sqlite3.connect(':memory:') as otra:
+        assert otra.execute('SELECT ?', (fecha,)).fetchone()[0] == str(fecha)
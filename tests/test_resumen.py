@@ -0,0 +1,64 @@
+import tickets_db
+from archivo import archivar_cerrados
+from conftest import sesion_de_pagina, ticket_de_prueba
+from db import conexion
+
+
+def _conteos_reales():
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT estado, COUNT(*) FROM tickets WHERE NOT archivado GROUP BY estado')
+            return dict(cursor.fetchall())
+
+
+def test_resumen_excluye_archivados(dsn_prueba, usuario_postgres):
+    tickets_db.guardar_ticket(ticket_de_prueba(usuario_postgres))
+    viejo = ticket_de_prueba(usuario_postgres, estado='Cerrado')
+    tickets_db.guardar_ticket(viejo)
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE tickets SET fecha_actualizacion = now() - interval '400 days' WHERE id = %s",
+                (viejo['id'],)
+            )
+        conn.commit()
+
+    archivar_cerrados(dias=365)
+
+    resumen = tickets_db.resumen_tickets()
+    # Los estados que quedan en cero siguen como fila con cantidad 0
+    assert {estado: n for estado, n in resumen['por_estado'].items() if n} == _conteos_reales()
+    assert resumen['total'] == tickets_db.contar_tickets()
+    assert usuario_postgres in resumen['usuarios']
+
+
+def test_listado_admin_toma_el_total_del_resumen(dsn_prueba, usuario_postgres):
+    tickets_db.guardar_ticket(ticket_de_prueba(usuario_postgres))
+    total = tickets_db.contar_tickets()
+
+    at = sesion_de_pagina('pages/admin.py', 'admin_prueba', 'ADMIN', {'database_url': dsn_prueba})
+    at.run()
+    assert not at.exception
+    assert f"📋 Tickets ({total})" in [s.value for s in at.subheader]
+
+    # Con filtros que el resumen no cubre no se muestra un total
+    at.toggle(key="admin_archivados").set_value(True)
+    at.run()
+    assert not at.exception
+    assert "📋 Tickets" in [s.value for s in at.subheader]
+
+
+def test_tickets_por_pagina_invalido_no_rompe_admin(dsn_prueba):
+    from streamlit.testing.v1 import AppTest
+    secretos = {'database_url': dsn_prueba, 'admin_tickets_por_pagina': 'veinte'}
+
+    # Sin sesión solo se ve el login
+    at = AppTest.from_file('pages/admin.py', default_timeout=60)
+    at.secrets.update(secretos)
+    at.run()
+    assert not at.exception
+    assert at.text_input[0].label == "Usuario"
+
+    at = sesion_de_pagina('pages/admin.py', 'admin_prueba', 'ADMIN', secretos)
+    at.run()
+    assert not at.exception
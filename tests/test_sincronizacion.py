@@ -0,0 +1,65 @@
+import streamlit as st
+
+import tickets_db
+from conftest import ticket_de_prueba
+from sincronizacion import listado_sincronizado
+
+
+def _ids(tickets):
+    return sorted(t['id'] for t in tickets)
+
+
+def test_cambios_desde_trae_solo_lo_modificado(dsn_prueba, usuario_postgres):
+    tickets = [ticket_de_prueba(usuario_postgres) for _ in range(3)]
+    for ticket in tickets:
+        tickets_db.guardar_ticket(ticket)
+    cambiado, eliminado, _ = tickets
+
+    todos, eliminados, marcador = tickets_db.cambios_desde(None, usuario=usuario_postgres)
+    assert _ids(todos) == _ids(tickets)
+    assert eliminados == []
+    assert not tickets_db.hay_cambios(marcador)
+
+    tickets_db.cambiar_estado_tickets([cambiado['id']], 'En Progreso')
+    assert tickets_db.hay_cambios(marcador)
+    modificados, eliminados, marcador = tickets_db.cambios_desde(marcador, usuario=usuario_postgres)
+    assert _ids(modificados) == [cambiado['id']]
+    assert modificados[0]['estado'] == 'En Progreso'
+    assert eliminados == []
+
+    # El borrado llega como lápida, sin filas modificadas
+    tickets_db.eliminar_tickets([eliminado['id']])
+    assert tickets_db.hay_cambios(marcador)
+    modificados, eliminados, marcador = tickets_db.cambios_desde(marcador, usuario=usuario_postgres)
+    assert modificados == []
+    assert eliminados == [eliminado['id']]
+    assert not tickets_db.hay_cambios(marcador)
+
+
+def test_pagina_se_relee_solo_si_hay_cambios(dsn_prueba, usuario_postgres):
+    tickets = [ticket_de_prueba(usuario_postgres) for _ in range(3)]
+    for ticket in tickets:
+        tickets_db.guardar_ticket(ticket)
+    cambiado, eliminado, _ = tickets
+    lecturas = []
+
+    def cargar():
+        lecturas.append(1)
+        pagina, _ = tickets_db.listar_tickets(usuario=usuario_postgres, limite=10)
+        return pagina
+
+    def pagina():
+        return listado_sincronizado('pagina_prueba', (usuario_postgres,), cargar)
+
+    assert len(pagina()) == 3
+    assert len(pagina()) == 3
+    assert len(lecturas) == 1
+
+    tickets_db.cambiar_estado_tickets([cambiado['id']], 'Cerrado')
+    tickets_db.eliminar_tickets([eliminado['id']])
+    vigentes = pagina()
+    assert len(lecturas) == 2
+    assert eliminado['id'] not in _ids(vigentes)
+    assert {t['id']: t['estado'] for t in vigentes}[cambiado['id']] == 'Cerrado'
+    # Solo la página queda en la sesión
+    assert st.session_state['pagina_prueba']['resultado'] == vigentes
@@ -0,0 +1,621 @@
+"""
+ACCESO A DATOS DE TICKETS
+Funciones compartidas por la vista admin y la ticketera de usuario
+"""
+
+import io
+import os
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from psycopg2.extras import Json
+
+from blobs import obtener_blob_store, tamano_maximo
+from cache import CacheLRUBytes
+from db import conexion
+from ingesta import copiar_filas
+from lectura_excel import leer_excel
+from outbox import avisar_worker, encolar_cambio_estado
+from vistas_previas import generar_vista_previa, leer_preview
+
+# Columnas del listado: todo menos el adjunto binario
+COLUMNAS_LISTADO = [
+    'id', 'titulo', 'descripcion', 'usuario', 'estado', 'fecha_creacion',
+    'fecha_actualizacion', 'cantidad_registros', 'nombre_archivo', 'archivado'
+]
+
+# Orden de la UI -> (expresión SQL, dirección)
+ORDENES = {
+    'Más recientes': ('fecha_creacion', 'DESC'),
+    'Más antiguos': ('fecha_creacion', 'ASC'),
+    'Más registros': ('COALESCE(cantidad_registros, 0)', 'DESC'),
+}
+
+# ============================================================
+# CACHÉ DE ADJUNTOS
+# ============================================================
+
+@st.cache_resource
+def obtener_cache_adjuntos():
+    """LRU de adjuntos por ticket, compartida por todas las sesiones"""
+    max_mb = st.secrets.get("cache_adjuntos_mb", 64)
+    return CacheLRUBytes(max_mb * 1024 * 1024)
+
+def estadisticas_cache_adjuntos():
+    """Hits, misses y ocupación de la caché de adjuntos"""
+    return obtener_cache_adjuntos().estadisticas()
+
+def invalidar_ticket(ticket_id, resumen=False):
+    """Descartar lo cacheado de un ticket que cambió
+
+    `resumen` también invalida los conteos del dashboard.
+    """
+    cache = obtener_cache_adjuntos()
+    cache.invalidar(ticket_id)
+    cache.invalidar((ticket_id, 'vista_previa'))
+    if resumen:
+        resumen_tickets.clear()
+
+# ============================================================
+# LECTURA
+# ============================================================
+
+def formatear_fecha(valor):
+    """Fecha para mostrar en la UI"""
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y %H:%M:%S')
+    return valor or ''
+
+def _fila_a_ticket(columnas, row):
+    return dict(zip(columnas, row))
+
+def _condiciones(estado=None, usuario=None, desde=None, hasta=None, archivados=True):
+    # archivados=False deja fuera los cerrados archivados (ver archivo.py)
+    condiciones, params = [], []
+    if not archivados:
+        condiciones.append('NOT archivado')
+    if estado:
+        condiciones.append('estado = %s')
+        params.append(estado)
+    if usuario:
+        condiciones.append('usuario = %s')
+        params.append(usuario)
+    if desde:
+        condiciones.append('fecha_creacion >= %s')
+        params.append(desde)
+    if hasta:
+        condiciones.append('fecha_creacion < %s')
+        params.append(hasta)
+    return condiciones, params
+
+def cargar_tickets():
+    """Cargar todos los tickets (sin adjuntos)"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {', '.join(COLUMNAS_LISTADO)} FROM tickets ORDER BY fecha_creacion DESC
+            ''')
+            columnas = [desc[0] for desc in cursor.description]
+            tickets = [_fila_a_ticket(columnas, row) for row in cursor.fetchall()]
+    return tickets
+
+def iterar_tickets(estado=None, usuario=None, desde=None, hasta=None, con_comentarios=False, trozo=5000,
+                   incluir_archivados=True):
+    """DataFrames de hasta `trozo` tickets, leídos con un cursor del servidor
+
+    Memoria acotada a un trozo sin importar cuántos tickets haya. Con
+    `con_comentarios` agrega la columna 'comentarios' con el historial
+    ("fecha usuario: texto" por línea).
+    """
+    condiciones, params = _condiciones(estado, usuario, desde, hasta, incluir_archivados)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    columnas = ', '.join(f't.{col}' for col in COLUMNAS_LISTADO)
+    comentarios, union = '', ''
+    if con_comentarios:
+        comentarios = ', c.comentarios'
+        union = '''
+            LEFT JOIN LATERAL (
+                SELECT string_agg(
+                    to_char(fecha, 'DD/MM/YYYY HH24:MI') || ' ' || usuario || ': ' || texto,
+                    E'\\n' ORDER BY fecha, id
+                ) AS comentarios
+                FROM ticket_comments WHERE ticket_id = t.id
+            ) c ON true
+        '''
+
+    with conexion() as conn:
+        # Cursor con nombre: Postgres entrega las filas de a `trozo`
+        with conn.cursor(name='iterar_tickets') as cursor:
+            cursor.itersize = trozo
+            cursor.execute(f'''
+                SELECT {columnas}{comentarios}
+                FROM tickets t
+                {union}
+                {where}
+                ORDER BY t.fecha_creacion, t.id
+            ''', params)
+            while True:
+                filas = cursor.fetchmany(trozo)
+                if not filas:
+                    break
+                yield pd.DataFrame(filas, columns=[desc[0] for desc in cursor.description])
+
+def listar_tickets(estado=None, usuario=None, orden='Más recientes', limite=25, despues=None,
+                   desde=None, hasta=None, incluir_archivados=False):
+    """Página de tickets filtrada y ordenada en SQL
+
+    `despues` es el cursor (valor de orden, id) del último ticket de la
+    página anterior. `desde`/`hasta` acotan fecha_creacion (hasta exclusivo).
+    Los archivados solo aparecen con `incluir_archivados`. Devuelve (tickets, cursor_siguiente); el cursor es None cuando no hay
+    más páginas.
+    """
+    expresion, direccion = ORDENES[orden]
+    condiciones, params = _condiciones(estado, usuario, desde, hasta, incluir_archivados)
+    if despues is not None:
+        comparador = '<' if direccion == 'DESC' else '>'
+        condiciones.append(f'({expresion}, id) {comparador} (%s, %s)')
+        params.extend(despues)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {expresion} AS orden_valor, {', '.join(COLUMNAS_LISTADO)}
+                FROM tickets
+                {where}
+                ORDER BY {expresion} {direccion}, id {direccion}
+                LIMIT %s
+            ''', params + [limite + 1])
+            columnas = [desc[0] for desc in cursor.description]
+            filas = cursor.fetchall()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    tickets = [_fila_a_ticket(columnas[1:], row[1:]) for row in filas]
+    siguiente = (filas[-1][0], filas[-1][1]) if hay_mas else None
+    return tickets, siguiente
+
+def contar_tickets(estado=None, usuario=None, desde=None, hasta=None, incluir_archivados=False):
+    """Cantidad de tickets que cumplen los filtros"""
+    condiciones, params = _condiciones(estado, usuario, desde, hasta, incluir_archivados)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM tickets {where}', params)
+            return cursor.fetchone()[0]
+
+def _fragmento_con_tildes(fragmento, original, sin_tildes):
+    """Pasar las marcas ** de ts_headline (sobre el texto sin tildes) al original
+
+    sin_acentos cambia letra por letra: cada fragmento ocupa las mismas
+    posiciones en los dos textos. Si no calza (unaccent expandió algún
+    carácter) queda el fragmento sin tildes.
+    """
+    if len(original) != len(sin_tildes):
+        return fragmento
+    partes = []
+    for parte in fragmento.split(' ... '):
+        posicion = sin_tildes.find(parte.replace('**', ''))
+        if posicion < 0:
+            return fragmento
+        tramos = []
+        for tramo in parte.split('**'):
+            tramos.append(original[posicion:posicion + len(tramo)])
+            posicion += len(tramo)
+        partes.append('**'.join(tramos))
+    return ' ... '.join(partes)
+
+def buscar_tickets(texto, estado=None, usuario=None, limite=25, despues=None, incluir_archivados=False):
+    """Tickets que coinciden con `texto` en título, descripción o comentarios
+
+    Sintaxis de buscador web ("frase exacta", -excluir, or), en español y
+    sin importar tildes. Ordenados por relevancia; `despues` es el cursor
+    (rango, id) del último de la página anterior. Devuelve
+    (tickets, cursor_siguiente) como listar_tickets; cada ticket trae
+    además 'rango' y 'fragmento' con las coincidencias en **negrita**.
+    """
+    condiciones, params = _condiciones(estado, usuario, archivados=incluir_archivados)
+    condiciones.append('busqueda @@ consulta')
+    if despues is not None:
+        condiciones.append('(ts_rank(busqueda, consulta), id) < (%s::real, %s)')
+        params.extend(despues)
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT ts_rank(busqueda, consulta) AS rango, {', '.join(COLUMNAS_LISTADO)},
+                       ts_headline('spanish', sin_acentos(COALESCE(descripcion, '')), consulta,
+                                   'StartSel=**, StopSel=**, MaxFragments=2') AS fragmento,
+                       sin_acentos(COALESCE(descripcion, '')) AS descripcion_sin_tildes
+                FROM tickets, websearch_to_tsquery('spanish', sin_acentos(%s)) AS consulta
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY rango DESC, id DESC
+                LIMIT %s
+            ''', [texto] + params + [limite + 1])
+            columnas = [desc[0] for desc in cursor.description]
+            filas = cursor.fetchall()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    tickets = [_fila_a_ticket(columnas, row) for row in filas]
+    for ticket in tickets:
+        # La coincidencia es sin tildes; lo que se muestra, con las del usuario
+        ticket['fragmento'] = _fragmento_con_tildes(
+            ticket['fragmento'], ticket['descripcion'] or '', ticket.pop('descripcion_sin_tildes')
+        )
+    siguiente = (filas[-1][0], filas[-1][1]) if hay_mas else None
+    return tickets, siguiente
+
+# ============================================================
+# CAMBIOS INCREMENTALES
+# ============================================================
+
+def marcador_cambios(cursor):
+    """xmin del snapshot actual: toda transacción anterior ya es visible"""
+    cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+    return cursor.fetchone()[0]
+
+def cambios_desde(marcador=None, usuario=None, incluir_archivados=False):
+    """Tickets modificados y eliminados desde `marcador`
+
+    Sin marcador trae todos (o los de `usuario`). Devuelve
+    (tickets, ids_eliminados, nuevo_marcador). Lo escrito por
+    transacciones abiertas al tomar el marcador vuelve a aparecer en la
+    llamada siguiente: puede repetirse, nunca perderse. Sin
+    `incluir_archivados`, los recién archivados vienen como eliminados.
+    """
+    condiciones, params = _condiciones(usuario=usuario, archivados=incluir_archivados or marcador is not None)
+    if marcador is not None:
+        condiciones.append('version >= %s')
+        params.append(marcador)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            nuevo_marcador = marcador_cambios(cursor)
+            cursor.execute(f'''
+                SELECT {', '.join(COLUMNAS_LISTADO)} FROM tickets {where}
+            ''', params)
+            columnas = [desc[0] for desc in cursor.description]
+            tickets = [_fila_a_ticket(columnas, row) for row in cursor.fetchall()]
+            eliminados = []
+            if marcador is not None:
+                condiciones, params = _condiciones(usuario=usuario)
+                condiciones.append('version >= %s')
+                params.append(marcador)
+                cursor.execute(f"SELECT id FROM tickets_eliminados WHERE {' AND '.join(condiciones)}", params)
+                eliminados = [fila[0] for fila in cursor.fetchall()]
+    if not incluir_archivados:
+        eliminados += [t['id'] for t in tickets if t['archivado']]
+        tickets = [t for t in tickets if not t['archivado']]
+    return tickets, eliminados, nuevo_marcador
+
+def hay_cambios(marcador):
+    """Si algún ticket cambió o se eliminó desde `marcador`"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT EXISTS (SELECT 1 FROM tickets WHERE version >= %s)
+                    OR EXISTS (SELECT 1 FROM tickets_eliminados WHERE version >= %s)
+            ''', (marcador, marcador))
+            return cursor.fetchone()[0]
+
+def marcador_actual():
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            return marcador_cambios(cursor)
+
+@st.cache_data(ttl=300)
+def resumen_tickets():
+    """Conteos del dashboard y usuarios con tickets, en una sola consulta
+
+    Los conteos por estado son de tickets vigentes, sin archivados, como
+    los listados por defecto; la lista de usuarios incluye a todos.
+    """
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT
+                    (SELECT COALESCE(json_object_agg(estado, cantidad), '{}')
+                     FROM tickets_resumen_estado),
+                    (SELECT COALESCE(array_agg(usuario ORDER BY usuario), '{}')
+                     FROM tickets_resumen_usuario)
+            ''')
+            por_estado, usuarios = cursor.fetchone()
+    return {
+        'total': sum(por_estado.values()),
+        'por_estado': por_estado,
+        'usuarios': list(usuarios),
+    }
+
+def comentarios_de_tickets(ticket_ids, limite=5):
+    """Últimos `limite` comentarios de cada ticket, en una sola consulta
+
+    Devuelve {ticket_id: (comentarios, hay_mas)} con los comentarios en
+    orden cronológico.
+    """
+    resultado = {ticket_id: ([], False) for ticket_id in ticket_ids}
+    if not ticket_ids:
+        return resultado
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT t.id, c.id, c.usuario, c.texto, c.fecha
+                FROM unnest(%s::text[]) AS t(id)
+                CROSS JOIN LATERAL (
+                    SELECT id, usuario, texto, fecha FROM ticket_comments
+                    WHERE ticket_id = t.id
+                    ORDER BY fecha DESC, id DESC
+                    LIMIT %s
+                ) c
+            ''', (list(ticket_ids), limite + 1))
+            filas = cursor.fetchall()
+
+    por_ticket = {}
+    for ticket_id, comentario_id, usuario, texto, fecha in filas:
+        por_ticket.setdefault(ticket_id, []).append(
+            {'id': comentario_id, 'usuario': usuario, 'texto': texto, 'fecha': fecha}
+        )
+    for ticket_id, comentarios in por_ticket.items():
+        resultado[ticket_id] = (comentarios[:limite][::-1], len(comentarios) > limite)
+    return resultado
+
+def listar_comentarios(ticket_id, limite=20, despues=None):
+    """Comentarios de un ticket en orden cronológico, paginados por cursor
+
+    `despues` es (fecha, id) del último comentario de la página anterior.
+    Devuelve (comentarios, cursor_siguiente).
+    """
+    condicion, params = '', [ticket_id]
+    if despues is not None:
+        condicion = 'AND (fecha, id) > (%s, %s)'
+        params.extend(despues)
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT id, usuario, texto, fecha FROM ticket_comments
+                WHERE ticket_id = %s {condicion}
+                ORDER BY fecha, id
+                LIMIT %s
+            ''', params + [limite + 1])
+            filas = cursor.fetchall()
+
+    comentarios = [
+        {'id': comentario_id, 'usuario': usuario, 'texto': texto, 'fecha': fecha}
+        for comentario_id, usuario, texto, fecha in filas[:limite]
+    ]
+    siguiente = None
+    if len(filas) > limite:
+        siguiente = (comentarios[-1]['fecha'], comentarios[-1]['id'])
+    return comentarios, siguiente
+
+def obtener_archivo(ticket_id):
+    """Obtener archivo de un ticket, pasando por la caché LRU"""
+    cache = obtener_cache_adjuntos()
+    resultado = cache.obtener(ticket_id)
+    if resultado is not None:
+        return resultado
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'SELECT archivo_hash, archivo_binario, nombre_archivo FROM tickets WHERE id = %s',
+                (ticket_id,)
+            )
+            fila = cursor.fetchone()
+
+    if fila:
+        archivo_hash, archivo_binario, nombre_archivo = fila
+        if archivo_hash:
+            archivo_binario = obtener_blob_store().leer(archivo_hash)
+        # Tickets aún no migrados: memoryview a bytes
+        elif isinstance(archivo_binario, memoryview):
+            archivo_binario = bytes(archivo_binario)
+        resultado = (archivo_binario, nombre_archivo)
+        cache.guardar(ticket_id, resultado, len(archivo_binario or b''))
+        return resultado
+    return None, None
+
+def para_descarga(temporal):
+    """Reabrir un temporal ya escrito como lector de solo lectura, al inicio
+
+    st.download_button no acepta el BufferedRandom de TemporaryFile; sí un
+    BufferedReader. El descriptor duplicado mantiene vivo el temporal
+    hasta que se cierre el lector.
+    """
+    temporal.flush()
+    lector = open(os.dup(temporal.fileno()), 'rb')
+    temporal.close()
+    lector.seek(0)
+    return lector
+
+def archivo_temporal(ticket_id):
+    """Archivo temporal de solo lectura con el adjunto, o None
+
+    Se copia trozo a trozo desde el almacén, sin pasar por la caché LRU:
+    pensado para descargas, que no deben tener el adjunto entero en RAM.
+    """
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'SELECT archivo_hash, archivo_binario IS NOT NULL FROM tickets WHERE id = %s',
+                (ticket_id,)
+            )
+            fila = cursor.fetchone()
+    if not fila or not (fila[0] or fila[1]):
+        return None
+    archivo_hash = fila[0]
+    # Tickets aún no migrados: el adjunto viene entero de tickets
+    trozos = obtener_blob_store().abrir(archivo_hash) if archivo_hash else [obtener_archivo(ticket_id)[0]]
+    destino = tempfile.TemporaryFile()
+    try:
+        for trozo in trozos:
+            destino.write(trozo)
+    except Exception:
+        destino.close()
+        raise
+    return para_descarga(destino)
+
+def obtener_vista_previa(ticket_id):
+    """(DataFrame de primeras filas, estadísticas, CSV) del adjunto
+
+    Se lee de ticket_previews. Los tickets anteriores a las vistas previas
+    la generan una sola vez desde el Excel y la dejan guardada.
+    Devuelve None si el ticket no tiene adjunto.
+    """
+    cache = obtener_cache_adjuntos()
+    clave = (ticket_id, 'vista_previa')
+    resultado = cache.obtener(clave)
+    if resultado is not None:
+        return resultado
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'SELECT preview, estadisticas, csv FROM ticket_previews WHERE ticket_id = %s',
+                (ticket_id,)
+            )
+            fila = cursor.fetchone()
+
+    if fila:
+        preview, estadisticas, csv = bytes(fila[0]), fila[1], bytes(fila[2])
+    else:
+        archivo_binario, _ = obtener_archivo(ticket_id)
+        if not archivo_binario:
+            return None
+        df, _ = leer_excel(io.BytesIO(archivo_binario))
+        vista = generar_vista_previa(df)
+        with conexion() as conn:
+            with conn.cursor() as cursor:
+                _guardar_vista_previa(cursor, ticket_id, vista)
+            conn.commit()
+        preview, estadisticas, csv = vista['preview'], vista['estadisticas'], vista['csv']
+
+    resultado = (leer_preview(preview), estadisticas, csv)
+    cache.guardar(clave, resultado, len(preview) + len(csv))
+    return resultado
+
+# ============================================================
+# ESCRITURA
+# ============================================================
+
+def _guardar_vista_previa(cursor, ticket_id, vista):
+    cursor.execute('''
+        INSERT INTO ticket_previews (ticket_id, preview, estadisticas, csv, filas)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (ticket_id) DO NOTHING
+    ''', (ticket_id, vista['preview'], Json(vista['estadisticas']), vista['csv'], vista['filas']))
+
+def guardar_ticket(ticket, archivo=None, vista_previa=None, df_filas=None):
+    """Guardar ticket en PostgreSQL; el adjunto va al almacén de blobs
+
+    `archivo` es un archivo binario abierto: se lee desde el inicio y se
+    guarda por trozos (ver blobs.py), con el límite de [blobs] max_mb.
+    `vista_previa` (ver vistas_previas.generar_vista_previa) y las filas
+    validadas del Excel (`df_filas`, ver ingesta.copiar_filas) se guardan
+    en la misma transacción que el ticket.
+    """
+    archivo_hash = None
+    if archivo is not None:
+        archivo.seek(0)
+        archivo_hash = obtener_blob_store().guardar_stream(archivo, tamano_maximo())
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO tickets
+                (id, titulo, descripcion, usuario, estado, fecha_creacion, fecha_actualizacion, cantidad_registros, archivo_hash, nombre_archivo)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', (
+                ticket['id'],
+                ticket['titulo'],
+                ticket['descripcion'],
+                ticket['usuario'],
+                ticket['estado'],
+                ticket['fecha_creacion'],
+                ticket['fecha_actualizacion'],
+                ticket['cantidad_registros'],
+                archivo_hash,
+                ticket.get('nombre_archivo')
+            ))
+            if vista_previa:
+                _guardar_vista_previa(cursor, ticket['id'], vista_previa)
+            if df_filas is not None:
+                copiar_filas(cursor, ticket['id'], df_filas)
+        conn.commit()
+    invalidar_ticket(ticket['id'], resumen=True)
+
+def agregar_comentario(ticket_id, usuario, comentario):
+    """Agregar comentario a un ticket"""
+    agregar_comentario_tickets([ticket_id], usuario, comentario)
+
+def actualizar_estado_ticket(ticket_id, nuevo_estado, token=None, usuario=None):
+    """Actualizar estado de un ticket en BD"""
+    cambiar_estado_tickets([ticket_id], nuevo_estado, token, usuario)
+
+def eliminar_ticket(ticket_id):
+    """Eliminar un ticket"""
+    eliminar_tickets([ticket_id])
+
+# ============================================================
+# OPERACIONES MASIVAS
+# ============================================================
+
+def agregar_comentario_tickets(ticket_ids, usuario, comentario):
+    """Mismo comentario en varios tickets, en una sola transacción
+
+    El texto se suma al índice de búsqueda (peso C) en el mismo UPDATE.
+    """
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.executemany('''
+                INSERT INTO ticket_comments (ticket_id, usuario, texto) VALUES (%s, %s, %s)
+            ''', [(ticket_id, usuario, comentario) for ticket_id in ticket_ids])
+            cursor.execute('''
+                UPDATE tickets SET
+                    fecha_actualizacion = now(),
+                    busqueda = busqueda || setweight(to_tsvector('spanish', sin_acentos(%s)), 'C')
+                WHERE id = ANY(%s)
+            ''', (comentario, list(ticket_ids)))
+        conn.commit()
+    for ticket_id in ticket_ids:
+        invalidar_ticket(ticket_id)
+
+def cambiar_estado_tickets(ticket_ids, nuevo_estado, token=None, usuario=None):
+    """Cambiar el estado de varios tickets en una sola transacción
+
+    El aviso al backend queda en el outbox dentro de la misma transacción
+    (ver outbox.py); `token` es el del admin que hace el cambio y
+    `usuario` su nombre para el historial de eventos (ver sla.py).
+    Devuelve [(id, titulo)] de los tickets que cambiaron de estado.
+    """
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            if usuario:
+                cursor.execute("SELECT set_config('app.usuario', %s, true)", (usuario,))
+            cursor.execute('''
+                UPDATE tickets SET estado = %s, fecha_actualizacion = now(), archivado = false
+                WHERE id = ANY(%s) AND estado <> %s
+                RETURNING id, titulo
+            ''', (nuevo_estado, list(ticket_ids), nuevo_estado))
+            cambiados = cursor.fetchall()
+            encolar_cambio_estado(cursor, nuevo_estado, cambiados, token)
+        conn.commit()
+    avisar_worker()
+    for ticket_id, _ in cambiados:
+        invalidar_ticket(ticket_id)
+    resumen_tickets.clear()
+    return cambiados
+
+def eliminar_tickets(ticket_ids):
+    """Eliminar varios tickets en una sola transacción; devuelve los ids borrados"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('DELETE FROM tickets WHERE id = ANY(%s) RETURNING id', (list(ticket_ids),))
+            eliminados = [fila[0] for fila in cursor.fetchall()]
+        conn.commit()
+    for ticket_id in eliminados:
+        invalidar_ticket(ticket_id)
+    resumen_tickets.clear()
+    return eliminados
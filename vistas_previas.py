@@ -0,0 +1,57 @@
+"""
+VISTAS PREVIAS DE ADJUNTOS
+Se calculan una vez al crear el ticket y se guardan en ticket_previews:
+primeras filas en Parquet, estadísticas por columna y la versión CSV
+"""
+
+import io
+
+import pandas as pd
+
+FILAS_VISTA_PREVIA = 200
+
+
+def _normalizar(df):
+    """Columnas de texto homogéneas para que Parquet acepte tipos mezclados"""
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.select_dtypes(include='object').columns:
+        df[col] = df[col].astype('string')
+    return df
+
+
+def estadisticas_columnas(df):
+    """Tipo, nulos, únicos y rango numérico de cada columna"""
+    estadisticas = {}
+    for col in df.columns:
+        serie = df[col]
+        datos = {
+            'tipo': str(serie.dtype),
+            'nulos': int(serie.isna().sum()),
+            'unicos': int(serie.nunique(dropna=True)),
+        }
+        if pd.api.types.is_numeric_dtype(serie) and serie.notna().any():
+            datos.update(
+                minimo=float(serie.min()),
+                maximo=float(serie.max()),
+                promedio=round(float(serie.mean()), 4),
+            )
+        estadisticas[str(col)] = datos
+    return estadisticas
+
+
+def generar_vista_previa(df, filas=FILAS_VISTA_PREVIA):
+    """Vista previa lista para guardar: {preview, estadisticas, csv, filas}"""
+    buffer = io.BytesIO()
+    _normalizar(df.head(filas)).to_parquet(buffer, index=False, compression='zstd')
+    return {
+        'preview': buffer.getvalue(),
+        'estadisticas': estadisticas_columnas(df),
+        'csv': df.to_csv(index=False).encode('utf-8'),
+        'filas': len(df),
+    }
+
+
+def leer_preview(preview):
+    """DataFrame de la vista previa guardada en Parquet"""
+    return pd.read_parquet(io.BytesIO(preview))